@@ -1,13 +1,15 @@
 # app/api/v1/api.py
 
 from fastapi import APIRouter, Depends
-from app.api.v1.endpoints import health, onboard, sources, transcribe, transcript, summary, highlight
+from app.api.v1.endpoints import health, onboard, sources, transcribe, transcript, summary, highlight, batch, live
 from app.core.firebase_auth import verify_firebase_token
 
 api_router = APIRouter()
 
 # 🔓 Unprotected routes
 api_router.include_router(health.router, prefix="/health", tags=["health"])
+# WebSocket: authenticated by the token in its first message
+api_router.include_router(live.router, prefix="/live", tags=["live"])
 
 # 🔐 Protected routes (require Firebase token)
 protected_router = APIRouter(dependencies=[Depends(verify_firebase_token)])
@@ -17,5 +19,6 @@ protected_router.include_router(transcribe.router, prefix="/transcribe", tags=["
 protected_router.include_router(transcript.router, prefix="/transcript", tags=["transcript"]) 
 protected_router.include_router(summary.router, prefix="/summary", tags=["summary"])
 protected_router.include_router(highlight.router, prefix="/highlight", tags=["highlight"])
+protected_router.include_router(batch.router, prefix="/batch", tags=["batch"])
 
 api_router.include_router(protected_router)
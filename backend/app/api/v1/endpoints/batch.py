@@ -0,0 +1,21 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.firebase_auth import verify_firebase_token
+from app.schemas.batch import BatchRequest
+from app.services.batch_service import submit_batch, get_batch
+
+router = APIRouter()
+
+@router.post("")
+async def submit_batch_api(request: BatchRequest, user=Depends(verify_firebase_token)):
+    try:
+        return await asyncio.to_thread(submit_batch, user["uid"], request.sourceIds, request.operations)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{batch_id}")
+async def get_batch_api(batch_id: str, user=Depends(verify_firebase_token)):
+    try:
+        return await asyncio.to_thread(get_batch, user["uid"], batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
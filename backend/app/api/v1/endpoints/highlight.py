@@ -1,23 +1,33 @@
 # app/api/v1/endpoints/highlight.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.firebase_auth import verify_firebase_token
 from app.schemas.highlight import HighlightRequest
-from app.services.highlight_service import generate_highlight, get_highlight_history
+from app.services.highlight_service import agenerate_highlight, aget_highlight_history, stream_highlight
+from app.utils.sse import SSE_HEADERS
 
 router = APIRouter()
 
 
 @router.post("/{source_id}")
-def highlight_prompt(source_id: str, request: HighlightRequest, user=Depends(verify_firebase_token)):
+async def highlight_prompt(source_id: str, request: HighlightRequest, user=Depends(verify_firebase_token)):
     try:
-        return generate_highlight(user["uid"], source_id, request.prompt)
+        return await agenerate_highlight(user["uid"], source_id, request.prompt)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/{source_id}/stream")
+async def highlight_prompt_stream(source_id: str, request: HighlightRequest, user=Depends(verify_firebase_token)):
+    try:
+        events = await stream_highlight(user["uid"], source_id, request.prompt)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/{source_id}/history")
-def get_highlight_chat_history(source_id: str, user=Depends(verify_firebase_token)):
+async def get_highlight_chat_history(source_id: str, user=Depends(verify_firebase_token)):
     try:
-        return get_highlight_history(user["uid"], source_id)
+        return await aget_highlight_history(user["uid"], source_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
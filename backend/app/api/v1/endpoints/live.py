@@ -0,0 +1,85 @@
+# app/api/v1/endpoints/live.py
+
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.core.firebase_auth import averify_id_token
+from app.core.request_context import user_scope
+from app.services.live_transcription import LiveTranscription
+
+router = APIRouter()
+
+
+@router.websocket("/transcribe")
+async def live_transcribe(websocket: WebSocket):
+    """
+    Live recording. Protocol (JSON text frames unless noted):
+
+      -> {"type": "start", "token": <Firebase ID token>, "name", "mimeType", "groupId", "topic"}
+      <- {"type": "ready", "sourceId", "live"}
+      -> binary frames: the recording, in order (e.g. MediaRecorder chunks)
+      <- {"type": "partial", "text"}               text of the audio still pending
+      <- {"type": "final", "text", "start", "end"}  text that will not change any more
+      <- {"type": "error", "detail"}               e.g. live text unavailable, or the recording limit reached
+      -> {"type": "stop"}
+      <- {"type": "done", "sourceId", "transcriptReady"}
+
+    Browsers can't set headers on WebSockets, so the token comes in the first message.
+    A connection dropped without "stop" still saves what was recorded. Past
+    LIVE_MAX_SECONDS / LIVE_MAX_BYTES the session ends as if "stop" was sent.
+    """
+    await websocket.accept()
+    try:
+        start = await websocket.receive_json()
+    except (WebSocketDisconnect, ValueError):
+        return
+    if not isinstance(start, dict) or start.get("type") != "start":
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Expected a start message")
+        return
+    try:
+        user = await averify_id_token(start.get("token") or "")
+    except Exception as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Invalid token: {str(e)}"[:120])
+        return
+
+    with user_scope(user["uid"]):
+        try:
+            session = await LiveTranscription.astart(user["uid"], start, websocket.send_json)
+        except ValueError as e:
+            await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA, reason=str(e))
+            return
+        await websocket.send_json({"type": "ready", "sourceId": session.source_id, "live": session.live})
+
+        stopped = False
+        try:
+            while not stopped:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    if not await session.feed(message["bytes"]):
+                        await websocket.send_json({"type": "error", "detail": "Recording limit reached, stopping"})
+                        stopped = True
+                elif message.get("text"):
+                    try:
+                        stopped = json.loads(message["text"]).get("type") == "stop"
+                    except (ValueError, AttributeError):
+                        pass
+        except WebSocketDisconnect:
+            pass
+        except BaseException as e:
+            await session.abort(f"Live session failed: {e!r}")
+            raise
+
+        try:
+            transcript = await session.finish()
+        except Exception as e:
+            # finish() has marked the source as failed
+            print(f"[error] Live recording {session.source_id} could not be saved: {e}")
+            if stopped:
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Recording could not be saved")
+            return
+        if stopped:
+            await websocket.send_json({
+                "type": "done", "sourceId": session.source_id, "transcriptReady": transcript is not None,
+            })
+            await websocket.close()
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends
 from app.core.firebase_auth import verify_firebase_token
 from app.services import onboard_service
@@ -5,5 +6,5 @@ from app.services import onboard_service
 router = APIRouter()
 
 @router.get("")
-def onboard(user=Depends(verify_firebase_token)):
-    return onboard_service.ensure_user_onboarded(user["uid"])
+async def onboard(user=Depends(verify_firebase_token)):
+    return await asyncio.to_thread(onboard_service.ensure_user_onboarded, user["uid"])
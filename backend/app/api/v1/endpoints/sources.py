@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from app.core.firebase_auth import verify_firebase_token
 from app.schemas.sources import (
     UploadUrlRequest,
@@ -9,35 +11,60 @@ from app.services.source_service import (
     create_signed_upload_url,
     create_signed_download_url,
     save_source_metadata,
-    get_all_sources,
+    aget_all_sources,
+    aget_source_status,
     delete_source,
 )
 
 router = APIRouter()
 
 @router.post("/upload-url")
-def upload_url(request: UploadUrlRequest, user=Depends(verify_firebase_token)):
-    return create_signed_upload_url(user["uid"], request.contentType)
+async def upload_url(request: UploadUrlRequest, user=Depends(verify_firebase_token)):
+    return await asyncio.to_thread(create_signed_upload_url, user["uid"], request.contentType)
 
 @router.post("/download-url")
-def download_url(request: DownloadUrlRequest, user=Depends(verify_firebase_token)):
-    return create_signed_download_url(request.path, user["uid"])
+async def download_url(request: DownloadUrlRequest, user=Depends(verify_firebase_token)):
+    return await asyncio.to_thread(create_signed_download_url, request.path, user["uid"])
 
 @router.post("/upload-metadata")
-def upload_metadata(meta: SourceMetadata, user=Depends(verify_firebase_token)):
-    return save_source_metadata(user["uid"], meta.dict())
+async def upload_metadata(meta: SourceMetadata, user=Depends(verify_firebase_token)):
+    return await asyncio.to_thread(save_source_metadata, user["uid"], meta.dict())
 
 @router.get("")
-def list_sources(user=Depends(verify_firebase_token)):
+async def list_sources(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Literal["list", "full"] = "list",
+    groupId: Optional[str] = None,
+    topic: Optional[str] = None,
+    user=Depends(verify_firebase_token),
+):
     try:
-        return get_all_sources(user["uid"])
+        page = await aget_all_sources(
+            user["uid"], limit=limit, cursor=cursor, fields=fields, group_id=groupId, topic=topic
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"[error] Failed to list sources: {e}")
         return []
 
+    # The body stays a plain list; the next page cursor travels in a header
+    if page["nextCursor"]:
+        response.headers["X-Next-Cursor"] = page["nextCursor"]
+    return page["items"]
+
+@router.get("/{source_id}/status")
+async def source_status(source_id: str, user=Depends(verify_firebase_token)):
+    try:
+        return await aget_source_status(user["uid"], source_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.delete("/{source_id}")
-def delete_source_endpoint(source_id: str, user=Depends(verify_firebase_token)):
+async def delete_source_endpoint(source_id: str, user=Depends(verify_firebase_token)):
     try:
-        return delete_source(user["uid"], source_id)
+        return await asyncio.to_thread(delete_source, user["uid"], source_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,20 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.firebase_auth import verify_firebase_token
-from app.services.summary_service import get_summary, summarize_and_save
+from app.services.summary_service import aget_summary, asummarize_and_save, stream_summary
+from app.services.single_flight import IdempotencyConflict
+from app.utils.sse import SSE_HEADERS
 
 router = APIRouter()
 
 @router.get("/{source_id}")
-def get_summary_api(source_id: str, user=Depends(verify_firebase_token)):
+async def get_summary_api(source_id: str, user=Depends(verify_firebase_token)):
     try:
-        return get_summary(user["uid"], source_id)
+        return await aget_summary(user["uid"], source_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/{source_id}/generate")
-def generate_summary_api(source_id: str, user=Depends(verify_firebase_token)):
+async def generate_summary_api(
+    source_id: str,
+    user=Depends(verify_firebase_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     try:
-        summary = summarize_and_save(user["uid"], source_id)
+        summary = await asummarize_and_save(user["uid"], source_id, idempotency_key=idempotency_key)
         return {"message": "Summary saved", "summary": summary}
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{source_id}/generate/stream")
+async def stream_summary_api(source_id: str, user=Depends(verify_firebase_token)):
+    try:
+        events = await stream_summary(user["uid"], source_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
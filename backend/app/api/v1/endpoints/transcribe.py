@@ -1,16 +1,27 @@
 # backend/app/api/v1/endpoints/transcribe.py
 
 from app.schemas.transcribe import TranscribeRequest
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
 
 from app.core.firebase_auth import verify_firebase_token
 from app.services.transcribe_service import TranscribeService
+from app.services.single_flight import IdempotencyConflict
 
 router = APIRouter()
 
 @router.post("")
-def transcribe_audio(request: TranscribeRequest, user=Depends(verify_firebase_token)):
+async def transcribe_audio(
+    request: TranscribeRequest,
+    user=Depends(verify_firebase_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     print("Transcribe requested", request.path)
     service = TranscribeService()
-    result = service.transcribe(provider=request.provider, gcs_path=request.path, user_id=user["uid"])
+    try:
+        result = await service.atranscribe(
+            provider=request.provider, gcs_path=request.path, user_id=user["uid"], idempotency_key=idempotency_key
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     return result
@@ -1,29 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.core.firebase_auth import verify_firebase_token
-from app.schemas.transcript import TranscriptUpdateRequest
-from app.services.transcript_service import get_transcript, update_transcript, delete_transcript
+from app.schemas.transcript import TranscriptUpdateRequest, TranscriptPatchRequest
+from app.services.transcript_service import (
+    aget_transcript, aupdate_transcript, aedit_transcript, adelete_transcript, alocate_span,
+    InvalidEdit, TranscriptConflict,
+)
 
 router = APIRouter()
 
 @router.get("/{source_id}")
-def get_transcript_api(source_id: str, user=Depends(verify_firebase_token)):
+async def get_transcript_api(source_id: str, user=Depends(verify_firebase_token)):
     try:
-        return get_transcript(user["uid"], source_id)
+        return await aget_transcript(user["uid"], source_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{source_id}/timestamps")
+async def locate_transcript_span(
+    source_id: str,
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    text: Optional[str] = None,
+    user=Depends(verify_firebase_token),
+):
+    """Audio time (seconds) of a transcript span: `start`/`end` character offsets or a `text` snippet."""
+    if text is None and (start is None or end is None or end < start):
+        raise HTTPException(status_code=422, detail="Pass `text`, or `start` and `end` character offsets")
+    try:
+        return await alocate_span(user["uid"], source_id, start, end, text)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.put("/{source_id}")
-def update_transcript_api(source_id: str, payload: TranscriptUpdateRequest, user=Depends(verify_firebase_token)):
+async def update_transcript_api(source_id: str, payload: TranscriptUpdateRequest, user=Depends(verify_firebase_token)):
     try:
-        update_transcript(user["uid"], source_id, payload.text, payload.provider)
+        await aupdate_transcript(user["uid"], source_id, payload.text, payload.provider)
         return {"message": "Transcript updated"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.patch("/{source_id}")
+async def edit_transcript_api(source_id: str, payload: TranscriptPatchRequest, user=Depends(verify_firebase_token)):
+    try:
+        result = await aedit_transcript(
+            user["uid"], source_id, [e.dict() for e in payload.edits], payload.baseSha256, payload.provider
+        )
+        return {"message": "Transcript updated", **result}
+    except InvalidEdit as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except TranscriptConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.delete("/{source_id}")
-def delete_transcript_api(source_id: str, user=Depends(verify_firebase_token)):
+async def delete_transcript_api(source_id: str, user=Depends(verify_firebase_token)):
     try:
-        delete_transcript(user["uid"], source_id)
+        await adelete_transcript(user["uid"], source_id)
         return {"message": "Transcript deleted"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -2,10 +2,17 @@
 
 import os
 import json
+import asyncio
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from fastapi import Request, HTTPException, status
 import firebase_admin
 from firebase_admin import credentials, auth
 from dotenv import load_dotenv
+from app.core.settings import settings
+from app.core.tracing import span
 
 load_dotenv()
 
@@ -16,14 +23,90 @@ if not firebase_admin._apps:
     )
     firebase_admin.initialize_app(creds)
 
-def verify_firebase_token(request: Request):
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded ID tokens, keyed by a SHA-256 of the raw token.
+    Entries expire at the token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> [decoded, expires_at, revocation_checked_at]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, decoded: dict):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = [decoded, float(decoded.get("exp", now)), now]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def _verify(token: str, key: str) -> dict:
+    check_revoked = settings.AUTH_REVOCATION_CHECK_SECONDS > 0
+    try:
+        decoded = auth.verify_id_token(token, check_revoked=check_revoked)
+    except Exception:
+        token_cache.discard(key)
+        raise
+    token_cache.put(key, decoded)
+    return decoded
+
+
+async def averify_id_token(token: str) -> dict:
+    """Decoded Firebase ID token, from the cache when possible. Raises if the token is invalid."""
+    key = TokenCache.key(token)
+    with span("auth.verify") as verify_span:
+        entry = token_cache.get(key)
+        verify_span.set_attribute("cached", entry is not None)
+        # Verification may fetch Google's certificates / check revocation: keep it off the event loop
+        if entry is None:
+            return await asyncio.to_thread(_verify, token, key)
+        if (settings.AUTH_REVOCATION_CHECK_SECONDS > 0
+                and time.time() - entry[2] > settings.AUTH_REVOCATION_CHECK_SECONDS):
+            return await asyncio.to_thread(_verify, token, key)
+        return entry[0]
+
+
+async def verify_firebase_token(request: Request):
+    # Verified once per request, even when both the router and the endpoint depend on it
+    cached_user = getattr(request.state, "firebase_user", None)
+    if cached_user is not None:
+        return cached_user
+
     auth_header = request.headers.get("Authorization")
     if not auth_header:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing Authorization Header")
 
     token = auth_header.split("Bearer ")[-1]
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
+        decoded_token = await averify_id_token(token)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {str(e)}")
+
+    request.state.firebase_user = decoded_token
+    return decoded_token
@@ -1,6 +1,16 @@
 import os
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore import AsyncClient
+from google.cloud.firestore_v1 import async_batch, async_document, async_query, batch, document, query
+from app.core import metrics
+from app.core.settings import settings
+from app.core.tracing import current_route, span
 
 if not firebase_admin._apps:
     cred_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
@@ -10,3 +20,145 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 
 db = firestore.client()
+
+# The async client is bound to the event loop it is created on: one per loop
+_async_dbs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+
+def get_async_db() -> AsyncClient:
+    """Async Firestore client for the running event loop, with the same credentials and project as `db`."""
+    loop = asyncio.get_running_loop()
+    client = _async_dbs.get(loop)
+    if client is None:
+        with _async_lock:
+            client = _async_dbs.get(loop)
+            if client is None:
+                app = firebase_admin.get_app()
+                client = _async_dbs[loop] = AsyncClient(
+                    project=db.project, credentials=app.credential.get_credential()
+                )
+    return client
+
+
+# ---------------------------------------------------------------------- #
+# Metrics: Firestore calls are spread over every service, so the client
+# classes are wrapped once here (like OpenTelemetry's instrumentations)
+# instead of timing each call site.
+# ---------------------------------------------------------------------- #
+
+def _count_one(_) -> int:
+    return 1
+
+
+def _instrument(cls, name: str, op: str, count=_count_one):
+    """Time `cls.name` as a `firestore.<op>` span and count the documents it touches."""
+    original = getattr(cls, name)
+    if getattr(original, "_instrumented", False):
+        return
+
+    if inspect.iscoroutinefunction(original):
+        @functools.wraps(original)
+        async def wrapper(self, *args, **kwargs):
+            documents = count(self)  # before the call: a committed batch is emptied
+            with span(f"firestore.{op}"):
+                result = await original(self, *args, **kwargs)
+            metrics.FIRESTORE_DOCUMENTS.inc(documents, op=op, route=current_route())
+            return result
+    else:
+        @functools.wraps(original)
+        def wrapper(self, *args, **kwargs):
+            documents = count(self)
+            with span(f"firestore.{op}"):
+                result = original(self, *args, **kwargs)
+            metrics.FIRESTORE_DOCUMENTS.inc(documents, op=op, route=current_route())
+            return result
+
+    wrapper._instrumented = True
+    setattr(cls, name, wrapper)
+
+
+class _CountedStream:
+    """Wraps a query's (async) stream generator: counts the documents read and times the whole read."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self._span = span("firestore.read")
+        self._documents = 0
+        self._done = False
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def _finish(self, error=None):
+        if not self._done:
+            self._done = True
+            self._span.end(error)
+            metrics.FIRESTORE_DOCUMENTS.inc(self._documents, op="read", route=current_route(self._span.trace))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            item = next(self._inner)
+        except StopIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._documents += 1
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            item = await self._inner.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        self._documents += 1
+        return item
+
+    def close(self):
+        self._finish()
+        return self._inner.close()
+
+    async def aclose(self):
+        self._finish()
+        return await self._inner.aclose()
+
+
+def _instrument_stream(cls):
+    original = cls.stream
+    if getattr(original, "_instrumented", False):
+        return
+
+    @functools.wraps(original)
+    def stream(self, *args, **kwargs):
+        return _CountedStream(original(self, *args, **kwargs))
+
+    stream._instrumented = True
+    cls.stream = stream
+
+
+def instrument_firestore():
+    # Collection get/stream/add and query get all go through these
+    for cls in (document.DocumentReference, async_document.AsyncDocumentReference):
+        _instrument(cls, "get", "read")
+        for name in ("set", "update", "create", "delete"):
+            _instrument(cls, name, "write")
+    for cls in (batch.WriteBatch, async_batch.AsyncWriteBatch):
+        _instrument(cls, "commit", "write", count=len)
+    for cls in (query.Query, async_query.AsyncQuery):
+        _instrument_stream(cls)
+
+
+if settings.METRICS_ENABLED:
+    instrument_firestore()
@@ -0,0 +1,297 @@
+# app/core/http_client.py
+
+"""
+Process-wide HTTP transport shared by all provider pipelines.
+
+One keep-alive (HTTP/2) connection pool per process instead of a fresh
+TCP+TLS handshake per call, per-call timeouts, and retries on 429/5xx with
+jittered exponential backoff that honors `Retry-After`. With
+`rate_limit=(model, cost)` every attempt, retries included, first reserves
+capacity from the client-side rate limiter.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.rate_limiter import rate_limiter
+from app.core.settings import settings
+from app.core.tracing import current_route
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Upload bodies are read from disk in pieces of this size
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+_client: Optional[httpx.Client] = None
+# Async clients are bound to the event loop they were created on: one per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout(timeout: Optional[float] = None) -> httpx.Timeout:
+    return httpx.Timeout(timeout or settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+
+
+def get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(http2=True, limits=_limits(), timeout=_timeout())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = _async_clients[loop] = httpx.AsyncClient(http2=True, limits=_limits(), timeout=_timeout())
+    return client
+
+
+def warm_up(url: str):
+    """Open a pooled connection (DNS + TCP + TLS) to `url`'s host ahead of the first real call."""
+    origin = httpx.URL(url).copy_with(path="/", query=None)
+    try:
+        get_client().head(origin, timeout=_timeout(settings.HTTP_CONNECT_TIMEOUT_SECONDS))
+    except httpx.HTTPError as e:
+        print(f"[warn] HTTP warm-up to {origin} failed: {e}")
+
+
+async def aclose():
+    """
+    Close every pooled client. Each async client is closed on the loop it
+    belongs to: awaited here for this loop, scheduled onto another thread's
+    loop while it runs, or run on it from a worker thread while it is idle
+    (job workers keep their loop between jobs). Clients of loops that are
+    already closed can't be closed any more and are just dropped.
+    """
+    global _client
+    with _lock:
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+    current = asyncio.get_running_loop()
+    for loop, client in clients:
+        try:
+            if loop is current:
+                await client.aclose()
+            elif loop.is_closed():
+                continue
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                await asyncio.wait_for(asyncio.wrap_future(future), settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+            else:
+                await asyncio.to_thread(loop.run_until_complete, client.aclose())
+        except (RuntimeError, asyncio.TimeoutError, httpx.HTTPError) as e:
+            print(f"[warn] Failed to close an HTTP client: {e!r}")
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Delay before the next attempt: `Retry-After` if the server sent one, else full-jitter backoff."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.HTTP_RETRY_MAX_DELAY_SECONDS)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(delay, 0.0), settings.HTTP_RETRY_MAX_DELAY_SECONDS)
+                except (TypeError, ValueError):
+                    pass
+    cap = min(settings.HTTP_RETRY_BASE_DELAY_SECONDS * (2 ** attempt), settings.HTTP_RETRY_MAX_DELAY_SECONDS)
+    return random.uniform(0, cap)
+
+
+def _record(url: str, response: Optional[httpx.Response], error: Optional[Exception]):
+    status = response.status_code if response is not None else "error"
+    metrics.PROVIDER_RESPONSES.inc(host=httpx.URL(url).host, status=status, route=current_route())
+
+
+def _refund(rate_limit: Optional[tuple]):
+    # A retried attempt did no work upstream: its tokens go back (the request still counts)
+    if rate_limit is not None and rate_limit[1]:
+        rate_limiter.settle(rate_limit[0], rate_limit[1], 0)
+
+
+def _should_retry(response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+    if error is not None:
+        return isinstance(error, httpx.TransportError)
+    return response.status_code in RETRY_STATUS_CODES
+
+
+def request(method: str, url: str, *, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+            rate_limit: Optional[tuple] = None, **kwargs) -> httpx.Response:
+    """Send a request on the shared sync client, retrying 429/5xx and transport errors."""
+    client = get_client()
+    retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(retries + 1):
+        if rate_limit is not None:
+            rate_limiter.acquire(*rate_limit)
+        response, error = None, None
+        try:
+            response = client.request(method, url, timeout=_timeout(timeout), **kwargs)
+        except httpx.TransportError as e:
+            error = e
+        _record(url, response, error)
+
+        if attempt == retries or not _should_retry(response, error):
+            if error is not None:
+                raise error
+            return response
+
+        _refund(rate_limit)
+        delay = _retry_delay(response, attempt)
+        print(f"[warn] {method} {url} -> {response.status_code if response is not None else error!r}; "
+              f"retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+        time.sleep(delay)
+
+
+async def arequest(method: str, url: str, *, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                   rate_limit: Optional[tuple] = None, **kwargs) -> httpx.Response:
+    """Async counterpart of `request` on the shared async client."""
+    client = get_async_client()
+    retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(retries + 1):
+        if rate_limit is not None:
+            await rate_limiter.aacquire(*rate_limit)
+        response, error = None, None
+        try:
+            response = await client.request(method, url, timeout=_timeout(timeout), **kwargs)
+        except httpx.TransportError as e:
+            error = e
+        _record(url, response, error)
+
+        if attempt == retries or not _should_retry(response, error):
+            if error is not None:
+                raise error
+            return response
+
+        _refund(rate_limit)
+        delay = _retry_delay(response, attempt)
+        print(f"[warn] {method} {url} -> {response.status_code if response is not None else error!r}; "
+              f"retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+        await asyncio.sleep(delay)
+
+
+class Multipart:
+    """
+    multipart/form-data body for the async client. httpx reads `files=` with
+    blocking file reads on the event loop; here each piece of a file part is
+    read on a worker thread instead. `data` values may be lists (repeated
+    fields), file parts are `(filename, file or bytes, content_type)`. The
+    body can be iterated again, so retries resend it from the start.
+    Pass it as `content=` along with `headers`.
+    """
+
+    def __init__(self, data: dict, files: dict):
+        self.boundary = os.urandom(16).hex()
+        self._parts = []
+        for name, values in data.items():
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                self._parts.append(self._header(f'name="{name}"') + str(value).encode() + b"\r\n")
+        for name, (filename, file, content_type) in files.items():
+            self._parts.append(self._header(f'name="{name}"; filename="{filename}"', content_type))
+            # File objects are read from where they are now to the end
+            self._parts.append(file if isinstance(file, bytes) else (file, file.tell(), _remaining(file)))
+            self._parts.append(b"\r\n")
+        self._parts.append(f"--{self.boundary}--\r\n".encode())
+
+    def _header(self, disposition: str, content_type: Optional[str] = None) -> bytes:
+        header = f"--{self.boundary}\r\nContent-Disposition: form-data; {disposition}\r\n"
+        if content_type:
+            header += f"Content-Type: {content_type}\r\n"
+        return (header + "\r\n").encode()
+
+    @property
+    def headers(self) -> dict:
+        size = sum(len(part) if isinstance(part, bytes) else part[2] for part in self._parts)
+        return {"Content-Type": f"multipart/form-data; boundary={self.boundary}", "Content-Length": str(size)}
+
+    async def __aiter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            file, start, _ = part
+            await asyncio.to_thread(file.seek, start)
+            while chunk := await asyncio.to_thread(file.read, UPLOAD_CHUNK_BYTES):
+                yield chunk
+
+
+def _remaining(file) -> int:
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size - position
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+async def astream_lines(method: str, url: str, *, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                        rate_limit: Optional[tuple] = None, **kwargs) -> AsyncIterator[str]:
+    """
+    Stream a response line by line on the shared async client. Retries happen
+    only before the first line is yielded; a failure mid-stream is raised.
+    """
+    client = get_async_client()
+    retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(retries + 1):
+        if rate_limit is not None:
+            await rate_limiter.aacquire(*rate_limit)
+        started = responded = False
+        try:
+            async with client.stream(method, url, timeout=_timeout(timeout), **kwargs) as response:
+                _record(url, response, None)
+                responded = True
+                if attempt == retries or response.status_code not in RETRY_STATUS_CODES:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        started = True
+                        yield line
+                    return
+                delay = _retry_delay(response, attempt)
+                print(f"[warn] {method} {url} -> {response.status_code}; "
+                      f"retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+        except httpx.TransportError as e:
+            if not responded:
+                _record(url, None, e)
+            if started or attempt == retries:
+                raise
+            delay = _retry_delay(None, attempt)
+            print(f"[warn] {method} {url} -> {e!r}; retrying in {delay:.2f}s ({attempt + 1}/{retries})")
+        _refund(rate_limit)
+        await asyncio.sleep(delay)
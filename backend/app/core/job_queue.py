@@ -0,0 +1,294 @@
+# app/core/job_queue.py
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from app.core import metrics
+from app.core.settings import settings
+from app.core.tracing import trace_scope
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    user_id TEXT,
+    batch_id TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_user ON jobs (status, user_id);
+"""
+
+
+class JobQueue:
+    """
+    Durable job queue backed by a local SQLite file, drained by a bounded
+    pool of worker threads. Jobs left in `running` by a crash are re-queued
+    on startup, so nothing depends on an outside broker.
+
+    Claiming is fair across users: the next job comes from the user with the
+    fewest running jobs, and no user runs more than `max_per_user` at once.
+    """
+
+    def __init__(self, path: str, workers: int, max_attempts: int, poll_interval: float, max_per_user: int):
+        self.path = path
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Setup
+    # ------------------------------------------------------------------ #
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def register(self, kind: str, handler: Callable[[dict], Optional[dict]], on_failure: Optional[Callable] = None):
+        """
+        Register the handler for a job kind. `on_failure(payload, error, will_retry)`
+        is called whenever an attempt raises.
+        """
+        self._handlers[kind] = (handler, on_failure)
+
+    # ------------------------------------------------------------------ #
+    # Producer side
+    # ------------------------------------------------------------------ #
+
+    def enqueue(self, kind: str, payload: dict, user_id: Optional[str] = None,
+                batch_id: Optional[str] = None, job_id: Optional[str] = None, delay: float = 0) -> str:
+        """
+        Queue a job, to run no earlier than `delay` seconds from now; pass
+        `job_id` when it has to be recorded elsewhere before the job may run.
+        """
+        self._ensure_schema()
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, user_id, batch_id, status, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), user_id, batch_id, now + delay, now, now),
+            )
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return _row_to_dict(row) if row else None
+
+    def list_batch(self, batch_id: str, user_id: str) -> list:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? AND user_id = ? ORDER BY created_at",
+                (batch_id, user_id),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [_row_to_dict(row) for row in rows]
+
+    def depth(self) -> int:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+        finally:
+            conn.close()
+
+    def depths(self) -> dict:
+        """Queued / running job counts, for the queue depth gauge."""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+            ).fetchall()
+        finally:
+            conn.close()
+        counts = {("queued",): 0, ("running",): 0}
+        counts.update({(row["status"],): row["n"] for row in rows})
+        return counts
+
+    # ------------------------------------------------------------------ #
+    # Worker side
+    # ------------------------------------------------------------------ #
+
+    def start(self):
+        if self._threads:
+            return
+        self._ensure_schema()
+        self._requeue_interrupted()
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"✅ Job queue started with {self.workers} workers ({self.path})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _requeue_interrupted(self):
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),),
+            )
+            if cur.rowcount:
+                print(f"[info] Re-queued {cur.rowcount} interrupted job(s)")
+        finally:
+            conn.close()
+
+    def _claim(self) -> Optional[dict]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT j.* FROM jobs j "
+                "LEFT JOIN ("
+                "  SELECT user_id, COUNT(*) AS running FROM jobs WHERE status = 'running' GROUP BY user_id"
+                ") r ON r.user_id IS j.user_id "
+                "WHERE j.status = 'queued' AND j.run_after <= ? AND COALESCE(r.running, 0) < ? "
+                "ORDER BY COALESCE(r.running, 0), j.run_after, j.created_at LIMIT 1",
+                (now, self.max_per_user),
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            job = _row_to_dict(row)
+            job["attempts"] += 1
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None,
+                result: Optional[dict] = None, run_after: Optional[float] = None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, run_after = COALESCE(?, run_after), "
+                "updated_at = ? WHERE id = ?",
+                (status, error, json.dumps(result) if result is not None else None, run_after, now, job_id),
+            )
+        finally:
+            conn.close()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"[warn] Job claim failed: {e}")
+                job = None
+
+            if not job:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._run(job)
+            # A finished job may unblock a user that was at its concurrency cap
+            self._wakeup.set()
+
+    def _run(self, job: dict):
+        handler, on_failure = self._handlers.get(job["kind"], (None, None))
+        if not handler:
+            self._finish(job["id"], "failed", error=f"No handler for job kind '{job['kind']}'")
+            return
+
+        try:
+            # Spans and Firestore/GCS metrics from the handler are labelled with the job kind
+            with trace_scope(f"job:{job['kind']}"):
+                result = handler(job["payload"])
+            self._finish(job["id"], "done", result=result)
+        except Exception as e:
+            will_retry = job["attempts"] < self.max_attempts
+            print(f"[warn] Job {job['kind']} {job['id']} failed (attempt {job['attempts']}): {e}")
+            if will_retry:
+                backoff = min(2 ** job["attempts"] * 5, 300)
+                self._finish(job["id"], "queued", error=str(e), run_after=time.time() + backoff)
+            else:
+                self._finish(job["id"], "failed", error=str(e))
+            if on_failure:
+                try:
+                    on_failure(job["payload"], str(e), will_retry)
+                except Exception as hook_error:
+                    print(f"[warn] Job failure hook raised: {hook_error}")
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    if job.get("result"):
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+job_queue = JobQueue(
+    path=settings.JOB_QUEUE_PATH,
+    workers=settings.JOB_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    max_per_user=settings.JOB_MAX_PER_USER,
+)
+
+metrics.JOB_QUEUE_DEPTH.set_function(job_queue.depths)
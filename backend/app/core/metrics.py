@@ -0,0 +1,236 @@
+# app/core/metrics.py
+
+"""
+In-process metrics in the Prometheus text exposition format, served at
+`/metrics`.
+
+Counters, gauges and histograms with labels, kept in one process-wide
+registry. Gauges that describe state owned elsewhere (queue depths, provider
+health) are filled by a callback at scrape time instead of being kept up to
+date on every change.
+
+All metrics the app exports are declared at the bottom of this module so the
+names stay in one place.
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Seconds: auth / Firestore calls up to long transcriptions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Bytes: 64 KiB .. 1 GiB
+SIZE_BUCKETS = tuple(float(64 * 1024 * 4 ** i) for i in range(8))
+# Seconds of audio: 10 s .. 4 h
+AUDIO_SECONDS_BUCKETS = (10, 30, 60, 300, 600, 1200, 1800, 3600, 7200, 14400)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label pairs, value) for every series."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count; by convention the name ends in `_total`."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", zip(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Dict[tuple, float]]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, fn: Callable[[], Dict[tuple, float]]):
+        """Read the gauge from `fn()` at scrape time: {label values tuple: value}."""
+        self._function = fn
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                items = list(self._function().items())
+            except Exception as e:
+                print(f"[warn] Metrics callback for {self.name} failed: {e}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            yield "", zip(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield "_bucket", labels + [("le", _format_value(bound))], cumulative
+            yield "_bucket", labels + [("le", "+Inf")], count
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+                series = f"{metric.name}{suffix}{{{label_text}}}" if label_text else f"{metric.name}{suffix}"
+                lines.append(f"{series} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+# ---------------------------------------------------------------------- #
+# Metrics exported by the app
+# ---------------------------------------------------------------------- #
+
+HTTP_REQUESTS = Counter(
+    "slai_http_requests_total", "HTTP requests served.", ["method", "route", "status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "slai_http_request_duration_seconds", "HTTP request latency until the response is complete.",
+    ["method", "route"])
+SPAN_SECONDS = Histogram(
+    "slai_span_duration_seconds", "Time spent in traced operations (auth, firestore, gcs, model calls) per route.",
+    ["span", "route"])
+
+PIPELINE_SECONDS = Histogram(
+    "slai_pipeline_duration_seconds", "Pipeline call latency (time to first item for streams).",
+    ["provider", "method", "outcome"])
+PROVIDER_HEALTHY = Gauge(
+    "slai_provider_healthy", "1 while the router considers the provider healthy, 0 during its cooldown.",
+    ["provider", "model", "method"])
+PROVIDER_RESPONSES = Counter(
+    "slai_provider_responses_total", "Responses from upstream APIs by status code, retries included "
+    "(status=\"error\" for transport failures), per route (or job kind).", ["host", "status", "route"])
+LLM_TOKENS = Counter(
+    "slai_llm_tokens_total", "Tokens reported by the model APIs.", ["model", "kind"])
+SUMMARY_CHUNKS = Counter(
+    "slai_summary_chunks_total", "Map-step chunk summaries reused from earlier runs vs computed.", ["result"])
+TRANSCRIPT_CACHE = Counter(
+    "slai_transcript_cache_total", "Transcriptions served from the content-addressed transcript cache (\"hit\") vs "
+    "run (\"miss\", expired entries included).", ["result"])
+TRANSCRIPT_CACHE_ENTRIES = Gauge(
+    "slai_transcript_cache_entries", "Entries in the local transcript cache.")
+HIGHLIGHT_ANSWER_CACHE = Counter(
+    "slai_highlight_answer_cache_total", "Highlight questions answered from the per-source answer cache "
+    "(result=\"exact\" or \"semantic\" match) vs sent to the model (\"miss\").", ["result"])
+
+TRANSCRIPTION_AUDIO_BYTES = Histogram(
+    "slai_transcription_audio_bytes", "Size of the audio per transcription, as stored (stage=\"source\") and as "
+    "sent to the provider after preprocessing (stage=\"upload\").", ["provider", "stage"], buckets=SIZE_BUCKETS)
+TRANSCRIPTION_AUDIO_SECONDS = Histogram(
+    "slai_transcription_audio_seconds", "Duration of the audio per transcription (when probed), as stored and as "
+    "sent after silence trimming.", ["provider", "stage"], buckets=AUDIO_SECONDS_BUCKETS)
+LIVE_TRANSCRIPT_READY_SECONDS = Histogram(
+    "slai_live_transcript_ready_seconds", "Time from the end of a live recording until its transcript is saved.",
+    ["outcome"])
+
+FIRESTORE_DOCUMENTS = Counter(
+    "slai_firestore_documents_total", "Firestore documents read / written, per route (or job kind).",
+    ["op", "route"])
+SOURCE_CACHE = Counter(
+    "slai_source_cache_total", "Source document reads served by the request's identity map (result=\"request\"), "
+    "the process-wide cache (\"hit\") or Firestore (\"miss\").", ["result"])
+GCS_BYTES = Counter(
+    "slai_gcs_bytes_total", "Bytes transferred to and from GCS, per route (or job kind).", ["direction", "route"])
+
+JOB_QUEUE_DEPTH = Gauge(
+    "slai_job_queue_depth", "Background jobs by state.", ["state"])
+RATE_LIMIT_QUEUE_DEPTH = Gauge(
+    "slai_rate_limit_queue_depth", "Provider calls waiting for rate-limit capacity.", ["model"])
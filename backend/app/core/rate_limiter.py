@@ -0,0 +1,242 @@
+# app/core/rate_limiter.py
+
+"""
+Client-side rate limiting for provider quotas.
+
+Each model gets two token buckets refilled continuously: requests per minute
+and tokens per minute. A call reserves one request plus its estimated token
+cost before it is sent and waits (instead of failing) until both buckets can
+cover it. Once the provider reports the real usage, the difference is
+refunded or charged.
+
+Waiting calls are served fairly across users: the next grant goes to the user
+with the least tokens served so far (start-time fair queuing), so one bulk
+uploader queues behind everyone else rather than ahead of them.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from app.core import metrics
+from app.core.request_context import get_user_id
+from app.core.settings import settings
+from app.utils.text_utils import estimate_tokens
+
+# Wait used when a call is blocked by another user's turn rather than by the buckets
+_TURN_POLL_SECONDS = 0.05
+
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, clock: Callable[[], float]):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # oversized requests only need a full bucket
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + delta)
+
+
+class _Ticket:
+    __slots__ = ("user_id", "cost", "seq")
+
+    def __init__(self, user_id: str, cost: int, seq: int):
+        self.user_id = user_id
+        self.cost = cost
+        self.seq = seq
+
+
+class _ModelQueue:
+    def __init__(self, rpm: float, tpm: float, clock: Callable[[], float]):
+        self.requests = TokenBucket(rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self.waiting = {}  # user -> deque of tickets, in arrival order
+        self.served = {}  # user -> tokens granted (virtual time)
+
+    def enqueue(self, ticket: _Ticket):
+        if ticket.user_id not in self.waiting:
+            # A user joining the queue starts at the current virtual time, without banked credit
+            active = [self.served.get(u, 0) for u in self.waiting]
+            self.served[ticket.user_id] = max(self.served.get(ticket.user_id, 0), min(active, default=0))
+            self.waiting[ticket.user_id] = deque()
+        self.waiting[ticket.user_id].append(ticket)
+
+    def remove(self, ticket: _Ticket):
+        queue = self.waiting.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self.waiting[ticket.user_id]
+        if not self.waiting:
+            self.served.clear()
+
+    def try_grant(self, ticket: _Ticket) -> float:
+        """0 if `ticket` was granted, otherwise how long to wait before trying again."""
+        next_user = min(self.waiting, key=lambda u: (self.served.get(u, 0), self.waiting[u][0].seq))
+        if self.waiting[next_user][0] is not ticket:
+            return _TURN_POLL_SECONDS
+
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens and ticket.cost:
+            wait = max(wait, self.tokens.wait_time(ticket.cost))
+        if wait > 0:
+            return wait
+
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens and ticket.cost:
+            self.tokens.take(ticket.cost)
+        self.served[ticket.user_id] = self.served.get(ticket.user_id, 0) + max(ticket.cost, 1)
+        self.remove(ticket)
+        return 0.0
+
+
+class RateLimiter:
+    def __init__(self, limits: dict, max_wait: float, clock: Callable[[], float] = time.monotonic):
+        """`limits` maps model -> (requests per minute, tokens per minute); 0 means unlimited."""
+        self.limits = limits
+        self.max_wait = max_wait
+        self.clock = clock
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._seq = itertools.count()
+
+    def _queue(self, model: str) -> Optional[_ModelQueue]:
+        limits = self.limits.get(model)
+        if not limits:
+            return None
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(*limits, clock=self.clock)
+        return queue
+
+    def _enqueue(self, model: str, cost: int, user_id: Optional[str]):
+        with self._lock:
+            queue = self._queue(model)
+            if queue is None:
+                return None, None
+            ticket = _Ticket(user_id or "", cost, next(self._seq))
+            queue.enqueue(ticket)
+            return queue, ticket
+
+    def _give_up(self, queue: _ModelQueue, ticket: _Ticket, model: str, waited: float):
+        with self._lock:
+            queue.remove(ticket)
+            self._changed.notify_all()
+        raise RateLimitTimeout(f"Waited {waited:.0f}s for {model} rate limit capacity")
+
+    def acquire(self, model: str, cost: int = 0, user_id: Optional[str] = None):
+        """Block until a call to `model` costing `cost` tokens may be sent."""
+        queue, ticket = self._enqueue(model, cost, user_id or get_user_id())
+        if queue is None:
+            return
+        started = self.clock()
+        with self._lock:
+            while True:
+                wait = queue.try_grant(ticket)
+                if wait == 0:
+                    self._changed.notify_all()
+                    return
+                waited = self.clock() - started
+                if self.max_wait and waited + wait > self.max_wait:
+                    break
+                self._changed.wait(wait)
+        self._give_up(queue, ticket, model, waited)
+
+    async def aacquire(self, model: str, cost: int = 0, user_id: Optional[str] = None):
+        """Async `acquire`: waits without holding a thread."""
+        queue, ticket = self._enqueue(model, cost, user_id or get_user_id())
+        if queue is None:
+            return
+        started = self.clock()
+        try:
+            while True:
+                with self._lock:
+                    wait = queue.try_grant(ticket)
+                    if wait == 0:
+                        self._changed.notify_all()
+                        return
+                waited = self.clock() - started
+                if self.max_wait and waited + wait > self.max_wait:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        except asyncio.CancelledError:
+            with self._lock:
+                queue.remove(ticket)
+                self._changed.notify_all()
+            raise
+        self._give_up(queue, ticket, model, waited)
+
+    def queue_depths(self) -> dict:
+        """Calls waiting for capacity, per model."""
+        with self._lock:
+            return {
+                (model,): sum(len(tickets) for tickets in queue.waiting.values())
+                for model, queue in self._queues.items()
+            }
+
+    def settle(self, model: str, reserved: int, used: Optional[int]):
+        """Refund (or charge) the difference between the estimated and the reported token usage."""
+        if used is None:
+            return
+        with self._lock:
+            queue = self._queue(model)
+            if queue is not None and queue.tokens:
+                queue.tokens.adjust(reserved - used)
+                self._changed.notify_all()
+
+
+def chat_cost(payload: dict) -> int:
+    """Estimated tokens of a chat-completions call: prompt plus the completion budget."""
+    prompt = sum(estimate_tokens(m.get("content") or "") + 4 for m in payload.get("messages", []))
+    return prompt + int(payload.get("max_tokens") or 0)
+
+
+def _parse_limits(config: str) -> dict:
+    # RATE_LIMITS="model=rpm/tpm,..." (tpm may be omitted or 0 for request-only limits)
+    limits = {}
+    for entry in filter(None, (part.strip() for part in config.split(","))):
+        model, _, budget = entry.partition("=")
+        rpm, _, tpm = budget.partition("/")
+        try:
+            limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+        except ValueError:
+            print(f"[warn] Ignoring malformed RATE_LIMITS entry: {entry}")
+    return limits
+
+
+rate_limiter = RateLimiter(
+    limits=_parse_limits(settings.RATE_LIMITS),
+    max_wait=settings.RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+
+metrics.RATE_LIMIT_QUEUE_DEPTH.set_function(rate_limiter.queue_depths)
@@ -0,0 +1,36 @@
+# app/core/request_context.py
+
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# User on whose behalf the current code runs (used for fair scheduling of provider calls)
+_current_user_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_user_id", default=None)
+
+
+def get_user_id() -> Optional[str]:
+    return _current_user_id.get()
+
+
+def set_user_id(user_id: Optional[str]):
+    """Set the user for the rest of the current task (e.g. inside a streaming generator)."""
+    _current_user_id.set(user_id)
+
+
+@contextmanager
+def user_scope(user_id: Optional[str]):
+    token = _current_user_id.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user_id.reset(token)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    Wrap `fn` so it runs with the caller's context variables. Thread pools do
+    not propagate contextvars on their own; use this when submitting work.
+    """
+    context = contextvars.copy_context()
+    # Each call gets its own copy: one Context cannot be entered by two threads at once
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
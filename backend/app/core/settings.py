@@ -7,6 +7,121 @@ class Settings:
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     GCS_AUDIO_BUCKET: str = os.getenv("GCS_AUDIO_BUCKET", "")
 
+    # OpenAI-compatible Groq endpoint (point at a proxy or the bench/ fake server)
+    GROQ_API_BASE_URL: str = os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+
+    # Extra pipeline providers ("name=module:Class,...") and startup warm-up
+    PIPELINE_PROVIDERS: str = os.getenv("PIPELINE_PROVIDERS", "")
+    PIPELINE_WARMUP: bool = os.getenv("PIPELINE_WARMUP", "true").lower() == "true"
+
+    # Provider routing: fallbacks ("provider=alt1|alt2,..."), health tracking and hedged requests
+    ROUTER_FALLBACKS: str = os.getenv("ROUTER_FALLBACKS", "groq_summarizer=local_summarizer,groq_highlight=local_highlight")
+    ROUTER_WINDOW: int = int(os.getenv("ROUTER_WINDOW", "50"))
+    ROUTER_MIN_SAMPLES: int = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+    ROUTER_ERROR_THRESHOLD: float = float(os.getenv("ROUTER_ERROR_THRESHOLD", "0.5"))
+    ROUTER_COOLDOWN_SECONDS: float = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30"))
+    ROUTER_HEDGING: bool = os.getenv("ROUTER_HEDGING", "false").lower() == "true"
+    ROUTER_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("ROUTER_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+
+    # Client-side provider quotas ("model=requests_per_minute/tokens_per_minute,..."); off unless set to the
+    # account's limits (a per-minute token budget below one call's cost would stall every call to a full bucket)
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "")
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "300"))
+
+    # Coalescing of duplicate transcribe/summarize work (in-process + Firestore leases) and Idempotency-Key
+    SINGLE_FLIGHT_DISTRIBUTED: bool = os.getenv("SINGLE_FLIGHT_DISTRIBUTED", "true").lower() == "true"
+    SINGLE_FLIGHT_LEASE_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "60"))
+    SINGLE_FLIGHT_POLL_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "1"))
+    SINGLE_FLIGHT_MAX_WAIT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_MAX_WAIT_SECONDS", "1800"))
+    IDEMPOTENCY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
+    # Prometheus metrics at /metrics (optionally behind a bearer token) and request spans
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    TRACE_SLOW_REQUEST_SECONDS: float = float(os.getenv("TRACE_SLOW_REQUEST_SECONDS", "5"))  # 0 = never log traces
+
+    # Firebase ID token cache (0 disables periodic revocation checks)
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_REVOCATION_CHECK_SECONDS: float = float(os.getenv("AUTH_REVOCATION_CHECK_SECONDS", "0"))
+
+    # Background jobs (SQLite-backed, survives restarts)
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_MAX_PER_USER: int = int(os.getenv("JOB_MAX_PER_USER", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+
+    # Shared outbound HTTP client (provider APIs)
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "120"))
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    HTTP_MAX_RETRIES: int = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+    HTTP_RETRY_BASE_DELAY_SECONDS: float = float(os.getenv("HTTP_RETRY_BASE_DELAY_SECONDS", "0.5"))
+    HTTP_RETRY_MAX_DELAY_SECONDS: float = float(os.getenv("HTTP_RETRY_MAX_DELAY_SECONDS", "30"))
+
+    # Chunked transcription for long recordings (requires ffmpeg)
+    TRANSCRIBE_CHUNKING: bool = os.getenv("TRANSCRIBE_CHUNKING", "true").lower() == "true"
+    TRANSCRIBE_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+    TRANSCRIBE_CHUNK_OVERLAP_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_OVERLAP_SECONDS", "2"))
+    TRANSCRIBE_MAX_CONCURRENCY: int = int(os.getenv("TRANSCRIBE_MAX_CONCURRENCY", "4"))
+    TRANSCRIBE_MAX_UPLOAD_BYTES: int = int(os.getenv("TRANSCRIBE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+    # Audio preprocessing before transcription (requires ffmpeg): 16 kHz mono FLAC/Opus, optional silence trimming
+    AUDIO_PREPROCESS: bool = os.getenv("AUDIO_PREPROCESS", "true").lower() == "true"
+    AUDIO_PREPROCESS_CODEC: str = os.getenv("AUDIO_PREPROCESS_CODEC", "flac")  # "flac" or "opus"
+    AUDIO_OPUS_BITRATE: str = os.getenv("AUDIO_OPUS_BITRATE", "32k")
+    AUDIO_TRIM_SILENCE: bool = os.getenv("AUDIO_TRIM_SILENCE", "false").lower() == "true"
+    AUDIO_TRIM_MIN_SILENCE_SECONDS: float = float(os.getenv("AUDIO_TRIM_MIN_SILENCE_SECONDS", "2"))
+    AUDIO_TRIM_KEEP_SECONDS: float = float(os.getenv("AUDIO_TRIM_KEEP_SECONDS", "0.3"))
+    AUDIO_TRIM_NOISE_DB: int = int(os.getenv("AUDIO_TRIM_NOISE_DB", "-35"))
+
+    # Live transcription over WebSocket (requires ffmpeg): rolling windows re-sent every LIVE_PARTIAL_SECONDS,
+    # text committed once it is LIVE_HOLDBACK_SECONDS behind the live edge
+    LIVE_WINDOW_SECONDS: float = float(os.getenv("LIVE_WINDOW_SECONDS", "30"))
+    LIVE_PARTIAL_SECONDS: float = float(os.getenv("LIVE_PARTIAL_SECONDS", "10"))
+    LIVE_HOLDBACK_SECONDS: float = float(os.getenv("LIVE_HOLDBACK_SECONDS", "5"))
+    # Longest / largest live recording accepted; later audio is dropped and the session stops
+    LIVE_MAX_SECONDS: float = float(os.getenv("LIVE_MAX_SECONDS", str(4 * 3600)))
+    LIVE_MAX_BYTES: int = int(os.getenv("LIVE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+    # Streaming audio downloads from GCS
+    GCS_READ_CHUNK_BYTES: int = int(os.getenv("GCS_READ_CHUNK_BYTES", str(4 * 1024 * 1024)))
+    AUDIO_SPOOL_MAX_BYTES: int = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+    # Transcript/summary bodies stored gzip-compressed in GCS above this size
+    TEXT_OFFLOAD_MIN_BYTES: int = int(os.getenv("TEXT_OFFLOAD_MIN_BYTES", "4096"))
+    TEXT_BLOB_PREFIX: str = os.getenv("TEXT_BLOB_PREFIX", "text")
+
+    # Source documents: read-through cache per process (writes from this process update it in place)
+    SOURCE_CACHE_TTL_SECONDS: float = float(os.getenv("SOURCE_CACHE_TTL_SECONDS", "10"))  # 0 = per-request only
+    SOURCE_CACHE_MAX_ENTRIES: int = int(os.getenv("SOURCE_CACHE_MAX_ENTRIES", "2000"))
+
+    # Content-addressed transcript cache
+    TRANSCRIPT_CACHE_ENABLED: bool = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+    TRANSCRIPT_CACHE_PATH: str = os.getenv("TRANSCRIPT_CACHE_PATH", "transcript_cache.sqlite3")
+    TRANSCRIPT_CACHE_TTL_SECONDS: float = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    TRANSCRIPT_CACHE_MAX_ENTRIES: int = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "5000"))
+
+    # Map-reduce summarization for long transcripts
+    SUMMARY_SINGLE_PASS_TOKENS: int = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", "6000"))
+    SUMMARY_CHUNK_TOKENS: int = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+    SUMMARY_MAX_CONCURRENCY: int = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+    # Summaries from the local fallback are redone by a later job (0 retries keeps them)
+    SUMMARY_FALLBACK_RETRIES: int = int(os.getenv("SUMMARY_FALLBACK_RETRIES", "3"))
+    SUMMARY_FALLBACK_RETRY_SECONDS: float = float(os.getenv("SUMMARY_FALLBACK_RETRY_SECONDS", "600"))
+
+    # Highlight context retrieval ("bm25" or "hybrid" = BM25 + sentence embeddings)
+    HIGHLIGHT_RETRIEVAL_MODE: str = os.getenv("HIGHLIGHT_RETRIEVAL_MODE", "bm25")
+    HIGHLIGHT_EMBEDDING_MODEL: str = os.getenv("HIGHLIGHT_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    HIGHLIGHT_TOP_K: int = int(os.getenv("HIGHLIGHT_TOP_K", "8"))
+
+    # Reuse answers to repeated highlight questions (embedding match needs hybrid mode)
+    HIGHLIGHT_ANSWER_CACHE: bool = os.getenv("HIGHLIGHT_ANSWER_CACHE", "true").lower() == "true"
+    HIGHLIGHT_ANSWER_SIMILARITY: float = float(os.getenv("HIGHLIGHT_ANSWER_SIMILARITY", "0.9"))
+    HIGHLIGHT_ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("HIGHLIGHT_ANSWER_CACHE_MAX_ENTRIES", "200"))
+
     def __init__(self):
         frontend_url = os.getenv("FRONTEND_URL")
         if frontend_url:
@@ -0,0 +1,205 @@
+# app/core/tracing.py
+
+"""
+Lightweight request tracing, shaped like OpenTelemetry spans.
+
+Every HTTP request (and every background job) gets a trace; code wraps the
+parts worth timing in `span("firestore.read")`, `span("gcs.download")`,
+`span("model.groq_summarizer")`, ... Spans carry trace / span / parent ids
+and attributes, nest through contextvars (so they follow `asyncio.to_thread`
+and `bind_context`), and on exit feed `slai_span_duration_seconds` labelled
+with the route that caused them.
+
+Per request the span times are summed by kind into a `Server-Timing`
+response header (auth, firestore, gcs, model, ...), and requests slower than
+TRACE_SLOW_REQUEST_SECONDS log their whole span list as one `[trace]` line.
+An incoming W3C `traceparent` header is honored for the trace id.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core import metrics
+from app.core.settings import settings
+
+# Spans kept per trace for the slow-request log; metrics are recorded regardless
+MAX_SPANS_PER_TRACE = 500
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    def __init__(self, route: str = "", trace_id: Optional[str] = None, parent_id: Optional[str] = None, scope=None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.parent_id = parent_id
+        self.spans = []
+        self.started = time.monotonic()
+        self._route = route
+        self._scope = scope
+
+    @property
+    def route(self) -> str:
+        # The route template ("/api/v1/summary/{source_id}") is only known once FastAPI has matched the request
+        if self._scope is None:
+            return self._route
+        route = self._scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def server_timing(self) -> str:
+        totals = {}
+        for s in self.spans:
+            kind = s.name.split(".", 1)[0]
+            totals[kind] = totals.get(kind, 0.0) + s.duration
+        entries = [f"{kind};dur={seconds * 1000:.1f}" for kind, seconds in totals.items()]
+        entries.append(f"total;dur={(time.monotonic() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def log(self, summary: str):
+        print(f"[trace] {summary} " + json.dumps({
+            "traceId": self.trace_id,
+            "spans": [s.to_dict() for s in self.spans],
+        }, default=str))
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.trace = _current_trace.get()
+        parent = _current_span.get()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else (self.trace.parent_id if self.trace else None)
+        self.started = time.monotonic()
+        self.start_offset = self.started - self.trace.started if self.trace else 0.0
+        self.duration = None
+        self.status = "ok"
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.duration is not None:
+            return
+        self.duration = time.monotonic() - self.started
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = type(error).__name__
+        metrics.SPAN_SECONDS.observe(self.duration, span=self.name, route=current_route(self.trace))
+        if self.trace is not None and len(self.trace.spans) < MAX_SPANS_PER_TRACE:
+            self.trace.spans.append(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "start": round(self.start_offset, 4),
+            "duration": round(self.duration or 0.0, 4),
+            "status": self.status,
+            **({"attributes": self.attributes} if self.attributes else {}),
+        }
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def span(name: str, **attributes) -> Span:
+    """
+    A span for `with` / `async with`. Keep names low-cardinality ("kind.what");
+    request-specific values go in attributes. A span that is not entered can
+    be finished with `.end()` (e.g. around a lazily consumed stream).
+    """
+    return Span(name, attributes)
+
+
+def current_route(trace: Optional[Trace] = None) -> str:
+    """Route label for metrics: the matched route template, the job kind, or "background"."""
+    trace = trace or _current_trace.get()
+    return trace.route if trace is not None else "background"
+
+
+@contextmanager
+def trace_scope(route: str):
+    """Start a new trace for work that is not an HTTP request (e.g. a background job)."""
+    trace = Trace(route=route)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        elapsed = time.monotonic() - trace.started
+        if settings.TRACE_SLOW_REQUEST_SECONDS and elapsed >= settings.TRACE_SLOW_REQUEST_SECONDS:
+            trace.log(f"{route} {elapsed:.2f}s")
+
+
+def _parse_traceparent(value: Optional[str]):
+    # "00-<32 hex trace id>-<16 hex parent span id>-<2 hex flags>"
+    parts = (value or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None, None
+        return parts[1], parts[2]
+    return None, None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: one trace per HTTP request, request count / latency
+    metrics per route template, and a Server-Timing header. Latency is taken
+    when the response body is complete, so SSE streams count their full length.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        trace = Trace(trace_id=trace_id, parent_id=parent_id, scope=scope)
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"server-timing", trace.server_timing().encode("latin-1"))],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.monotonic() - trace.started
+            route = trace.route
+            metrics.HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+            metrics.HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route)
+            if settings.TRACE_SLOW_REQUEST_SECONDS and elapsed >= settings.TRACE_SLOW_REQUEST_SECONDS:
+                trace.log(f"{scope['method']} {route} {status} {elapsed:.2f}s")
@@ -1,14 +1,39 @@
 # app/main.py
 
-from fastapi import FastAPI
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
 from app.core.settings import settings
+from app.core.job_queue import job_queue
+from app.core import http_client, metrics
+from app.core.tracing import TracingMiddleware
+from app.services.model_registry import get_registry
+from app.services import sentence_index, source_repository
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Import pipelines, open provider connections and load local models up front
+    if settings.PIPELINE_WARMUP:
+        await asyncio.to_thread(get_registry().warm_up)
+        await asyncio.to_thread(sentence_index.warm_up)
+
+    # Start background workers (transcription / summary jobs)
+    job_queue.start()
+    yield
+    job_queue.stop()
+    await http_client.aclose()
+
 
 app = FastAPI(
     title="SLAI API",
     description="Bridging Science and Language with AI — Multi-Tool Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS for frontend access
@@ -18,11 +43,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Source documents are read at most once per request
+app.add_middleware(source_repository.ScopeMiddleware)
+
+# Outermost, so request latency includes everything below it
+if settings.METRICS_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Register all API routes
 app.include_router(api_router, prefix="/api/v1")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    # Queue depth gauges query SQLite: render off the event loop
+    body = await asyncio.to_thread(metrics.registry.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {
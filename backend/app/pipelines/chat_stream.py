@@ -0,0 +1,61 @@
+# app/pipelines/chat_stream.py
+
+import json
+from typing import AsyncIterator
+from app.core import http_client, metrics
+from app.core.rate_limiter import chat_cost, rate_limiter
+
+
+async def achat_completion(url: str, api_key: str, payload: dict) -> str:
+    """Content of a (non-streaming) OpenAI-compatible chat completion."""
+    cost = chat_cost(payload)
+    response = await http_client.apost(
+        url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json=payload,
+        rate_limit=(payload["model"], cost),
+    )
+    response.raise_for_status()
+    body = response.json()
+    _record_usage(payload["model"], cost, body.get("usage"))
+    return body["choices"][0]["message"]["content"].strip()
+
+
+async def astream_chat_completion(url: str, api_key: str, payload: dict) -> AsyncIterator[str]:
+    """Yield content deltas from an OpenAI-compatible streaming chat-completions endpoint."""
+    cost = chat_cost(payload)
+    async for line in http_client.astream_lines(
+        "POST",
+        url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        json={**payload, "stream": True},
+        rate_limit=(payload["model"], cost),
+    ):
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        # Groq reports usage on the last chunk under x_groq, OpenAI-style APIs at the top level
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        if usage:
+            _record_usage(payload["model"], cost, usage)
+        choices = chunk.get("choices") or []
+        delta = choices[0].get("delta", {}).get("content") if choices else None
+        if delta:
+            yield delta
+
+
+def _record_usage(model: str, reserved: int, usage: dict):
+    """Settle the rate-limit reservation against the reported usage and count the tokens."""
+    usage = usage or {}
+    rate_limiter.settle(model, reserved, usage.get("total_tokens"))
+    metrics.LLM_TOKENS.inc(usage.get("prompt_tokens") or 0, model=model, kind="prompt")
+    metrics.LLM_TOKENS.inc(usage.get("completion_tokens") or 0, model=model, kind="completion")
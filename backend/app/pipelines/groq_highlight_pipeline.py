@@ -1,16 +1,55 @@
 # app/pipelines/groq_highlight_pipeline.py
 
 import os
-import requests
+import json
+from typing import AsyncIterator, Tuple
+from app.core import http_client
+from app.core.settings import settings
+from app.pipelines.chat_stream import achat_completion, astream_chat_completion
+from app.utils.async_utils import run_sync
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_API_URL = f"{settings.GROQ_API_BASE_URL}/chat/completions"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODEL = "llama3-70b-8192"
 
 class GroqHighlightPipeline:
+    model = MODEL
+
+    def warm_up(self):
+        http_client.warm_up(GROQ_API_URL)
+
     def run(self, transcript: str, prompt: str):
+        return run_sync(self.arun(transcript, prompt))
+
+    async def arun(self, transcript: str, prompt: str):
         if not transcript or not prompt:
             raise ValueError("Missing input")
 
+        result = await achat_completion(GROQ_API_URL, GROQ_API_KEY, self._payload(transcript, prompt))
+        return json.loads(result)
+
+    async def astream(self, transcript: str, prompt: str) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Stream the highlight as ("sentence" | "answer", text delta) events parsed
+        incrementally from the model's JSON, then a final ("result", {sentence, answer}).
+        """
+        if not transcript or not prompt:
+            raise ValueError("Missing input")
+
+        parser = JsonFieldStreamParser(("sentence", "answer"))
+        raw = []
+        async for delta in astream_chat_completion(GROQ_API_URL, GROQ_API_KEY, self._payload(transcript, prompt)):
+            raw.append(delta)
+            for field, text in parser.feed(delta):
+                yield field, text
+
+        try:
+            result = json.loads("".join(raw).strip())
+        except json.JSONDecodeError:
+            result = parser.values
+        yield "result", {"sentence": result.get("sentence", ""), "answer": result.get("answer", "")}
+
+    def _payload(self, transcript: str, prompt: str) -> dict:
         full_prompt = f"""
 You are a classroom assistant. A teacher is asking:
 
@@ -29,26 +68,101 @@ Respond in JSON format like:
   "answer": "...brief answer to the teacher..."
 }}
 """
+        return {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": full_prompt}
+            ],
+            "temperature": 0.5,
+            "max_tokens": 300
+        }
 
-        response = requests.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "llama3-70b-8192",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": full_prompt}
-                ],
-                "temperature": 0.5,
-                "max_tokens": 300
-            }
-        )
-
-        response.raise_for_status()
-        result = response.json()["choices"][0]["message"]["content"].strip()
-
-        import json
-        return json.loads(result)
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamParser:
+    """
+    Incrementally extracts the string values of selected top-level keys from a
+    JSON object that arrives in arbitrary fragments, emitting text as soon as
+    it is decoded. Anything outside the object (e.g. code fences) is ignored.
+    """
+
+    def __init__(self, fields):
+        self.fields = set(fields)
+        self.values = {}
+        self._mode = "outside"  # outside | key | value | skip
+        self._key = []
+        self._last_key = None
+        self._expect_colon = False
+        self._expect_value = False
+        self._escape = False
+        self._unicode = None
+
+    def feed(self, fragment: str):
+        events = []
+        for ch in fragment:
+            if self._mode == "outside":
+                self._outside(ch)
+                continue
+
+            decoded = self._decode(ch)
+            if decoded is None:
+                continue
+            if decoded is _END:
+                if self._mode == "key":
+                    self._last_key = "".join(self._key)
+                    self._expect_colon = True
+                self._mode = "outside"
+            elif self._mode == "key":
+                self._key.append(decoded)
+            elif self._mode == "value":
+                self.values[self._last_key] = self.values.get(self._last_key, "") + decoded
+                if events and events[-1][0] == self._last_key:
+                    events[-1] = (self._last_key, events[-1][1] + decoded)
+                else:
+                    events.append((self._last_key, decoded))
+        return events
+
+    def _outside(self, ch: str):
+        if ch == '"':
+            if self._expect_value:
+                self._mode = "value" if self._last_key in self.fields else "skip"
+                self._expect_value = False
+            else:
+                self._mode = "key"
+                self._key = []
+        elif ch == ":" and self._expect_colon:
+            self._expect_colon = False
+            self._expect_value = True
+        elif not ch.isspace():
+            self._expect_colon = False
+            self._expect_value = False
+
+    def _decode(self, ch: str):
+        """Decode one character inside a string; None while an escape is incomplete, _END on the closing quote."""
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) < 4:
+                return None
+            code, self._unicode = self._unicode, None
+            try:
+                return chr(int(code, 16))
+            except ValueError:
+                return ""
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+                return None
+            return _ESCAPES.get(ch, ch)
+        if ch == "\\":
+            self._escape = True
+            return None
+        if ch == '"':
+            return _END
+        return ch
+
+
+_END = object()
@@ -1,19 +1,89 @@
 import os
-import requests
 import json
+import asyncio
+import httpx
+from typing import AsyncIterator, Optional
+from app.core import http_client, metrics
+from app.pipelines.chat_stream import achat_completion, astream_chat_completion
+from app.core.settings import settings
+from app.utils.async_utils import run_sync
+from app.utils.text_utils import chunk_text, estimate_tokens, text_hash
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_API_URL = f"{settings.GROQ_API_BASE_URL}/chat/completions"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODEL = "llama3-70b-8192"
+MAX_REDUCE_DEPTH = 4
 
 class GroqSummarizationPipeline:
-    def run(self, transcript_text: str) -> str:
+    model = MODEL
+
+    def warm_up(self):
+        http_client.warm_up(GROQ_API_URL)
+
+    def run(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> str:
+        return run_sync(self.arun(transcript_text, chunk_cache))
+
+    async def arun(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> str:
+        """
+        Summarize a transcript. Transcripts that fit the context window are
+        summarized in one call; longer ones go through map-reduce. `chunk_cache`
+        maps chunk hash -> chunk summary; hits are reused and new chunk
+        summaries are added to it so the caller can persist them.
+        """
+        if not transcript_text:
+            raise ValueError("Transcript is empty")
+
+        return await self._complete(await self._final_prompt(transcript_text, chunk_cache))
+
+    async def astream(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> AsyncIterator[str]:
+        """Like `arun`, but streams the final summary tokens as they are generated."""
         if not transcript_text:
             raise ValueError("Transcript is empty")
 
-        prompt = f"Summarize the following transcript:\n\n{transcript_text}"
+        # The map step (if any) is not streamed; only the final call is
+        prompt = await self._final_prompt(transcript_text, chunk_cache)
+        async for delta in astream_chat_completion(GROQ_API_URL, GROQ_API_KEY, self._payload(prompt)):
+            yield delta
 
-        payload = {
-            "model": "llama3-70b-8192",
+    async def _final_prompt(self, transcript_text: str, chunk_cache: Optional[dict]) -> str:
+        if estimate_tokens(transcript_text) <= settings.SUMMARY_SINGLE_PASS_TOKENS:
+            return f"Summarize the following transcript:\n\n{transcript_text}"
+        return await self._reduce_prompt(transcript_text, chunk_cache if chunk_cache is not None else {})
+
+    async def _reduce_prompt(self, text: str, chunk_cache: dict, depth: int = 0) -> str:
+        chunks = chunk_text(text, settings.SUMMARY_CHUNK_TOKENS)
+        limit = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+
+        async def summarize_chunk(chunk: str) -> str:
+            key = text_hash(chunk)
+            if key in chunk_cache:
+                metrics.SUMMARY_CHUNKS.inc(result="reused")
+            else:
+                async with limit:
+                    chunk_cache[key] = await self._complete(
+                        "Summarize this part of a longer classroom transcript. "
+                        "Keep key facts, announcements, dates and assignments:\n\n" + chunk
+                    )
+                metrics.SUMMARY_CHUNKS.inc(result="computed")
+            return chunk_cache[key]
+
+        # Chunk boundaries are content-defined: after an edit only the touched chunks miss the cache
+        reused = sum(1 for chunk in chunks if text_hash(chunk) in chunk_cache)
+        print(f"[info] Summary map step (level {depth}): reusing {reused} of {len(chunks)} chunk summaries")
+        partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+
+        combined = "\n\n".join(partials)
+        if estimate_tokens(combined) > settings.SUMMARY_SINGLE_PASS_TOKENS and depth < MAX_REDUCE_DEPTH:
+            return await self._reduce_prompt(combined, chunk_cache, depth + 1)
+
+        return (
+            "The following are summaries of consecutive parts of one transcript. "
+            f"Combine them into a single summary of the whole transcript:\n\n{combined}"
+        )
+
+    def _payload(self, prompt: str) -> dict:
+        return {
+            "model": MODEL,
             "messages": [
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt}
@@ -22,21 +92,14 @@ class GroqSummarizationPipeline:
             "temperature": 0.5,
         }
 
+    async def _complete(self, prompt: str) -> str:
+        payload = self._payload(prompt)
         try:
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json=payload,
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"].strip()
-        except requests.exceptions.RequestException as e:
+            return await achat_completion(GROQ_API_URL, GROQ_API_KEY, payload)
+        except httpx.HTTPError as e:
             print("[error] Groq summarization request failed")
             print("Payload:", json.dumps(payload, indent=2)[:1000])  # log first 1000 chars only
-            print("Status code:", response.status_code)
-            print("Response text:", response.text[:1000])
+            if isinstance(e, httpx.HTTPStatusError):
+                print("Status code:", e.response.status_code)
+                print("Response text:", e.response.text[:1000])
             raise e
-
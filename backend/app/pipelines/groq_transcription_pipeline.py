@@ -1,36 +1,224 @@
 # backend/app/pipelines/groq_transcription_pipeline.py
 
 import os
-import requests
-from app.utils.gcs_utils import fetch_audio_from_gcs
+import asyncio
+import subprocess
+import tempfile
+from app.core import http_client, metrics
+from app.core.settings import settings
+from app.utils import audio_utils
+from app.utils.async_utils import run_sync
+from app.utils.gcs_utils import aopen_audio_from_gcs
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/audio/transcriptions"
+GROQ_API_URL = f"{settings.GROQ_API_BASE_URL}/audio/transcriptions"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+MODEL = "whisper-large-v3"
+PROMPT = "English+Spanish. Code-switching. No translation. Keep spelling as spoken."
 
 class GroqTranscriptionPipeline:
+    model = MODEL
+    # Whisper bills per audio second; never send duplicate hedged uploads
+    hedgeable = False
+
+    def warm_up(self):
+        http_client.warm_up(GROQ_API_URL)
+
     def run(self, gcs_path: str, user_id: str):
-        # Fetch audio file from GCS
-        audio_bytes = fetch_audio_from_gcs(gcs_path, user_id)
+        return run_sync(self.arun(gcs_path, user_id))
 
-        # Prepare file upload
-        files = {
-            "file": ("audio.webm", audio_bytes, "audio/webm"),
-        }
+    async def arun(self, gcs_path: str, user_id: str):
+        has_ffmpeg = audio_utils.ffmpeg_available()
+        preprocess = settings.AUDIO_PREPROCESS and has_ffmpeg
+        chunking = settings.TRANSCRIBE_CHUNKING and has_ffmpeg
+
+        # Stream audio from GCS into a temp file (bounded memory); the download blocks, so it runs on a thread
+        async with aopen_audio_from_gcs(gcs_path, user_id, named=preprocess or chunking) as audio_file:
+            size = audio_file.seek(0, os.SEEK_END)
+            audio_file.seek(0)
+            metrics.TRANSCRIPTION_AUDIO_BYTES.observe(size, provider="groq", stage="source")
+
+            if preprocess:
+                with tempfile.TemporaryDirectory() as workdir:
+                    try:
+                        prepared = await asyncio.to_thread(self._prepare, audio_file.name, workdir)
+                    except (subprocess.CalledProcessError, OSError, ValueError, KeyError) as e:
+                        print(f"[warn] Audio preprocessing failed for {gcs_path}, sending it as recorded: {e}")
+                    else:
+                        return await self._transcribe_prepared(prepared, chunking)
+
+            extension, mime_type = audio_utils.sniff_audio_type(audio_file.read(16), gcs_path)
+            audio_file.seek(0)
+            metrics.TRANSCRIPTION_AUDIO_BYTES.observe(size, provider="groq", stage="upload")
+            if chunking:
+                duration = await asyncio.to_thread(audio_utils.probe_duration, audio_file.name)
+                metrics.TRANSCRIPTION_AUDIO_SECONDS.observe(duration, provider="groq", stage="source")
+                metrics.TRANSCRIPTION_AUDIO_SECONDS.observe(duration, provider="groq", stage="upload")
+                if (duration > settings.TRANSCRIBE_CHUNK_SECONDS * 1.5
+                        or size > settings.TRANSCRIBE_MAX_UPLOAD_BYTES):
+                    return await self._run_chunked(audio_file.name, duration)
+
+            # The multipart body streams the file from disk
+            result = await self._transcribe_file((f"audio{extension}", audio_file, mime_type))
+
+        return _timed_result(result)
+
+    @staticmethod
+    def _prepare(path: str, workdir: str) -> dict:
+        return audio_utils.prepare_audio(
+            path, workdir,
+            codec=settings.AUDIO_PREPROCESS_CODEC,
+            opus_bitrate=settings.AUDIO_OPUS_BITRATE,
+            trim_silence=settings.AUDIO_TRIM_SILENCE,
+            min_silence=settings.AUDIO_TRIM_MIN_SILENCE_SECONDS,
+            keep=settings.AUDIO_TRIM_KEEP_SECONDS,
+            noise_db=settings.AUDIO_TRIM_NOISE_DB,
+        )
+
+    async def _transcribe_prepared(self, prepared: dict, chunking: bool):
+        """Send 16 kHz mono (possibly silence-trimmed) audio; segment times are mapped back to the recording."""
+        metrics.TRANSCRIPTION_AUDIO_BYTES.observe(prepared["size"], provider="groq", stage="upload")
+        metrics.TRANSCRIPTION_AUDIO_SECONDS.observe(prepared["source_duration"], provider="groq", stage="source")
+        metrics.TRANSCRIPTION_AUDIO_SECONDS.observe(prepared["duration"], provider="groq", stage="upload")
+
+        if chunking and (prepared["duration"] > settings.TRANSCRIBE_CHUNK_SECONDS * 1.5
+                         or prepared["size"] > settings.TRANSCRIBE_MAX_UPLOAD_BYTES):
+            result = await self._run_chunked(prepared["path"], prepared["duration"])
+            for unit in result["segments"] + result["words"]:
+                unit["start"] = audio_utils.to_source_time(prepared["offsets"], unit["start"])
+                unit["end"] = audio_utils.to_source_time(prepared["offsets"], unit["end"])
+            return result
+
+        with open(prepared["path"], "rb") as audio_file:
+            result = await self._transcribe_file(
+                (f"audio{prepared['extension']}", audio_file, prepared["mime_type"])
+            )
+        return _timed_result(result, prepared["offsets"])
+
+    async def atranscribe_window(self, audio: bytes, extension: str, mime_type: str, context: str = "") -> dict:
+        """
+        Transcribe one in-memory window of a live recording. `context` (the text
+        already committed before it) goes into the prompt so words cut at the
+        window start are spelled consistently. Returns the verbose_json result.
+        """
+        metrics.TRANSCRIPTION_AUDIO_BYTES.observe(len(audio), provider="groq", stage="upload")
+        prompt = f"{PROMPT} {context[-500:]}" if context else PROMPT
+        return await self._transcribe_file((f"window{extension}", audio, mime_type), prompt=prompt)
+
+    async def _transcribe_file(self, file, prompt: str = PROMPT) -> dict:
+        # Prepare file upload; verbose_json carries segment and word timestamps at no extra cost
         data = {
-            "model": "whisper-large-v3",
-            "response_format": "json",
-            "prompt": "English+Spanish. Code-switching. No translation. Keep spelling as spoken.",
+            "model": MODEL,
+            "response_format": "verbose_json",
+            "timestamp_granularities[]": ["segment", "word"],
+            "prompt": prompt,
         }
+        body = http_client.Multipart(data, {"file": file})
         headers = {
             "Authorization": f"Bearer {GROQ_API_KEY}",
+            **body.headers,
         }
 
-        # Call Groq Whisper API
-        response = requests.post(GROQ_API_URL, headers=headers, files=files, data=data)
+        # Call Groq Whisper API (long recordings can take minutes)
+        response = await http_client.apost(GROQ_API_URL, headers=headers, content=body, timeout=600,
+                                           rate_limit=(MODEL, 0))
         response.raise_for_status()
+        return response.json()
+
+    # ------------------------------------------------------------------ #
+    # Chunked mode: split on silence, transcribe concurrently, stitch
+    # ------------------------------------------------------------------ #
+
+    async def _run_chunked(self, path: str, duration: float):
+        silences = await asyncio.to_thread(audio_utils.detect_silences, path)
+        windows = audio_utils.plan_chunks(duration, silences, settings.TRANSCRIBE_CHUNK_SECONDS)
+        overlap = settings.TRANSCRIBE_CHUNK_OVERLAP_SECONDS
+        limit = asyncio.Semaphore(settings.TRANSCRIBE_MAX_CONCURRENCY)
+        print(f"[info] Chunked transcription: {duration:.0f}s audio in {len(windows)} chunks")
+
+        async def transcribe_window(window):
+            start, end = window
+            padded_start = max(start - overlap, 0.0)
+            padded_end = min(end + overlap, duration)
+            async with limit:
+                with tempfile.NamedTemporaryFile(suffix=".flac") as chunk_file:
+                    await asyncio.to_thread(audio_utils.extract_segment, path, padded_start, padded_end, chunk_file.name)
+                    with open(chunk_file.name, "rb") as chunk:
+                        result = await self._transcribe_file(("chunk.flac", chunk, "audio/flac"))
+            return padded_start, result
 
-        result = response.json()
+        results = await asyncio.gather(*(transcribe_window(window) for window in windows))
+
+        segments, words = _stitch_segments(windows, results)
         return {
-            "transcript": result.get("text", ""),
+            "transcript": " ".join(seg["text"] for seg in segments if seg["text"]),
             "provider": "groq",
+            "segments": segments,
+            "words": words,
         }
+
+
+def _timed_result(result: dict, offsets=None) -> dict:
+    """Pipeline output for one verbose_json response, with times mapped back to the source recording."""
+    def timed(units, key):
+        return [
+            {
+                "start": audio_utils.to_source_time(offsets, float(unit.get("start", 0.0))),
+                "end": audio_utils.to_source_time(offsets, float(unit.get("end", 0.0))),
+                key: unit.get(key, "").strip(),
+            }
+            for unit in units
+        ]
+
+    return {
+        "transcript": result.get("text", ""),
+        "provider": "groq",
+        "segments": timed(result.get("segments") or [], "text"),
+        "words": timed(result.get("words") or [], "word"),
+    }
+
+
+def _stitch_segments(windows, results):
+    """
+    Shift each chunk's segments to global time and keep only those whose midpoint
+    falls inside the chunk's own (un-padded) window, so the overlap is not
+    transcribed twice. Any words still repeated across a boundary are trimmed.
+    Returns (segments, words); words are kept with the segment they fall in.
+    """
+    segments, words = [], []
+    for (start, end), (offset, result) in zip(windows, results):
+        chunk_segments = result.get("segments") or [
+            {"start": 0.0, "end": end - offset, "text": result.get("text", "")}
+        ]
+        chunk_words = [
+            {"start": offset + float(w.get("start", 0.0)), "end": offset + float(w.get("end", 0.0)),
+             "word": w.get("word", "").strip()}
+            for w in result.get("words") or []
+        ]
+        kept = []
+        for seg in chunk_segments:
+            seg_start = offset + float(seg.get("start", 0.0))
+            seg_end = offset + float(seg.get("end", 0.0))
+            midpoint = (seg_start + seg_end) / 2
+            if start <= midpoint < end or (midpoint >= end and (start, end) == windows[-1]):
+                kept.append({"start": seg_start, "end": seg_end, "text": seg.get("text", "").strip()})
+
+        kept_words = [[w for w in chunk_words if seg["start"] <= (w["start"] + w["end"]) / 2 < seg["end"]]
+                      for seg in kept]
+        if segments and kept:
+            original = kept[0]["text"]
+            kept[0]["text"] = _trim_repeated_prefix(segments[-1]["text"], original)
+            kept_words[0] = kept_words[0][len(original.split()) - len(kept[0]["text"].split()):]
+        segments.extend(kept)
+        words.extend(w for seg_words in kept_words for w in seg_words)
+    return segments, words
+
+
+def _trim_repeated_prefix(previous: str, current: str, max_words: int = 20) -> str:
+    """Drop the longest prefix of `current` that repeats the tail of `previous`."""
+    prev_words = previous.lower().split()
+    cur_words = current.split()
+    cur_lower = [w.lower() for w in cur_words]
+    for n in range(min(max_words, len(prev_words), len(cur_words)), 0, -1):
+        if prev_words[-n:] == cur_lower[:n]:
+            return " ".join(cur_words[n:])
+    return current
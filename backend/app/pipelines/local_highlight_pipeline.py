@@ -0,0 +1,34 @@
+# app/pipelines/local_highlight_pipeline.py
+
+import asyncio
+from typing import AsyncIterator, Tuple
+from app.services.sentence_index import bm25_scores
+from app.utils.text_utils import split_sentences
+
+class LocalHighlightPipeline:
+    """
+    Picks the transcript sentence that best matches the prompt (BM25) and
+    returns it as both the highlight and the answer. Used as a fallback when
+    the remote highlight model is failing.
+    """
+    model = "bm25"
+    fallback_only = True
+
+    def run(self, transcript: str, prompt: str):
+        if not transcript or not prompt:
+            raise ValueError("Missing input")
+
+        sentences = split_sentences(transcript)
+        if not sentences:
+            return {"sentence": "", "answer": ""}
+        best = sentences[int(bm25_scores(sentences, prompt).argmax())]
+        return {"sentence": best, "answer": best}
+
+    async def arun(self, transcript: str, prompt: str):
+        return await asyncio.to_thread(self.run, transcript, prompt)
+
+    async def astream(self, transcript: str, prompt: str) -> AsyncIterator[Tuple[str, object]]:
+        result = await asyncio.to_thread(self.run, transcript, prompt)
+        yield "sentence", result["sentence"]
+        yield "answer", result["answer"]
+        yield "result", result
@@ -0,0 +1,47 @@
+# app/pipelines/local_summarization_pipeline.py
+
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import AsyncIterator, Optional
+from app.utils.text_utils import split_sentences
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+MIN_SENTENCES = 3
+MAX_SENTENCES = 12
+SUMMARY_RATIO = 0.15
+
+class LocalSummarizationPipeline:
+    """
+    Extractive summary computed in-process: the highest-scoring sentences by
+    word frequency, in transcript order. Used as a fallback when the remote
+    summarizers are failing.
+    """
+    model = "extractive"
+    fallback_only = True
+
+    def run(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> str:
+        if not transcript_text:
+            raise ValueError("Transcript is empty")
+
+        sentences = split_sentences(transcript_text)
+        keep = min(MAX_SENTENCES, max(MIN_SENTENCES, math.ceil(len(sentences) * SUMMARY_RATIO)))
+        if len(sentences) <= keep:
+            return " ".join(sentences)
+
+        words = [[w for w in _WORD_RE.findall(s.lower()) if len(w) > 3] for s in sentences]
+        frequency = Counter(w for sentence_words in words for w in sentence_words)
+        scores = [
+            sum(frequency[w] for w in sentence_words) / math.sqrt(len(sentence_words)) if sentence_words else 0.0
+            for sentence_words in words
+        ]
+
+        top = sorted(sorted(range(len(sentences)), key=lambda i: -scores[i])[:keep])
+        return " ".join(sentences[i] for i in top)
+
+    async def arun(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> str:
+        return await asyncio.to_thread(self.run, transcript_text, chunk_cache)
+
+    async def astream(self, transcript_text: str, chunk_cache: Optional[dict] = None) -> AsyncIterator[str]:
+        yield await asyncio.to_thread(self.run, transcript_text, chunk_cache)
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+
+class BatchRequest(BaseModel):
+    sourceIds: List[str] = Field(..., min_length=1, max_length=200)
+    operations: List[Literal["transcribe", "summarize"]] = ["transcribe", "summarize"]
@@ -1,5 +1,17 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class TranscriptUpdateRequest(BaseModel):
     text: str
-    provider: str = "manual"
\ No newline at end of file
+    provider: str = "manual"
+
+class TranscriptEdit(BaseModel):
+    # Character offsets into the transcript as last read
+    start: int
+    end: int
+    text: str = ""
+
+class TranscriptPatchRequest(BaseModel):
+    edits: List[TranscriptEdit]
+    baseSha256: Optional[str] = None
+    provider: str = "manual"
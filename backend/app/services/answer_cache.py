@@ -0,0 +1,112 @@
+# app/services/answer_cache.py
+
+"""
+Per-source cache of highlight answers, so the same question about the same
+lecture ("what was the homework?", "when is the test?") is answered from an
+earlier run instead of another LLM call.
+
+Entries live in one document next to the sentence index
+(`sources/{id}/index/answers`): the normalized prompt, the answer and
+highlighted sentence, and (in hybrid mode) the prompt's embedding as a
+float16 blob. A prompt matches an entry when the normalized text is equal,
+or when the embeddings' cosine similarity is at least
+HIGHLIGHT_ANSWER_SIMILARITY. The document records the hash of the
+transcript the answers came from; after the transcript changes it no
+longer matches and is rebuilt from scratch.
+"""
+
+import re
+import unicodedata
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from app.core import metrics
+from app.core.settings import settings
+from app.services import sentence_index
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, punctuation and spacing insensitive key: "When is the test?" == "when is the TEST"."""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def _cache_ref(source_ref):
+    return source_ref.collection("index").document("answers")
+
+
+def _semantic() -> bool:
+    # Prompt embeddings reuse the sentence model, which is only loaded in hybrid mode
+    return settings.HIGHLIGHT_RETRIEVAL_MODE == "hybrid"
+
+
+def embed_prompt(prompt: str) -> Optional[np.ndarray]:
+    if not _semantic():
+        return None
+    try:
+        return sentence_index.embed([prompt])[0]
+    except Exception as e:
+        print(f"[warn] Prompt embedding failed, matching answers by text only: {e}")
+        return None
+
+
+async def aload(source_ref, transcript_hash: str) -> List[dict]:
+    """Cached entries for the current transcript (empty if it changed since they were stored)."""
+    snapshot = await _cache_ref(source_ref).get()
+    doc = snapshot.to_dict() if snapshot.exists else None
+    if not doc or doc.get("transcriptHash") != transcript_hash:
+        return []
+    return doc.get("entries", [])
+
+
+def match(entries: List[dict], prompt: str, prompt_vector: Optional[np.ndarray]) -> Optional[dict]:
+    """Best cached entry for `prompt`, counting the lookup in slai_highlight_answer_cache_total."""
+    key = normalize_prompt(prompt)
+    for entry in entries:
+        if entry["key"] == key:
+            metrics.HIGHLIGHT_ANSWER_CACHE.inc(result="exact")
+            return entry
+
+    if prompt_vector is not None:
+        candidates = [
+            e for e in entries
+            if e.get("embedding") and e.get("model") == settings.HIGHLIGHT_EMBEDDING_MODEL
+            and len(e["embedding"]) == prompt_vector.nbytes
+        ]
+        if candidates:
+            vectors = np.stack([np.frombuffer(e["embedding"], dtype=np.float16) for e in candidates])
+            similarity = vectors.astype(np.float32) @ prompt_vector.astype(np.float32)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= settings.HIGHLIGHT_ANSWER_SIMILARITY:
+                metrics.HIGHLIGHT_ANSWER_CACHE.inc(result="semantic")
+                return candidates[best]
+
+    metrics.HIGHLIGHT_ANSWER_CACHE.inc(result="miss")
+    return None
+
+
+async def astore(source_ref, transcript_hash: str, entries: List[dict], prompt: str,
+                 prompt_vector: Optional[np.ndarray], highlight: dict):
+    """Add a freshly generated answer; the oldest entries go beyond HIGHLIGHT_ANSWER_CACHE_MAX_ENTRIES."""
+    entry = {
+        "key": normalize_prompt(prompt),
+        "prompt": prompt,
+        "answer": highlight["answer"],
+        "highlightedSentence": highlight["highlightedSentence"],
+        "created_at": datetime.utcnow(),
+    }
+    if prompt_vector is not None:
+        entry["embedding"] = prompt_vector.astype(np.float16).tobytes()
+        entry["model"] = settings.HIGHLIGHT_EMBEDDING_MODEL
+
+    kept = [e for e in entries if e["key"] != entry["key"]]
+    kept = (kept + [entry])[-settings.HIGHLIGHT_ANSWER_CACHE_MAX_ENTRIES:]
+    await _cache_ref(source_ref).set({"transcriptHash": transcript_hash, "entries": kept})
+
+
+async def adelete(source_ref):
+    await _cache_ref(source_ref).delete()
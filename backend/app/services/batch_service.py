@@ -0,0 +1,83 @@
+# app/services/batch_service.py
+
+import uuid
+from datetime import datetime
+from app.core.firebase_client import db as _db
+from app.core.constants import DEFAULT_TOOL
+from app.core.job_queue import job_queue
+from app.services import source_repository
+
+# Registers the "transcribe" / "summarize" job handlers
+from app.services import source_service  # noqa: F401
+
+
+def submit_batch(user_id: str, source_ids: list, operations: list, tool: str = DEFAULT_TOOL) -> dict:
+    """
+    Queue transcription and/or summarization for many sources at once. Work runs
+    on the shared job queue, which bounds concurrency per user and overall.
+    """
+    batch_id = str(uuid.uuid4())
+    refs = [source_repository.source_ref(user_id, source_id, tool, db=_db) for source_id in dict.fromkeys(source_ids)]
+    snapshots = source_repository.get_all(_db, refs, ["path", "fileType", "transcript.provider"])
+
+    items = []
+    for ref in refs:
+        snap = snapshots.get(ref.id)
+        item = {"sourceId": ref.id}
+        if snap is None or not snap.exists:
+            items.append(item | {"status": "failed", "error": "Source not found"})
+            continue
+
+        data = snap.to_dict() or {}
+        payload = {"userId": user_id, "sourceId": ref.id, "tool": tool, "batchId": batch_id}
+
+        if "transcribe" in operations:
+            if data.get("fileType") != "audio" or not data.get("path"):
+                items.append(item | {"status": "failed", "error": "Source is not an audio file"})
+                continue
+            payload |= {"path": data["path"], "summarize": "summarize" in operations}
+            kind, stage = "transcribe", "transcription"
+        else:
+            if not data.get("transcript"):
+                items.append(item | {"status": "failed", "error": "Transcript missing for this source"})
+                continue
+            kind, stage = "summarize", "summary"
+
+        # Status first: an idle worker may pick the job up (and report on it) right away
+        job_id = str(uuid.uuid4())
+        source_repository.update(
+            ref, {f"processing.{stage}": {"status": "queued", "jobId": job_id, "updated_at": datetime.utcnow()}}
+        )
+        job_queue.enqueue(kind, payload, user_id=user_id, batch_id=batch_id, job_id=job_id)
+        items.append(item | {"status": "queued", "jobId": job_id, "operation": kind})
+
+    return {"batchId": batch_id, "items": items}
+
+
+def get_batch(user_id: str, batch_id: str) -> dict:
+    jobs = job_queue.list_batch(batch_id, user_id)
+    if not jobs:
+        raise ValueError("Batch not found")
+
+    items = [
+        {
+            "sourceId": job["payload"]["sourceId"],
+            "operation": job["kind"],
+            "jobId": job["id"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "error": job["error"] if job["status"] != "done" else None,
+        }
+        for job in jobs
+    ]
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+
+    return {
+        "batchId": batch_id,
+        "total": len(items),
+        "counts": counts,
+        "complete": all(item["status"] in ("done", "failed") for item in items),
+        "items": items,
+    }
@@ -1,66 +1,175 @@
 # app/services/highlight_service.py
 
+import asyncio
 from datetime import datetime
-from app.core.firebase_client import db as _db
-from app.services.model_registry import ModelRegistry
+from app.services.provider_router import get_router
 from app.core.constants import DEFAULT_TOOL
+from app.core.settings import settings
+from app.core.request_context import set_user_id, user_scope
+from app.services import answer_cache, sentence_index, source_repository, text_store, transcript_timing
+from app.utils.async_utils import run_sync
+from app.utils.sse import sse_event
+
+# Sync wrappers for non-async callers
 
 def generate_highlight(user_id: str, source_id: str, prompt: str, provider: str = "groq_highlight", tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
-    doc = ref.get()
+    return run_sync(agenerate_highlight(user_id, source_id, prompt, provider, tool))
+
+
+def get_highlight_history(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    return run_sync(aget_highlight_history(user_id, source_id, tool))
+
+
+async def agenerate_highlight(user_id: str, source_id: str, prompt: str, provider: str = "groq_highlight", tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    data = await _load_source(ref)
+    lookup = await _lookup_answer(ref, data, prompt)
+    if lookup.get("hit"):
+        return await _save_highlight(ref, data, prompt, lookup["hit"], cached=True)
+
+    context = await _highlight_context(ref, data, prompt)
+    with user_scope(user_id):
+        _, response = await get_router().arun(provider, "arun", context, prompt)  # must return { answer, sentence }
+
+    highlight_doc = await _save_highlight(ref, data, prompt, response)
+    await _remember_answer(ref, lookup, prompt, highlight_doc)
+    return highlight_doc
+
+
+async def stream_highlight(user_id: str, source_id: str, prompt: str, provider: str = "groq_highlight", tool: str = DEFAULT_TOOL):
+    """
+    Validate the source and return an async generator of SSE events:
+    `sentence` / `answer` text deltas as the model's JSON streams in, then
+    `done` with the saved highlight. A cached answer is sent as a single
+    `sentence` and `answer` event.
+    """
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    data = await _load_source(ref)
+    router = get_router()
+    router.route(provider, "astream")  # unknown provider -> ValueError before streaming starts
+    lookup = await _lookup_answer(ref, data, prompt)
+    hit = lookup.get("hit")
+    context = None if hit else await _highlight_context(ref, data, prompt)
+
+    async def events():
+        set_user_id(user_id)  # provider calls are scheduled per user
+        try:
+            if hit:
+                yield sse_event("sentence", {"text": hit["sentence"]})
+                yield sse_event("answer", {"text": hit["answer"]})
+                yield sse_event("done", await _save_highlight(ref, data, prompt, hit, cached=True))
+                return
+
+            async for _, (field, value) in router.astream(provider, "astream", context, prompt):
+                if field == "result":
+                    highlight_doc = await _save_highlight(ref, data, prompt, value)
+                    await _remember_answer(ref, lookup, prompt, highlight_doc)
+                    yield sse_event("done", highlight_doc)
+                else:
+                    yield sse_event(field, {"text": value})
+        except Exception as e:
+            print(f"[error] Highlight stream failed for {source_id}: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return events()
+
+
+async def _load_source(ref) -> dict:
+    doc = await source_repository.aget(ref, ["transcript"])
     if not doc.exists:
         raise ValueError("Source not found")
+    data = doc.to_dict() or {}
+    if not data.get("transcript"):
+        raise ValueError("Transcript missing")
+    return data
+
+
+async def _lookup_answer(ref, data: dict, prompt: str) -> dict:
+    """
+    Look `prompt` up in the source's answer cache. Returns what's needed to
+    store the new answer on a miss, plus `hit` ({sentence, answer}) on a match.
+    """
+    if not settings.HIGHLIGHT_ANSWER_CACHE:
+        return {}
+    try:
+        transcript_hash = text_store.text_sha256(data["transcript"])
+        entries = await answer_cache.aload(ref, transcript_hash)
+        vector = await asyncio.to_thread(answer_cache.embed_prompt, prompt)
+        lookup = {"transcript_hash": transcript_hash, "entries": entries, "vector": vector}
+        entry = answer_cache.match(entries, prompt, vector)
+        if entry:
+            lookup["hit"] = {"sentence": entry["highlightedSentence"], "answer": entry["answer"]}
+        return lookup
+    except Exception as e:
+        print(f"[warn] Highlight answer cache unavailable: {e}")
+        return {}
+
 
-    transcript = doc.to_dict().get("transcript", {}).get("text")
+async def _remember_answer(ref, lookup: dict, prompt: str, highlight_doc: dict):
+    if "transcript_hash" not in lookup:
+        return
+    try:
+        await answer_cache.astore(
+            ref, lookup["transcript_hash"], lookup["entries"], prompt, lookup["vector"], highlight_doc
+        )
+    except Exception as e:
+        print(f"[warn] Failed to cache highlight answer: {e}")
+
+
+async def _highlight_context(ref, data: dict, prompt: str) -> str:
+    transcript = await text_store.aload_text(ref, data, "transcript")
     if not transcript:
         raise ValueError("Transcript missing")
 
-    pipeline = ModelRegistry().get_pipeline(provider)
-    response = pipeline.run(transcript, prompt)  # must return { answer, sentence }
+    # Send only the most relevant sentences, not the whole transcript (BM25 and query embedding are CPU-bound)
+    index = await sentence_index.arefresh_index(ref, transcript)
+    sentences = await asyncio.to_thread(sentence_index.retrieve, transcript, index, prompt, settings.HIGHLIGHT_TOP_K)
+    context = "\n".join(sentences)
+    return context or transcript
+
 
+async def _highlight_timestamp(ref, data: dict, sentence: str):
+    """Audio range ({start, end} in seconds) of the highlighted sentence, if the transcript has timestamps."""
+    try:
+        timing = await transcript_timing.aload_timing(ref, text_store.text_sha256(data["transcript"]))
+        if timing is None:
+            return None
+        transcript = await text_store.aload_text(ref, data, "transcript")
+        span = transcript_timing.find_span(transcript or "", sentence)
+        return transcript_timing.lookup(timing, *span) if span else None
+    except Exception as e:
+        print(f"[warn] Highlight timestamp unavailable: {e}")
+        return None
+
+
+async def _save_highlight(ref, data: dict, prompt: str, response: dict, cached: bool = False) -> dict:
     highlight_doc = {
         "prompt": prompt,
         "highlightedSentence": response["sentence"],
         "answer": response["answer"],
         "created_at": datetime.utcnow(),
     }
+    if cached:
+        highlight_doc["cached"] = True
+    timestamp = await _highlight_timestamp(ref, data, response["sentence"])
+    if timestamp:
+        highlight_doc["timestamp"] = timestamp
 
     # Save to subcollection
-    _db.collection("tools")\
-        .document(tool)\
-        .collection("users")\
-        .document(user_id)\
-        .collection("sources")\
-        .document(source_id)\
-        .collection("highlights")\
-        .add(highlight_doc)
+    await ref.collection("highlights").add(highlight_doc)
 
     return highlight_doc
 
-def get_highlight_history(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-        .collection("highlights")
-    )
-    docs = ref.order_by("created_at").stream()
-    return [
-        {
-            "prompt": doc.to_dict()["prompt"],
-            "answer": doc.to_dict()["answer"],
-            "highlightedSentence": doc.to_dict()["highlightedSentence"],
-            "created_at": doc.to_dict()["created_at"].isoformat()
-        }
-        for doc in docs
-    ]
+async def aget_highlight_history(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool).collection("highlights")
+    history = []
+    async for doc in ref.order_by("created_at").stream():
+        data = doc.to_dict()
+        history.append({
+            "prompt": data["prompt"],
+            "answer": data["answer"],
+            "highlightedSentence": data["highlightedSentence"],
+            "timestamp": data.get("timestamp"),
+            "created_at": data["created_at"].isoformat()
+        })
+    return history
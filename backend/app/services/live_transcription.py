@@ -0,0 +1,318 @@
+# app/services/live_transcription.py
+
+"""
+Transcription while a lecture is being recorded.
+
+The client streams the recording (browser MediaRecorder chunks) over a
+WebSocket. A long-running ffmpeg process decodes it to 16 kHz mono PCM as it
+arrives; every LIVE_PARTIAL_SECONDS the audio not yet committed is sent to
+Whisper as one window:
+
+    committed text | pending audio ...................... | live edge
+                   ^ offset     segments ending more than
+                                LIVE_HOLDBACK_SECONDS before the
+                                edge are committed once the window
+                                is LIVE_WINDOW_SECONDS long
+
+Committed segments go to the client as "final" messages and their audio is
+dropped; the rest comes back as "partial" text and is sent again on the next
+tick. When the recording stops only the last window is left to transcribe,
+so the transcript is saved a few seconds after the stop instead of after a
+full upload-and-transcribe run. The raw recording is spooled to a temp file
+and archived in GCS like a regular upload.
+
+Without ffmpeg (or when the final window fails, or Whisper keeps failing
+until the pending audio would exceed its upload limit) the archived audio
+goes through the regular transcription job instead. Recordings are capped
+at LIVE_MAX_SECONDS / LIVE_MAX_BYTES; a session that fails is marked as
+failed on the source rather than left "live".
+"""
+
+import asyncio
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from app.core import metrics
+from app.core.constants import DEFAULT_TOOL
+from app.core.request_context import user_scope
+from app.core.settings import settings
+from app.core.tracing import trace_scope
+from app.services import source_service
+from app.services.provider_router import get_router
+from app.utils import audio_utils
+from app.utils.gcs_utils import get_bucket, record_transfer
+
+# Ticks with less new audio than this are skipped (nothing new to show)
+_MIN_NEW_SECONDS = 1.0
+
+
+class LiveTranscription:
+    def __init__(self, user_id: str, source: dict, send: Callable[[dict], Awaitable[None]],
+                 tool: str = DEFAULT_TOOL):
+        self.user_id = user_id
+        self.source_id = source["sourceId"]
+        self.path = source["path"]
+        self.mime_type = source["mimeType"]
+        self.tool = tool
+        self._send = send
+
+        self.segments: List[dict] = []  # committed {"start", "end", "text"}, in recording time
+        self.words: List[dict] = []     # committed {"start", "end", "word"}
+        self.offset = 0.0               # recording time at the start of `pending`
+        self.pending = bytearray()      # decoded PCM not yet committed
+        self.provider = "groq"
+        self._sent_seconds = 0.0        # pending audio covered by the last window sent
+        self._failed = False
+        self._archive = tempfile.TemporaryFile()
+        self._size = 0
+        self._started = time.monotonic()
+        self._decoder = None
+        self._reader = None
+        self._ticker = None
+
+    @classmethod
+    async def astart(cls, user_id: str, meta: dict, send: Callable[[dict], Awaitable[None]],
+                     tool: str = DEFAULT_TOOL) -> "LiveTranscription":
+        source = await asyncio.to_thread(source_service.create_live_source, user_id, meta, tool)
+        session = cls(user_id, source, send, tool)
+        if audio_utils.ffmpeg_available():
+            session._decoder = await asyncio.create_subprocess_exec(
+                *audio_utils.pcm_decoder_command(),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            session._reader = asyncio.create_task(session._read_pcm())
+            session._ticker = asyncio.create_task(session._tick())
+        else:
+            print("[warn] ffmpeg not found: live recording is archived and transcribed after it ends")
+        return session
+
+    @property
+    def live(self) -> bool:
+        return self._decoder is not None
+
+    @property
+    def text(self) -> str:
+        return " ".join(seg["text"] for seg in self.segments if seg["text"])
+
+    def at_limit(self, extra: int = 0) -> bool:
+        """Whether `extra` more bytes would take the recording past LIVE_MAX_BYTES or LIVE_MAX_SECONDS."""
+        return (self._size + extra > settings.LIVE_MAX_BYTES
+                or time.monotonic() - self._started > settings.LIVE_MAX_SECONDS)
+
+    async def feed(self, chunk: bytes) -> bool:
+        """
+        Append a chunk of the recording (as produced by the client's encoder).
+        Returns False, dropping the chunk, once the recording is at its limit.
+        """
+        if self.at_limit(len(chunk)):
+            return False
+        self._archive.write(chunk)
+        self._size += len(chunk)
+        if self._decoder is None or self._failed or self._decoder.stdin.is_closing():
+            return True
+        try:
+            self._decoder.stdin.write(chunk)
+            await self._decoder.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            # The archive is still complete: the final step falls back to the transcription job
+            print(f"[warn] Live decoder for {self.source_id} exited, finishing without live text: {e}")
+            self._failed = True
+        return True
+
+    async def _read_pcm(self):
+        # Raw PCM is larger than the FLAC window made from it, so this keeps windows under Whisper's limit
+        max_pending = settings.TRANSCRIBE_MAX_UPLOAD_BYTES
+        while True:
+            data = await self._decoder.stdout.read(64 * 1024)
+            if not data:
+                return
+            if self._failed:
+                continue  # drain the decoder until it exits
+            self.pending += data
+            if len(self.pending) > max_pending:
+                await self._stop_live("uncommitted audio reached the upload limit")
+
+    async def _stop_live(self, reason: str):
+        """Give up on live text (e.g. Whisper keeps failing); the archive is transcribed by the job at the end."""
+        print(f"[warn] Live transcription of {self.source_id} stopped, queueing transcription: {reason}")
+        self._failed = True
+        self.pending.clear()
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._decoder.returncode is None:
+            self._decoder.kill()
+        await self._notify({"type": "error", "detail": "Live transcription stopped; the recording is transcribed after it ends"})
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(settings.LIVE_PARTIAL_SECONDS)
+            seconds = len(self.pending) / audio_utils.PCM_BYTES_PER_SECOND
+            if seconds - self._sent_seconds < _MIN_NEW_SECONDS:
+                continue
+            try:
+                await self._transcribe_pending(final=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The audio stays pending and is sent again on the next tick
+                print(f"[warn] Live window for {self.source_id} failed: {e}")
+                await self._notify({"type": "error", "detail": "Live transcription delayed, retrying"})
+
+    async def _transcribe_pending(self, final: bool):
+        pcm = bytes(self.pending)
+        duration = len(pcm) / audio_utils.PCM_BYTES_PER_SECOND
+        if duration < 0.1:
+            return
+        self._sent_seconds = duration
+
+        audio = await asyncio.to_thread(audio_utils.encode_pcm, pcm)
+        with trace_scope("live_transcribe"), user_scope(self.user_id):
+            self.provider, result = await get_router().arun(
+                "groq", "atranscribe_window", audio, ".flac", "audio/flac", self.text
+            )
+
+        segments = [
+            {"start": float(seg.get("start", 0.0)), "end": float(seg.get("end", 0.0)), "text": seg.get("text", "").strip()}
+            for seg in result.get("segments") or []
+        ] or [{"start": 0.0, "end": duration, "text": result.get("text", "").strip()}]
+
+        if final:
+            keep = len(segments)
+        else:
+            keep = _committable(segments, duration)
+        words = [
+            {"start": float(w.get("start", 0.0)), "end": float(w.get("end", 0.0)), "word": w.get("word", "").strip()}
+            for w in result.get("words") or []
+        ]
+        if keep:
+            await self._notify(self._commit(segments[:keep], words))
+        if not final:
+            await self._notify({"type": "partial", "text": " ".join(s["text"] for s in segments[keep:] if s["text"])})
+
+    def _commit(self, segments: List[dict], words: List[dict]) -> dict:
+        """Move `segments` (and their words) from the pending window to the transcript; returns the "final" message."""
+        cut = segments[-1]["end"]
+        committed = [
+            {"start": self.offset + seg["start"], "end": self.offset + seg["end"], "text": seg["text"]}
+            for seg in segments
+        ]
+        self.segments.extend(committed)
+        self.words.extend(
+            {"start": self.offset + w["start"], "end": self.offset + w["end"], "word": w["word"]}
+            for w in words if (w["start"] + w["end"]) / 2 <= cut
+        )
+
+        # Drop the committed audio (whole samples); anything decoded since the window was cut stays
+        cut_bytes = min(int(cut * audio_utils.PCM_SAMPLE_RATE) * 2, len(self.pending))
+        del self.pending[:cut_bytes]
+        self.offset += cut_bytes / audio_utils.PCM_BYTES_PER_SECOND
+        self._sent_seconds = max(self._sent_seconds - cut_bytes / audio_utils.PCM_BYTES_PER_SECOND, 0.0)
+
+        return {
+            "type": "final",
+            "text": " ".join(seg["text"] for seg in committed if seg["text"]),
+            "start": committed[0]["start"],
+            "end": committed[-1]["end"],
+        }
+
+    async def _notify(self, message: dict):
+        # The client may already be gone (e.g. finishing after a disconnect)
+        try:
+            await self._send(message)
+        except Exception:
+            pass
+
+    def _upload_archive(self) -> int:
+        self._archive.seek(0)
+        get_bucket().blob(self.path).upload_from_file(self._archive, size=self._size, content_type=self.mime_type)
+        record_transfer("upload", self._size)
+        return self._size
+
+    async def finish(self) -> Optional[str]:
+        """
+        End of the recording: transcribe the last window while the archive
+        uploads, then save both on the source. Returns the transcript, or None
+        when it was left to the transcription job (or nothing was recorded).
+        """
+        started = time.monotonic()
+        if self._ticker is not None:
+            self._ticker.cancel()
+        try:
+            if self._decoder is not None:
+                if not self._decoder.stdin.is_closing():
+                    self._decoder.stdin.close()
+                await self._reader
+                if await self._decoder.wait() != 0 and not self._failed:
+                    print(f"[warn] Live decoder for {self.source_id} failed, queueing transcription")
+                    self._failed = True
+
+            if not self._size:
+                await asyncio.to_thread(source_service.discard_live_source, self.user_id, self.source_id, self.tool)
+                return None
+
+            upload = asyncio.create_task(asyncio.to_thread(self._upload_archive))
+            transcript = None
+            if self._decoder is not None and not self._failed:
+                try:
+                    await self._transcribe_pending(final=True)
+                    transcript = self.text
+                except Exception as e:
+                    print(f"[warn] Final live window for {self.source_id} failed, queueing transcription: {e}")
+            size = await upload
+
+            await asyncio.to_thread(
+                source_service.finish_live_source,
+                self.user_id, self.source_id, size, transcript, self.provider, self.tool,
+                segments=self.segments, words=self.words,
+            )
+        except Exception as e:
+            await self._mark_failed(f"Live recording could not be saved: {e}")
+            raise
+        finally:
+            self._archive.close()
+
+        metrics.LIVE_TRANSCRIPT_READY_SECONDS.observe(
+            time.monotonic() - started, outcome="live" if transcript is not None else "queued"
+        )
+        return transcript
+
+    async def abort(self, error: str = "Live session failed"):
+        """Stop the decoder without saving the recording (the session itself failed)."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._decoder is not None and self._decoder.returncode is None:
+            self._decoder.kill()
+            await self._decoder.wait()
+        self._archive.close()
+        await self._mark_failed(error)
+
+    async def _mark_failed(self, error: str):
+        # Without this the source would stay "live" forever
+        try:
+            if self._size:
+                await asyncio.to_thread(source_service.fail_live_source, self.user_id, self.source_id, error, self.tool)
+            else:
+                await asyncio.to_thread(source_service.discard_live_source, self.user_id, self.source_id, self.tool)
+        except Exception as e:
+            print(f"[warn] Failed to mark live recording {self.source_id} as failed: {e}")
+
+
+def _committable(segments: List[dict], duration: float) -> int:
+    """
+    How many leading segments of a window can be committed: those ending
+    LIVE_HOLDBACK_SECONDS before the live edge, once the window is
+    LIVE_WINDOW_SECONDS long. A window twice that long without such a segment
+    (one long sentence) commits everything but its last segment.
+    """
+    if duration < settings.LIVE_WINDOW_SECONDS:
+        return 0
+    edge = duration - settings.LIVE_HOLDBACK_SECONDS
+    keep = 0
+    while keep < len(segments) and segments[keep]["end"] <= edge:
+        keep += 1
+    if not keep and duration >= 2 * settings.LIVE_WINDOW_SECONDS:
+        keep = len(segments) - 1
+    return keep
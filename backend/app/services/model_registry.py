@@ -1,25 +1,113 @@
-from app.pipelines.groq_transcription_pipeline import GroqTranscriptionPipeline
-from app.pipelines.groq_summarization_pipeline import GroqSummarizationPipeline
-from app.pipelines.groq_highlight_pipeline import GroqHighlightPipeline
+import importlib
+import threading
+from importlib.metadata import entry_points
+from typing import Optional, Union
+
+from app.core.settings import settings
+
+# Built-in providers, imported lazily on first use ("module:Class")
+BUILTIN_PROVIDERS = {
+    # 🧠 Transcription pipeline
+    "groq": "app.pipelines.groq_transcription_pipeline:GroqTranscriptionPipeline",
+    # 🧠 Summarization pipeline
+    "groq_summarizer": "app.pipelines.groq_summarization_pipeline:GroqSummarizationPipeline",
+    # 🧠 Highlight pipeline
+    "groq_highlight": "app.pipelines.groq_highlight_pipeline:GroqHighlightPipeline",
+    # 🧩 Local fallbacks (no network, used when remote providers are failing)
+    "local_summarizer": "app.pipelines.local_summarization_pipeline:LocalSummarizationPipeline",
+    "local_highlight": "app.pipelines.local_highlight_pipeline:LocalHighlightPipeline",
+}
+
+# Third-party packages can add providers under this entry point group
+ENTRY_POINT_GROUP = "slai.pipelines"
+
+
+def _resolve(spec: str):
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
 
 class ModelRegistry:
+    """
+    Maps provider names to pipelines. Provider modules are imported on first
+    use and each pipeline is instantiated once and reused, so pipeline-level
+    state (connection pools, tokenizers, models, caches) persists across calls.
+    """
+
     def __init__(self):
         self._registry = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+
+        for provider_name, spec in BUILTIN_PROVIDERS.items():
+            self.register(provider_name, spec)
+        self._register_entry_points()
+        self._register_from_config(settings.PIPELINE_PROVIDERS)
 
-        # 🧠 Register transcription pipeline
-        self.register("groq", GroqTranscriptionPipeline)
+    def register(self, provider_name: str, pipeline_cls: Union[type, str]):
+        """Register a pipeline class, or a "module:Class" path to import lazily."""
+        with self._lock:
+            self._registry[provider_name] = pipeline_cls
+            self._instances.pop(provider_name, None)
 
-        # 🧠 Register summarization pipeline
-        self.register("groq_summarizer", GroqSummarizationPipeline)
+    def _register_entry_points(self):
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            self.register(ep.name, ep.value)
 
-        # 🧠 Register highlight pipeline
-        self.register("groq_highlight", GroqHighlightPipeline)
+    def _register_from_config(self, config: str):
+        # PIPELINE_PROVIDERS="name=package.module:Class,other=..."
+        for entry in filter(None, (part.strip() for part in config.split(","))):
+            provider_name, _, spec = entry.partition("=")
+            if not spec:
+                print(f"[warn] Ignoring malformed PIPELINE_PROVIDERS entry: {entry}")
+                continue
+            self.register(provider_name.strip(), spec.strip())
 
-    def register(self, provider_name: str, pipeline_cls):
-        self._registry[provider_name] = pipeline_cls
+    def providers(self):
+        return list(self._registry)
 
     def get_pipeline(self, provider_name: str):
-        pipeline_cls = self._registry.get(provider_name)
-        if not pipeline_cls:
-            raise ValueError(f"Provider '{provider_name}' is not registered.")
-        return pipeline_cls()
+        instance = self._instances.get(provider_name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(provider_name)
+            if instance is not None:
+                return instance
+
+            pipeline_cls = self._registry.get(provider_name)
+            if not pipeline_cls:
+                raise ValueError(f"Provider '{provider_name}' is not registered.")
+            if isinstance(pipeline_cls, str):
+                pipeline_cls = _resolve(pipeline_cls)
+                self._registry[provider_name] = pipeline_cls
+
+            instance = pipeline_cls()
+            self._instances[provider_name] = instance
+            return instance
+
+    def warm_up(self, provider_names: Optional[list] = None):
+        """Instantiate pipelines and run their optional `warm_up()` hooks (called at app startup)."""
+        for provider_name in provider_names or self.providers():
+            try:
+                pipeline = self.get_pipeline(provider_name)
+                hook = getattr(pipeline, "warm_up", None)
+                if hook:
+                    hook()
+            except Exception as e:
+                print(f"[warn] Warm-up failed for provider '{provider_name}': {e}")
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry shared by all services."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
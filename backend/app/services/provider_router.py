@@ -0,0 +1,410 @@
+# app/services/provider_router.py
+
+"""
+Routing layer in front of the model registry.
+
+Every call goes through a route: the requested provider plus its configured
+fallbacks (ROUTER_FALLBACKS). The router keeps a rolling window of latencies
+and errors per provider, model and method, and orders the route so that
+healthy providers go first, fastest first. Providers marked `fallback_only`
+(local models) are only tried after every remote provider has failed. A
+provider whose recent error rate crosses the threshold is skipped for a
+cooldown period.
+
+With hedging enabled, a duplicate request is sent to the same provider when
+the first one has not answered within its p95 latency; the first answer
+wins. For streams the duplicate really is cancelled; for blocking calls the
+losing thread cannot be interrupted, so its result is just discarded.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from json import JSONDecodeError
+from typing import Callable, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.request_context import bind_context
+from app.core.settings import settings
+from app.core.tracing import span
+from app.services.model_registry import get_registry
+
+# Caller errors: another provider would fail the same way, so never fall back on these
+NON_RETRYABLE = (FileNotFoundError, PermissionError)
+# 4xx answers that say "later" rather than "never"
+RETRYABLE_CLIENT_STATUS = {408, 429}
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, JSONDecodeError):  # malformed model output is the provider's fault
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return not 400 <= status < 500 or status in RETRYABLE_CLIENT_STATUS
+    return not isinstance(error, NON_RETRYABLE + (ValueError,))
+
+
+class ProviderStats:
+    """Rolling latency / error window for one (provider, model, method)."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency seconds, ok)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": len(self.samples),
+            "errorRate": round(self.error_rate(), 3),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "consecutiveFailures": self.consecutive_failures,
+        }
+
+
+class ProviderRouter:
+    def __init__(self, registry=None, fallbacks: Optional[str] = None, hedging: Optional[bool] = None,
+                 window: Optional[int] = None, min_samples: Optional[int] = None,
+                 error_threshold: Optional[float] = None, cooldown: Optional[float] = None,
+                 hedge_min_delay: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.registry = registry or get_registry()
+        self.fallbacks = _parse_fallbacks(settings.ROUTER_FALLBACKS if fallbacks is None else fallbacks)
+        self.hedging = settings.ROUTER_HEDGING if hedging is None else hedging
+        self.window = window or settings.ROUTER_WINDOW
+        self.min_samples = min_samples or settings.ROUTER_MIN_SAMPLES
+        self.error_threshold = error_threshold or settings.ROUTER_ERROR_THRESHOLD
+        self.cooldown = settings.ROUTER_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.hedge_min_delay = settings.ROUTER_HEDGE_MIN_DELAY_SECONDS if hedge_min_delay is None else hedge_min_delay
+        self.clock = clock
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    # ------------------------------------------------------------------ #
+    # Health bookkeeping
+    # ------------------------------------------------------------------ #
+
+    def _key(self, provider_name: str, method: str) -> tuple:
+        model = getattr(self.registry.get_pipeline(provider_name), "model", "")
+        return provider_name, model, method
+
+    def _stats_for(self, key: tuple) -> ProviderStats:
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = ProviderStats(self.window)
+            return stats
+
+    def record(self, provider_name: str, method: str, latency: float, ok: bool):
+        metrics.PIPELINE_SECONDS.observe(latency, provider=provider_name, method=method, outcome="ok" if ok else "error")
+        key = self._key(provider_name, method)
+        stats = self._stats_for(key)
+        with self._lock:
+            stats.record(latency, ok)
+            tripped = stats.consecutive_failures >= self.min_samples or (
+                len(stats.samples) >= self.min_samples and stats.error_rate() >= self.error_threshold
+            )
+            if not ok and tripped and stats.open_until <= self.clock():
+                stats.open_until = self.clock() + self.cooldown
+                print(f"[warn] Provider {provider_name} ({key[1]}) unhealthy, skipping for {self.cooldown:.0f}s")
+
+    def healthy(self, provider_name: str, method: str) -> bool:
+        return self._stats_for(self._key(provider_name, method)).open_until <= self.clock()
+
+    def route(self, provider_name: str, method: str) -> list:
+        """Providers to try for a call, best first."""
+        registered = set(self.registry.providers())
+        candidates = [provider_name] + [
+            p for p in self.fallbacks.get(provider_name, []) if p != provider_name and p in registered
+        ]
+
+        def rank(position_and_name):
+            position, name = position_and_name
+            stats = self._stats_for(self._key(name, method))
+            p50 = stats.percentile(0.5) if len(stats.samples) >= self.min_samples else None
+            return (
+                not self.healthy(name, method),
+                bool(getattr(self.registry.get_pipeline(name), "fallback_only", False)),
+                p50 or 0.0,  # unmeasured providers get tried so they gather samples
+                position,
+            )
+
+        return [name for _, name in sorted(enumerate(candidates), key=rank)]
+
+    def hedge_delay(self, provider_name: str, method: str) -> Optional[float]:
+        """p95 latency of the provider, or None while there is too little data to hedge."""
+        pipeline = self.registry.get_pipeline(provider_name)
+        if not self.hedging or not getattr(pipeline, "hedgeable", True):
+            return None
+        stats = self._stats_for(self._key(provider_name, method))
+        if len(stats.samples) < self.min_samples:
+            return None
+        p95 = stats.percentile(0.95)
+        return max(p95, self.hedge_min_delay) if p95 is not None else None
+
+    def stats(self) -> list:
+        with self._lock:
+            items = list(self._stats.items())
+        return [
+            {"provider": provider, "model": model, "method": method, "healthy": s.open_until <= self.clock(), **s.snapshot()}
+            for (provider, model, method), s in items
+        ]
+
+    # ------------------------------------------------------------------ #
+    # Blocking calls
+    # ------------------------------------------------------------------ #
+
+    def run(self, provider_name: str, method: str, *args, **kwargs):
+        """
+        Call `pipeline.<method>(*args, **kwargs)` on the best provider of the
+        route, falling back down the route on failure. Returns
+        (provider that answered, result).
+        """
+        last_error = None
+        for candidate in self.route(provider_name, method):
+            try:
+                return candidate, self._call(candidate, method, args, kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                print(f"[warn] Provider {candidate}.{method} failed, trying next: {e}")
+        raise last_error
+
+    def _timed_call(self, provider_name: str, method: str, args, kwargs):
+        pipeline = self.registry.get_pipeline(provider_name)
+        started = self.clock()
+        try:
+            with span(f"model.{provider_name}", method=method):
+                result = getattr(pipeline, method)(*args, **kwargs)
+        except Exception as e:
+            if _is_retryable(e):
+                self.record(provider_name, method, self.clock() - started, ok=False)
+            raise
+        self.record(provider_name, method, self.clock() - started, ok=True)
+        return result
+
+    def _call(self, provider_name: str, method: str, args, kwargs):
+        delay = self.hedge_delay(provider_name, method)
+        if delay is None:
+            return self._timed_call(provider_name, method, args, kwargs)
+
+        executor = self._get_executor()
+        call = bind_context(self._timed_call)
+        first = executor.submit(call, provider_name, method, args, kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        print(f"[info] Hedging {provider_name}.{method} after {delay:.2f}s")
+        pending = {first, executor.submit(call, provider_name, method, args, kwargs)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+            return self._executor
+
+    # ------------------------------------------------------------------ #
+    # Async calls
+    # ------------------------------------------------------------------ #
+
+    async def arun(self, provider_name: str, method: str, *args, **kwargs):
+        """Async `run`: awaits `pipeline.<method>(...)`; a hedged duplicate's loser is cancelled."""
+        last_error = None
+        for candidate in self.route(provider_name, method):
+            try:
+                return candidate, await self._acall(candidate, method, args, kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                print(f"[warn] Provider {candidate}.{method} failed, trying next: {e}")
+        raise last_error
+
+    async def _timed_acall(self, provider_name: str, method: str, args, kwargs):
+        pipeline = self.registry.get_pipeline(provider_name)
+        started = self.clock()
+        try:
+            with span(f"model.{provider_name}", method=method):
+                if hasattr(pipeline, method):
+                    result = await getattr(pipeline, method)(*args, **kwargs)
+                else:
+                    # Pipelines without an async `arun` still work, on a worker thread
+                    result = await asyncio.to_thread(pipeline.run, *args, **kwargs)
+        except Exception as e:
+            if _is_retryable(e):
+                self.record(provider_name, method, self.clock() - started, ok=False)
+            raise
+        self.record(provider_name, method, self.clock() - started, ok=True)
+        return result
+
+    async def _acall(self, provider_name: str, method: str, args, kwargs):
+        delay = self.hedge_delay(provider_name, method)
+        if delay is None:
+            return await self._timed_acall(provider_name, method, args, kwargs)
+
+        first = asyncio.ensure_future(self._timed_acall(provider_name, method, args, kwargs))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        print(f"[info] Hedging {provider_name}.{method} after {delay:.2f}s")
+        pending = {first, asyncio.ensure_future(self._timed_acall(provider_name, method, args, kwargs))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+    # ------------------------------------------------------------------ #
+    # Streams
+    # ------------------------------------------------------------------ #
+
+    async def astream(self, provider_name: str, method: str, *args, **kwargs):
+        """
+        Async-iterate `pipeline.<method>(...)` on the best provider, yielding
+        (provider, item). Falls back down the route only while nothing has been
+        yielded yet; latency is measured to the first item.
+        """
+        last_error = None
+        for candidate in self.route(provider_name, method):
+            try:
+                stream, first = await self._open_stream(candidate, method, args, kwargs)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                print(f"[warn] Provider {candidate}.{method} failed, trying next: {e}")
+                continue
+
+            yield candidate, first
+            try:
+                async for item in stream:
+                    yield candidate, item
+            finally:
+                await stream.aclose()
+            return
+        raise last_error
+
+    async def _first_item(self, provider_name: str, method: str, stream):
+        started = self.clock()
+        try:
+            with span(f"model.{provider_name}", method=method, firstItem=True):
+                item = await stream.__anext__()
+        except StopAsyncIteration:
+            self.record(provider_name, method, self.clock() - started, ok=True)
+            raise
+        except Exception as e:
+            if _is_retryable(e):
+                self.record(provider_name, method, self.clock() - started, ok=False)
+            raise
+        self.record(provider_name, method, self.clock() - started, ok=True)
+        return item
+
+    async def _open_stream(self, provider_name: str, method: str, args, kwargs):
+        """Start the stream (hedged if due) and return (winning stream, its first item)."""
+        pipeline = self.registry.get_pipeline(provider_name)
+        stream = getattr(pipeline, method)(*args, **kwargs)
+        delay = self.hedge_delay(provider_name, method)
+        if delay is None:
+            return stream, await self._first_item(provider_name, method, stream)
+
+        streams = {}
+        first = asyncio.ensure_future(self._first_item(provider_name, method, stream))
+        streams[first] = stream
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if not done:
+            print(f"[info] Hedging {provider_name}.{method} after {delay:.2f}s")
+            duplicate = getattr(pipeline, method)(*args, **kwargs)
+            streams[asyncio.ensure_future(self._first_item(provider_name, method, duplicate))] = duplicate
+
+        pending = set(streams)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return streams.pop(task), task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel and close the losers (and every stream if all failed)
+            for task, loser in streams.items():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await loser.aclose()
+
+
+def _parse_fallbacks(config: str) -> dict:
+    # ROUTER_FALLBACKS="groq_summarizer=other_summarizer|local_summarizer,..."
+    fallbacks = {}
+    for entry in filter(None, (part.strip() for part in config.split(","))):
+        provider_name, _, alternatives = entry.partition("=")
+        fallbacks[provider_name.strip()] = [a.strip() for a in alternatives.split("|") if a.strip()]
+    return fallbacks
+
+
+_router: Optional[ProviderRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ProviderRouter:
+    """Process-wide router shared by all services."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ProviderRouter()
+    return _router
+
+
+def _provider_health() -> dict:
+    if _router is None:
+        return {}
+    return {(s["provider"], s["model"], s["method"]): float(s["healthy"]) for s in _router.stats()}
+
+
+metrics.PROVIDER_HEALTHY.set_function(_provider_health)
@@ -0,0 +1,236 @@
+# app/services/sentence_index.py
+
+"""
+Per-source sentence index used to pick highlight context locally.
+
+The index is stored compactly next to the source document
+(`sources/{id}/index/sentences`) as NumPy array blobs: int32 character
+offsets of every sentence, uint64 sentence hashes and, in hybrid mode,
+float16 sentence embeddings. Sentence text is never duplicated; it is
+sliced back out of the transcript with the offsets.
+"""
+
+import asyncio
+import hashlib
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.settings import settings
+from app.utils.text_utils import split_sentences, text_hash
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Firestore caps a document at 1 MiB; keep the blobs comfortably below it
+MAX_INDEX_BYTES = 900_000
+
+
+def _sentence_offsets(text: str) -> np.ndarray:
+    offsets, cursor = [], 0
+    for sentence in split_sentences(text):
+        start = text.find(sentence, cursor)
+        if start < 0:
+            continue
+        end = start + len(sentence)
+        offsets.append((start, end))
+        cursor = end
+    return np.array(offsets, dtype=np.int32).reshape(-1, 2)
+
+
+def _sentence_hash(sentence: str) -> int:
+    return int.from_bytes(hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def sentences_from(text: str, offsets: np.ndarray) -> List[str]:
+    return [text[start:end] for start, end in offsets]
+
+
+@lru_cache(maxsize=1)
+def _embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.HIGHLIGHT_EMBEDDING_MODEL)
+
+
+def warm_up():
+    """Load the embedding model up front when hybrid retrieval is enabled."""
+    if settings.HIGHLIGHT_RETRIEVAL_MODE == "hybrid":
+        _embedding_model()
+
+
+def embed(sentences: List[str]) -> np.ndarray:
+    vectors = _embedding_model().encode(sentences, normalize_embeddings=True, convert_to_numpy=True)
+    return vectors.astype(np.float16)
+
+
+def build_index(text: str, previous: Optional[dict] = None) -> dict:
+    """
+    Build the sentence index for `text`. When `previous` is given, embeddings
+    of sentences whose hash is unchanged are reused instead of recomputed.
+    """
+    offsets = _sentence_offsets(text)
+    sentences = sentences_from(text, offsets)
+    hashes = np.array([_sentence_hash(s) for s in sentences], dtype=np.uint64)
+
+    index = {
+        "transcriptHash": text_hash(text),
+        "count": len(sentences),
+        "offsets": offsets,
+        "hashes": hashes,
+        "embeddings": None,
+    }
+
+    if settings.HIGHLIGHT_RETRIEVAL_MODE == "hybrid" and sentences:
+        try:
+            index["embeddings"] = _incremental_embeddings(sentences, hashes, previous)
+        except Exception as e:
+            print(f"[warn] Sentence embeddings unavailable, using BM25 only: {e}")
+
+    return index
+
+
+def _incremental_embeddings(sentences: List[str], hashes: np.ndarray, previous: Optional[dict]) -> np.ndarray:
+    known = {}
+    if previous is not None and previous.get("embeddings") is not None:
+        known = {int(h): row for h, row in zip(previous["hashes"], previous["embeddings"])}
+
+    missing = [i for i, h in enumerate(hashes) if int(h) not in known]
+    fresh = embed([sentences[i] for i in missing]) if missing else None
+    fresh_rows = dict(zip(missing, fresh)) if missing else {}
+
+    rows = [fresh_rows[i] if i in fresh_rows else known[int(h)] for i, h in enumerate(hashes)]
+    if missing:
+        print(f"[info] Embedded {len(missing)} new of {len(sentences)} sentences")
+    return np.stack(rows).astype(np.float16)
+
+
+# ---------------------------------------------------------------------- #
+# Storage
+# ---------------------------------------------------------------------- #
+
+def _index_ref(source_ref):
+    return source_ref.collection("index").document("sentences")
+
+
+def _encode_index(index: dict) -> dict:
+    doc = {
+        "transcriptHash": index["transcriptHash"],
+        "count": index["count"],
+        "offsets": index["offsets"].astype(np.int32).tobytes(),
+        "hashes": index["hashes"].astype(np.uint64).tobytes(),
+        "created_at": datetime.utcnow(),
+    }
+    embeddings = index.get("embeddings")
+    if embeddings is not None:
+        blob = embeddings.astype(np.float16).tobytes()
+        if len(blob) + len(doc["offsets"]) + len(doc["hashes"]) < MAX_INDEX_BYTES:
+            doc["embeddings"] = blob
+            doc["dim"] = int(embeddings.shape[1])
+            doc["model"] = settings.HIGHLIGHT_EMBEDDING_MODEL
+    return doc
+
+
+def _decode_index(doc: dict) -> dict:
+    index = {
+        "transcriptHash": doc.get("transcriptHash"),
+        "count": doc.get("count", 0),
+        "offsets": np.frombuffer(doc["offsets"], dtype=np.int32).reshape(-1, 2),
+        "hashes": np.frombuffer(doc["hashes"], dtype=np.uint64),
+        "embeddings": None,
+    }
+    if doc.get("embeddings") and doc.get("model") == settings.HIGHLIGHT_EMBEDDING_MODEL:
+        index["embeddings"] = np.frombuffer(doc["embeddings"], dtype=np.float16).reshape(-1, doc["dim"])
+    return index
+
+
+def save_index(source_ref, index: dict):
+    _index_ref(source_ref).set(_encode_index(index))
+
+
+def load_index(source_ref) -> Optional[dict]:
+    snapshot = _index_ref(source_ref).get()
+    return _decode_index(snapshot.to_dict()) if snapshot.exists else None
+
+
+def refresh_index(source_ref, text: str) -> dict:
+    """(Re)build and store the index for `text`, reusing unchanged sentences."""
+    previous = load_index(source_ref)
+    if previous and previous["transcriptHash"] == text_hash(text):
+        return previous
+    index = build_index(text, previous)
+    save_index(source_ref, index)
+    return index
+
+
+def delete_index(source_ref):
+    _index_ref(source_ref).delete()
+
+
+async def arefresh_index(source_ref, text: str) -> dict:
+    """`refresh_index` for an async Firestore reference; building (and embedding) runs on a worker thread."""
+    snapshot = await _index_ref(source_ref).get()
+    previous = _decode_index(snapshot.to_dict()) if snapshot.exists else None
+    if previous and previous["transcriptHash"] == text_hash(text):
+        return previous
+    index = await asyncio.to_thread(build_index, text, previous)
+    await _index_ref(source_ref).set(_encode_index(index))
+    return index
+
+
+async def adelete_index(source_ref):
+    await _index_ref(source_ref).delete()
+
+
+# ---------------------------------------------------------------------- #
+# Retrieval
+# ---------------------------------------------------------------------- #
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def bm25_scores(sentences: List[str], query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    docs = [Counter(_tokens(s)) for s in sentences]
+    lengths = np.array([sum(d.values()) for d in docs], dtype=np.float32)
+    avg_len = float(lengths.mean()) if len(lengths) else 0.0
+    n = len(docs)
+
+    scores = np.zeros(n, dtype=np.float32)
+    for term in set(_tokens(query)):
+        tf = np.array([d.get(term, 0) for d in docs], dtype=np.float32)
+        df = int((tf > 0).sum())
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / max(avg_len, 1e-6)))
+    return scores
+
+
+def retrieve(text: str, index: dict, query: str, k: int) -> List[str]:
+    """
+    Top-k sentences for `query`, returned in transcript order. BM25 scores are
+    fused with embedding similarity (reciprocal rank fusion) when the index
+    carries embeddings.
+    """
+    sentences = sentences_from(text, index["offsets"])
+    if len(sentences) <= k:
+        return sentences
+
+    rankings = [np.argsort(-bm25_scores(sentences, query), kind="stable")]
+    if index.get("embeddings") is not None:
+        try:
+            query_vector = embed([query])[0].astype(np.float32)
+            similarity = index["embeddings"].astype(np.float32) @ query_vector
+            rankings.append(np.argsort(-similarity, kind="stable"))
+        except Exception as e:
+            print(f"[warn] Query embedding failed, using BM25 only: {e}")
+
+    fused = np.zeros(len(sentences), dtype=np.float32)
+    for ranking in rankings:
+        fused[ranking] += 1.0 / (60 + np.arange(1, len(ranking) + 1))
+
+    top = sorted(np.argsort(-fused, kind="stable")[:k].tolist())
+    return [sentences[i] for i in top]
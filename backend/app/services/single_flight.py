@@ -0,0 +1,253 @@
+# app/services/single_flight.py
+
+"""
+Single-flight execution of expensive operations (transcribe, summarize).
+
+Concurrent callers with the same key share one computation and its result:
+inside a process through an in-memory table, across instances through a
+lease document in Firestore (`singleFlight/{sha256(key)}`). The leader holds
+the lease, renews it while it works and stores the gzip'd JSON result on the
+lease when done; followers poll the lease and return that result. If the
+leader dies, its lease expires and a follower takes over.
+
+The same records back Idempotency-Key support: with `retain_seconds` the
+finished lease (and its result) is kept, so a retry with the same key gets
+the stored result instead of a new run.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from google.cloud import firestore
+from app.core.firebase_client import db as _db
+from app.core.settings import settings
+
+COLLECTION = "singleFlight"
+# Keep results below Firestore's 1 MiB document limit; larger ones are recomputed by followers
+MAX_STORED_RESULT_BYTES = 700_000
+# How long a finished lease stays around for the followers of its run that are still polling
+FOLLOWER_GRACE_SECONDS = 120
+
+
+class IdempotencyConflict(ValueError):
+    """An Idempotency-Key was reused for a different request."""
+
+
+class _Call:
+    def __init__(self, request_hash: str):
+        self.request_hash = request_hash
+        self.result = None
+        self.error = None
+        self._waiters = []  # (loop, future) of callers waiting on this call
+
+    def add_waiter(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append((loop, future))
+        return future
+
+    def finish(self):
+        # Waiters may sit on other threads' event loops (job workers run their own)
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _encode(result) -> Optional[bytes]:
+    blob = gzip.compress(json.dumps(result).encode("utf-8"))
+    return blob if len(blob) <= MAX_STORED_RESULT_BYTES else None
+
+
+def _decode(blob: bytes):
+    return json.loads(gzip.decompress(blob).decode("utf-8"))
+
+
+class SingleFlight:
+    def __init__(self, db=None, distributed: Optional[bool] = None, lease_seconds: Optional[float] = None,
+                 poll_interval: Optional[float] = None, max_wait: Optional[float] = None):
+        self.db = db or _db
+        self.distributed = settings.SINGLE_FLIGHT_DISTRIBUTED if distributed is None else distributed
+        self.lease_seconds = lease_seconds or settings.SINGLE_FLIGHT_LEASE_SECONDS
+        self.poll_interval = poll_interval or settings.SINGLE_FLIGHT_POLL_SECONDS
+        self.max_wait = max_wait or settings.SINGLE_FLIGHT_MAX_WAIT_SECONDS
+        self.owner = uuid.uuid4().hex
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable], request_hash: str = "", retain_seconds: float = 0):
+        """
+        Await `fn()` once for all concurrent callers of `key` and return its result.
+        `request_hash` identifies the request behind an idempotency key; a retained
+        record with a different hash raises IdempotencyConflict.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call(request_hash)
+                elif call.request_hash == request_hash:
+                    waiter = call.add_waiter()
+            if leader:
+                break
+
+            if call.request_hash != request_hash:
+                raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+            print(f"[info] Joining in-flight {key}")
+            await waiter
+            if isinstance(call.error, asyncio.CancelledError):
+                # The leader's caller went away, not the work itself: take it over
+                print(f"[info] Leader of {key} was cancelled, taking over")
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.distributed:
+                call.result = await self._do_distributed(key, fn, request_hash, retain_seconds)
+            else:
+                call.result = await fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.finish()
+
+    # ------------------------------------------------------------------ #
+    # Cross-instance leases (sync Firestore client, on worker threads)
+    # ------------------------------------------------------------------ #
+
+    def _lease_ref(self, key: str):
+        return self.db.collection(COLLECTION).document(hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable], request_hash: str, retain_seconds: float):
+        ref = self._lease_ref(key)
+        deadline = time.monotonic() + self.max_wait
+        announced = False
+        run_id = None  # run this caller is waiting on
+        while True:
+            try:
+                state, doc = await asyncio.to_thread(self._claim, ref, key, request_hash, run_id)
+            except IdempotencyConflict:
+                raise
+            except Exception as e:
+                print(f"[warn] Single-flight lease unavailable for {key}, running locally: {e}")
+                return await fn()
+
+            if state == "leader":
+                return await self._lead(ref, fn, retain_seconds)
+            if state == "done" and doc.get("result") is not None:
+                print(f"[info] Reusing stored result for {key}")
+                return _decode(doc["result"])
+            if state == "done":
+                # Finished elsewhere but too large to store: compute it here
+                return await fn()
+
+            run_id = doc.get("runId")
+            if not announced:
+                print(f"[info] Waiting for {key} running on another instance")
+                announced = True
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for in-flight {key}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _claim(self, ref, key: str, request_hash: str, run_id: Optional[str] = None):
+        """
+        Transactionally take the lease, or report it as running elsewhere / done.
+        A finished lease counts as done for a retained (idempotent) result or
+        for the followers of its run (`run_id`); anyone else starts a new run.
+        """
+        owner, lease_seconds = self.owner, self.lease_seconds
+
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = ref.get(transaction=transaction)
+            doc = snapshot.to_dict() if snapshot.exists else None
+            now = _now()
+            if doc and doc.get("expiresAt") and doc["expiresAt"] > now:
+                if doc.get("requestHash", "") != request_hash:
+                    raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+                if doc.get("status") == "done":
+                    if doc.get("retained") or (run_id and doc.get("runId") == run_id):
+                        return "done", doc
+                elif doc.get("owner") != owner:
+                    return "running", doc
+            transaction.set(ref, {
+                "key": key,
+                "requestHash": request_hash,
+                "status": "running",
+                "owner": owner,
+                "runId": uuid.uuid4().hex,
+                "expiresAt": now + timedelta(seconds=lease_seconds),
+            })
+            return "leader", None
+
+        return claim(self.db.transaction())
+
+    async def _lead(self, ref, fn: Callable[[], Awaitable], retain_seconds: float):
+        async def renew():
+            # Keep the lease alive while fn() runs (transcriptions can take minutes)
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                try:
+                    await asyncio.to_thread(ref.update, {"expiresAt": _now() + timedelta(seconds=self.lease_seconds)})
+                except Exception as e:
+                    print(f"[warn] Failed to renew single-flight lease: {e}")
+
+        renewer = asyncio.ensure_future(renew())
+        try:
+            result = await fn()
+        except BaseException:
+            renewer.cancel()
+            try:
+                await asyncio.to_thread(ref.delete)  # let a waiting follower take over
+            except Exception as e:
+                print(f"[warn] Failed to release single-flight lease: {e}")
+            raise
+        renewer.cancel()
+
+        keep = max(retain_seconds, FOLLOWER_GRACE_SECONDS)
+        try:
+            await asyncio.to_thread(ref.update, {
+                "status": "done",
+                "result": _encode(result),
+                "retained": retain_seconds > 0,
+                "expiresAt": _now() + timedelta(seconds=keep),
+            })
+        except Exception as e:
+            print(f"[warn] Failed to store single-flight result: {e}")
+        return result
+
+
+def flight_key(user_id: str, *parts: str) -> str:
+    """Single-flight key for an operation, e.g. flight_key(uid, source_id, "summarize", input_hash)."""
+    return ":".join([user_id, *parts])
+
+
+async def run_idempotent(user_id: str, idempotency_key: Optional[str], request: str, fn: Callable[[], Awaitable]):
+    """Await `fn()`, or with an Idempotency-Key return the result stored for an earlier identical request."""
+    if not idempotency_key:
+        return await fn()
+    return await single_flight.do(
+        flight_key(user_id, "idempotency", idempotency_key),
+        fn,
+        request_hash=hashlib.sha256(request.encode("utf-8")).hexdigest(),
+        retain_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    )
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,429 @@
+# app/services/source_repository.py
+
+"""
+One place to read and write source documents
+(`tools/{tool}/users/{uid}/sources/{id}`).
+
+Reads go through two layers before Firestore:
+
+- a request-scoped identity map: within one request (or background job) a
+  document is fetched at most once, and later reads see that request's own
+  writes;
+- a process-wide read-through cache, bounded (LRU) and with a TTL, so the
+  same document polled by the client or read again by the next job stage
+  doesn't cost a round-trip.
+
+Writes made through this module update both layers using the write's commit
+time, so out-of-order writes from concurrent tasks never leave a newer
+value behind an older one. Writes from other processes are only picked up
+once the cached entry expires (`SOURCE_CACHE_TTL_SECONDS`).
+
+Reads return regular Firestore `DocumentSnapshot`s. Updates are conditional:
+a missing document raises `SourceNotFound` (no need to read first just to
+check it exists), and passing `last_update_time` from a snapshot turns a
+read-modify-write into an optimistic transaction (`SourceChanged`).
+"""
+
+import contextvars
+import copy
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterable, List, Optional
+
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import DocumentSnapshot
+
+from app.core import metrics
+from app.core.constants import DEFAULT_TOOL
+from app.core.firebase_client import get_async_db
+from app.core.settings import settings
+
+
+class SourceNotFound(ValueError):
+    """The source document does not exist."""
+
+    def __init__(self, message: str = "Source not found"):
+        super().__init__(message)
+
+
+class SourceChanged(ValueError):
+    """The source document was modified since the snapshot an update was based on."""
+
+
+def sources_collection(user_id: str, tool: str = DEFAULT_TOOL, db=None):
+    return (
+        (db or get_async_db()).collection("tools")
+        .document(tool)
+        .collection("users")
+        .document(user_id)
+        .collection("sources")
+    )
+
+
+def source_ref(user_id: str, source_id: str, tool: str = DEFAULT_TOOL, db=None):
+    """Reference to a source document; async client unless `db` (e.g. the sync client) is given."""
+    return sources_collection(user_id, tool, db).document(source_id)
+
+
+# ---------------------------------------------------------------------- #
+# Cache entries
+# ---------------------------------------------------------------------- #
+
+class _Entry:
+    """
+    What is known about one document: whether it exists, the values of
+    `fields` (None = the whole document) as of `version` (its update time).
+    """
+
+    __slots__ = ("exists", "data", "fields", "version", "expires")
+
+    def __init__(self, exists: bool, data: Optional[dict], fields: Optional[set], version, expires: float):
+        self.exists = exists
+        self.data = data or {}
+        self.fields = fields
+        self.version = version
+        self.expires = expires
+
+    def covers(self, field_paths: Optional[Iterable[str]]) -> bool:
+        if not self.exists or self.fields is None:
+            return True
+        if field_paths is None:
+            return False
+        return all(any(p == f or p.startswith(f + ".") for f in self.fields) for p in field_paths)
+
+    def snapshot(self, ref, field_paths: Optional[Iterable[str]]) -> DocumentSnapshot:
+        data = None
+        if self.exists:
+            data = self.data if field_paths is None else _project(self.data, field_paths)
+        return DocumentSnapshot(ref, data, self.exists, None, None, self.version)
+
+
+_MISSING = object()
+
+
+def _get_path(data: dict, path: str):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(data: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    if value is _MISSING:
+        data.pop(parts[-1], None)
+    else:
+        data[parts[-1]] = value
+
+
+def _project(data: dict, field_paths: Iterable[str]) -> dict:
+    projected = {}
+    for path in field_paths:
+        value = _get_path(data, path)
+        if value is not _MISSING:
+            _set_path(projected, path, value)
+    return projected
+
+
+def _is_transform(value) -> bool:
+    # Server-side values (timestamps, increments, array unions) aren't known until read back
+    if isinstance(value, dict):
+        return any(_is_transform(v) for v in value.values())
+    if value is firestore.DELETE_FIELD:
+        return False  # a sentinel too, but its effect is known: the cached field is removed
+    return type(value).__module__ == "google.cloud.firestore_v1.transforms"
+
+
+class _Cache:
+    """Process-wide LRU of entries keyed by document path."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, path: str) -> Optional[_Entry]:
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._entries[path]
+            return None
+        self._entries.move_to_end(path)
+        return entry
+
+    def put(self, path: str, entry: _Entry):
+        # Missing documents are only remembered per request: another instance may create them any time
+        if settings.SOURCE_CACHE_TTL_SECONDS <= 0 or not entry.exists:
+            self._entries.pop(path, None)
+            return
+        self._entries[path] = entry
+        self._entries.move_to_end(path)
+        while len(self._entries) > settings.SOURCE_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def pop(self, path: str):
+        self._entries.pop(path, None)
+
+
+_lock = threading.Lock()
+_shared = _Cache()
+# Identity map of the current request / job: path -> _Entry (no expiry)
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("source_scope", default=None)
+
+
+@contextmanager
+def scope():
+    """Identity map for the duration of one request or job."""
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def scoped(fn):
+    """Run `fn` (e.g. a job handler) in its own identity-map scope."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with scope():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class ScopeMiddleware:
+    """ASGI middleware giving every HTTP request its own identity map."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope_, receive, send):
+        if scope_["type"] != "http":
+            await self.app(scope_, receive, send)
+            return
+        with scope():
+            await self.app(scope_, receive, send)
+
+
+def invalidate(ref):
+    """Forget a document, e.g. after it was written without going through this module."""
+    with _lock:
+        _shared.pop(ref.path)
+        local = _scope.get()
+        if local is not None:
+            local.pop(ref.path, None)
+
+
+# ---------------------------------------------------------------------- #
+# Reads
+# ---------------------------------------------------------------------- #
+
+def _lookup(path: str, field_paths) -> Optional[_Entry]:
+    with _lock:
+        local = _scope.get()
+        entry = local.get(path) if local is not None else None
+        if entry is not None and entry.covers(field_paths):
+            metrics.SOURCE_CACHE.inc(result="request")
+            return entry
+        entry = _shared.get(path)
+        if entry is not None and entry.covers(field_paths):
+            metrics.SOURCE_CACHE.inc(result="hit")
+            if local is not None:
+                local[path] = entry
+            return entry
+    metrics.SOURCE_CACHE.inc(result="miss")
+    return None
+
+
+def _merge(entry: Optional[_Entry], snapshot, field_paths) -> _Entry:
+    """Combine a fresh snapshot with what is already known about the document."""
+    expires = time.monotonic() + settings.SOURCE_CACHE_TTL_SECONDS
+    data = snapshot.to_dict() if snapshot.exists else None
+    if not snapshot.exists or field_paths is None:
+        return _Entry(snapshot.exists, data, None, snapshot.update_time, expires)
+
+    if entry is None or not entry.exists or entry.version != snapshot.update_time:
+        merged = _Entry(True, {}, set(), snapshot.update_time, expires)
+    else:
+        # Same version: fields read earlier are still current
+        merged = _Entry(True, copy.deepcopy(entry.data), None if entry.fields is None else set(entry.fields),
+                        entry.version, min(entry.expires, expires))
+    for path in field_paths:
+        _set_path(merged.data, path, _get_path(data, path))
+        if merged.fields is not None:
+            merged.fields.add(path)
+    return merged
+
+
+def _store(path: str, snapshot, field_paths) -> _Entry:
+    with _lock:
+        local = _scope.get()
+        known = (local.get(path) if local is not None else None) or _shared.get(path)
+        entry = _merge(known, snapshot, field_paths)
+        if local is not None:
+            local[path] = entry
+        current = _shared.get(path)
+        # Never replace a newer cached version with an older read
+        if current is None or current.version is None or (entry.version and entry.version >= current.version):
+            _shared.put(path, entry)
+        return entry
+
+
+async def aget(ref, field_paths: Optional[List[str]] = None, fresh: bool = False) -> DocumentSnapshot:
+    """Read a source document (or just `field_paths`), from cache when possible."""
+    entry = None if fresh else _lookup(ref.path, field_paths)
+    if entry is None:
+        snapshot = await ref.get(field_paths)
+        entry = _store(ref.path, snapshot, field_paths)
+    return entry.snapshot(ref, field_paths)
+
+
+def get(ref, field_paths: Optional[List[str]] = None, fresh: bool = False) -> DocumentSnapshot:
+    entry = None if fresh else _lookup(ref.path, field_paths)
+    if entry is None:
+        snapshot = ref.get(field_paths)
+        entry = _store(ref.path, snapshot, field_paths)
+    return entry.snapshot(ref, field_paths)
+
+
+def get_all(db, refs: list, field_paths: Optional[List[str]] = None) -> dict:
+    """Read many documents with one batched call for the ones not cached. Returns {source id: snapshot}."""
+    snapshots, missing = {}, []
+    for ref in refs:
+        entry = _lookup(ref.path, field_paths)
+        if entry is not None:
+            snapshots[ref.id] = entry.snapshot(ref, field_paths)
+        else:
+            missing.append(ref)
+    if missing:
+        for snapshot in db.get_all(missing, field_paths=field_paths):
+            entry = _store(snapshot.reference.path, snapshot, field_paths)
+            snapshots[snapshot.id] = entry.snapshot(snapshot.reference, field_paths)
+    return snapshots
+
+
+# ---------------------------------------------------------------------- #
+# Writes
+# ---------------------------------------------------------------------- #
+
+def _apply(path: str, changes: Optional[dict], version, replace: bool = False, exists: bool = True):
+    """Write-through: fold a committed write into the cached entries of the document."""
+    expires = time.monotonic() + settings.SOURCE_CACHE_TTL_SECONDS
+    with _lock:
+        local = _scope.get()
+        maps = [m for m in (local,) if m is not None]
+        for cache_map in maps + [None]:
+            entry = cache_map.get(path) if cache_map is not None else _shared.get(path)
+            if changes is not None and _is_transform(changes):
+                entry = None
+            elif replace or not exists:
+                entry = _Entry(exists, copy.deepcopy(changes), None, version, expires)
+            elif entry is not None and entry.exists and entry.version and version and version > entry.version:
+                entry = _Entry(True, copy.deepcopy(entry.data), None if entry.fields is None else set(entry.fields),
+                               version, entry.expires)
+            elif entry is None:
+                # Nothing cached: what was just written is all that's known
+                entry = _Entry(True, {}, set(), version, expires)
+            else:
+                # Older than what's cached (a concurrent write won the race) or unknown order
+                entry = None
+
+            if entry is not None and changes is not None and not replace and exists:
+                for key, value in changes.items():
+                    _set_path(entry.data, key, _MISSING if value is firestore.DELETE_FIELD else copy.deepcopy(value))
+                    if entry.fields is not None:
+                        entry.fields.add(key)
+
+            if cache_map is not None:
+                if entry is None:
+                    cache_map.pop(path, None)
+                else:
+                    cache_map[path] = entry
+            elif entry is None:
+                _shared.pop(path)
+            else:
+                _shared.put(path, entry)
+
+
+def _write_option(ref, last_update_time):
+    if last_update_time is None:
+        return None
+    return ref._client.write_option(last_update_time=last_update_time)
+
+
+async def aupdate(ref, changes: dict, last_update_time=None):
+    """
+    Update fields of an existing source. Raises `SourceNotFound` if it doesn't
+    exist and, with `last_update_time`, `SourceChanged` if it was modified since.
+    """
+    try:
+        result = await ref.update(changes, option=_write_option(ref, last_update_time))
+    except NotFound:
+        _apply(ref.path, None, None, exists=False)
+        raise SourceNotFound()
+    except FailedPrecondition:
+        invalidate(ref)
+        raise SourceChanged("Source was modified concurrently")
+    except Exception:
+        invalidate(ref)
+        raise
+    _apply(ref.path, changes, result.update_time)
+    return result
+
+
+def update(ref, changes: dict, last_update_time=None):
+    try:
+        result = ref.update(changes, option=_write_option(ref, last_update_time))
+    except NotFound:
+        _apply(ref.path, None, None, exists=False)
+        raise SourceNotFound()
+    except FailedPrecondition:
+        invalidate(ref)
+        raise SourceChanged("Source was modified concurrently")
+    except Exception:
+        invalidate(ref)
+        raise
+    _apply(ref.path, changes, result.update_time)
+    return result
+
+
+def put(ref, data: dict):
+    """Create or replace a source document."""
+    try:
+        result = ref.set(data)
+    except Exception:
+        invalidate(ref)
+        raise
+    _apply(ref.path, data, result.update_time, replace=True)
+    return result
+
+
+def delete(ref, recursive: bool = False):
+    """Delete the document; `recursive` also deletes its subcollections (not atomically)."""
+    try:
+        if recursive:
+            ref._client.recursive_delete(ref)
+            commit_time = None
+        else:
+            commit_time = ref.delete()
+    except Exception:
+        invalidate(ref)
+        raise
+    _apply(ref.path, None, commit_time, exists=False)
+
+
+async def adelete(ref):
+    try:
+        commit_time = await ref.delete()
+    except Exception:
+        invalidate(ref)
+        raise
+    _apply(ref.path, None, commit_time, exists=False)
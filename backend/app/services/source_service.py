@@ -1,25 +1,33 @@
-from google.cloud import storage
+from google.cloud.firestore_v1.base_query import FieldFilter
 from datetime import timedelta, datetime
+from typing import Optional
 from app.core.firebase_client import db as _db
+import base64
+import json
 import uuid
-import os
 
 from app.services.transcribe_service import TranscribeService
-from app.services.summary_service import summarize_and_save
+from app.services.summary_service import is_fallback, summarize_and_save
+from app.services.transcript_service import transcript_field
+from app.services import sentence_index, source_repository, text_store, transcript_timing
+from app.services.source_repository import SourceNotFound
 from app.core.constants import DEFAULT_TOOL
+from app.core.job_queue import job_queue
+from app.core.settings import settings
+from app.utils.async_utils import run_sync
+from app.utils.gcs_utils import get_bucket
+
+
+EXTENSION_MAP = {
+    "audio/webm": ".webm",
+    "audio/mpeg": ".mp3",
+    "audio/wav": ".wav",
+    "application/pdf": ".pdf"
+}
 
-GCS_AUDIO_BUCKET = os.getenv("GCS_AUDIO_BUCKET")
 
 def create_signed_upload_url(user_id: str, content_type: str):
-    client = storage.Client()
-    bucket = client.bucket(GCS_AUDIO_BUCKET)
-
-    EXTENSION_MAP = {
-        "audio/webm": ".webm",
-        "audio/mpeg": ".mp3",
-        "audio/wav": ".wav",
-        "application/pdf": ".pdf"
-    }
+    bucket = get_bucket()
 
     extension = EXTENSION_MAP.get(content_type)
     if not extension:
@@ -42,8 +50,7 @@ def create_signed_upload_url(user_id: str, content_type: str):
 
 
 def create_signed_download_url(file_path: str, user_id: str):
-    client = storage.Client()
-    bucket = client.bucket(GCS_AUDIO_BUCKET)
+    bucket = get_bucket()
 
     if not file_path.startswith(f"{user_id}/"):
         raise ValueError("Access denied")
@@ -61,76 +68,329 @@ def create_signed_download_url(file_path: str, user_id: str):
     return {"downloadUrl": url}
 
 
+def _source_ref(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    # Job stages and other sync callers use the sync client
+    return source_repository.source_ref(user_id, source_id, tool, db=_db)
+
+
+def _set_stage_status(ref, stage: str, status: str, error: str = None, job_id: str = None):
+    """Record per-stage processing status (`processing.<stage>`) on the source document."""
+    entry = {"status": status, "updated_at": datetime.utcnow()}
+    if error:
+        entry["error"] = error
+    if job_id:
+        entry["jobId"] = job_id
+    source_repository.update(ref, {f"processing.{stage}": entry})
+
+
 def save_source_metadata(user_id: str, meta: dict, tool: str = DEFAULT_TOOL):
     source_id = meta.get("sourceId") or str(uuid.uuid4())
     meta["created_at"] = datetime.utcnow()
 
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
-
-    ref.set(meta)
+    ref = _source_ref(user_id, source_id, tool)
 
+    job_id = None
     if meta.get("fileType") == "audio":
-        try:
-            service = TranscribeService()
-            transcript = service.transcribe(
-                provider="groq",
-                gcs_path=meta["path"],
-                user_id=user_id
-            )
-
-            ref.update({
-                "transcript": {
-                    "text": transcript["transcript"],
-                    "provider": transcript["provider"],
-                    "created_at": datetime.utcnow()
-                }
-            })
-
-            try:
-                summarize_and_save(user_id=user_id, source_id=source_id)
-            except Exception as e:
-                print(f"[warn] Failed to summarize: {e}")
-
-        except Exception as e:
-            print(f"[warn] Failed to auto-transcribe: {e}")
+        # Transcription + summary run in the background job queue
+        job_id = str(uuid.uuid4())
+        meta["processing"] = {
+            "transcription": {"status": "queued", "jobId": job_id, "updated_at": datetime.utcnow()}
+        }
+
+    source_repository.put(ref, meta)
+
+    # Enqueued only once the document exists: an idle worker picks the job up right away
+    if job_id:
+        job_queue.enqueue(
+            "transcribe",
+            {"userId": user_id, "sourceId": source_id, "path": meta["path"], "tool": tool},
+            user_id=user_id,
+            job_id=job_id,
+        )
 
     return {"message": "Metadata saved", "sourceId": source_id}
 
 
-def get_all_sources(user_id: str, tool: str = DEFAULT_TOOL):
+def get_source_status(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    return run_sync(aget_source_status(user_id, source_id, tool))
+
+
+async def aget_source_status(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    doc = await source_repository.aget(ref, ["processing", "transcript.provider", "summary.provider"])
+    if not doc.exists:
+        raise ValueError("Source not found")
+
+    data = doc.to_dict()
+    return {
+        "sourceId": source_id,
+        "processing": data.get("processing", {}),
+        "hasTranscript": bool(data.get("transcript")),
+        "hasSummary": bool(data.get("summary")),
+    }
+
+
+# ---------------------------------------------------------------------- #
+# Background job stages
+# ---------------------------------------------------------------------- #
+
+def _run_transcription_job(payload: dict):
+    user_id, source_id, tool = payload["userId"], payload["sourceId"], payload["tool"]
+    ref = _source_ref(user_id, source_id, tool)
+
     try:
-        ref = (
-            _db.collection("tools")
-            .document(tool)
-            .collection("users")
-            .document(user_id)
-            .collection("sources")
+        _set_stage_status(ref, "transcription", "running")
+    except SourceNotFound:
+        return {"skipped": "source deleted"}
+
+    service = TranscribeService()
+    transcript = service.transcribe(
+        provider="groq",
+        gcs_path=payload["path"],
+        user_id=user_id
+    )
+
+    source_repository.update(ref, {"transcript": transcript_field(ref, transcript["transcript"], transcript["provider"])})
+    _set_stage_status(ref, "transcription", "done")
+
+    try:
+        sentence_index.refresh_index(ref, transcript["transcript"])
+    except Exception as e:
+        print(f"[warn] Failed to build sentence index: {e}")
+    _save_timing(ref, transcript["transcript"], transcript.get("segments"), transcript.get("words"))
+
+    if payload.get("summarize", True):
+        _queue_summary(ref, user_id, source_id, tool, batch_id=payload.get("batchId"))
+    return {"provider": transcript["provider"]}
+
+
+def _save_timing(ref, text: str, segments, words):
+    # Transcripts cached before timestamps were kept have no segments
+    if not segments:
+        return
+    try:
+        transcript_timing.save_timing(ref, text, segments, words)
+    except Exception as e:
+        print(f"[warn] Failed to store transcript timestamps: {e}")
+
+
+def _queue_summary(ref, user_id: str, source_id: str, tool: str, batch_id: str = None,
+                   fallback_retries: int = 0, delay: float = 0):
+    payload = {"userId": user_id, "sourceId": source_id, "tool": tool}
+    if fallback_retries:
+        payload["fallbackRetries"] = fallback_retries
+    # Status first: an idle worker may pick the job up (and report on it) right away
+    job_id = str(uuid.uuid4())
+    _set_stage_status(ref, "summary", "queued", job_id=job_id)
+    job_queue.enqueue("summarize", payload, user_id=user_id, batch_id=batch_id, job_id=job_id, delay=delay)
+
+
+def _summary_provider(ref) -> Optional[str]:
+    summary = (source_repository.get(ref, ["summary.provider"]).to_dict() or {}).get("summary") or {}
+    return summary.get("provider")
+
+
+def _run_summary_job(payload: dict):
+    user_id, source_id, tool = payload["userId"], payload["sourceId"], payload["tool"]
+    ref = _source_ref(user_id, source_id, tool)
+    retries = payload.get("fallbackRetries", 0)
+
+    try:
+        # A redo of a fallback summary is moot once someone regenerated it remotely
+        if retries and not is_fallback(_summary_provider(ref)):
+            _set_stage_status(ref, "summary", "done")
+            return {"skipped": "summary already replaced"}
+        _set_stage_status(ref, "summary", "running")
+    except SourceNotFound:
+        return {"skipped": "source deleted"}
+
+    summarize_and_save(user_id=user_id, source_id=source_id, tool=tool)
+    _set_stage_status(ref, "summary", "done")
+
+    # The remote summarizers were down: keep the local summary for now and try them again later
+    provider = _summary_provider(ref)
+    if is_fallback(provider) and retries < settings.SUMMARY_FALLBACK_RETRIES:
+        print(f"[info] Summary of {source_id} came from {provider}, redoing it in {settings.SUMMARY_FALLBACK_RETRY_SECONDS:.0f}s")
+        _queue_summary(ref, user_id, source_id, tool, fallback_retries=retries + 1,
+                       delay=settings.SUMMARY_FALLBACK_RETRY_SECONDS)
+    return {"provider": provider}
+
+
+def _stage_failure_hook(stage: str):
+    def _on_failure(payload: dict, error: str, will_retry: bool):
+        ref = _source_ref(payload["userId"], payload["sourceId"], payload["tool"])
+        try:
+            _set_stage_status(ref, stage, "retrying" if will_retry else "failed", error=error)
+        except SourceNotFound:
+            pass
+    return _on_failure
+
+
+# Each job gets its own identity map, like a request
+job_queue.register("transcribe", source_repository.scoped(_run_transcription_job),
+                   on_failure=_stage_failure_hook("transcription"))
+job_queue.register("summarize", source_repository.scoped(_run_summary_job), on_failure=_stage_failure_hook("summary"))
+
+
+# ---------------------------------------------------------------------- #
+# Live recordings (transcribed while recording, see live_transcription.py)
+# ---------------------------------------------------------------------- #
+
+def create_live_source(user_id: str, meta: dict, tool: str = DEFAULT_TOOL) -> dict:
+    """
+    Source document for a recording in progress. The audio object's path is
+    fixed up front; the audio itself and the transcript arrive in
+    `finish_live_source`.
+    """
+    source_id = str(uuid.uuid4())
+    mime_type = (meta.get("mimeType") or "audio/webm").split(";")[0].strip()
+    extension = EXTENSION_MAP.get(mime_type, ".webm")
+    if extension == ".pdf":
+        raise ValueError("Unsupported content type")
+
+    data = {
+        "name": meta.get("name") or "Live recording",
+        "path": f"{user_id}/{source_id}{extension}",
+        "fileType": "audio",
+        "size": 0,
+        "groupId": meta.get("groupId"),
+        "topic": meta.get("topic"),
+        "created_at": datetime.utcnow(),
+        "processing": {"transcription": {"status": "live", "updated_at": datetime.utcnow()}},
+    }
+    source_repository.put(_source_ref(user_id, source_id, tool), data)
+    return {"sourceId": source_id, "path": data["path"], "mimeType": mime_type}
+
+
+def finish_live_source(user_id: str, source_id: str, size: int, transcript: Optional[str],
+                       provider: str = "groq", tool: str = DEFAULT_TOOL, segments=None, words=None):
+    """
+    Record the archived audio and the transcript assembled while recording
+    (with its segment/word timestamps), then queue the summary. Without a transcript (no ffmpeg, provider errors)
+    the archived audio goes through the regular transcription job instead.
+    """
+    ref = _source_ref(user_id, source_id, tool)
+    doc = source_repository.get(ref, ["path"])
+    if not doc.exists:
+        raise SourceNotFound(f"Source {source_id} not found")
+
+    if transcript is None:
+        job_id = str(uuid.uuid4())
+        source_repository.update(ref, {"size": size})
+        _set_stage_status(ref, "transcription", "queued", job_id=job_id)
+        job_queue.enqueue(
+            "transcribe",
+            {"userId": user_id, "sourceId": source_id, "path": doc.get("path"), "tool": tool},
+            user_id=user_id,
+            job_id=job_id,
         )
-        docs = ref.order_by("created_at", direction="DESCENDING").stream()
-        return [doc.to_dict() | {"sourceId": doc.id} for doc in docs]
+        return
+
+    source_repository.update(ref, {
+        "size": size,
+        "transcript": transcript_field(ref, transcript, provider),
+    })
+    _set_stage_status(ref, "transcription", "done")
+
+    try:
+        sentence_index.refresh_index(ref, transcript)
+    except Exception as e:
+        print(f"[warn] Failed to build sentence index: {e}")
+    _save_timing(ref, transcript, segments, words)
+
+    _queue_summary(ref, user_id, source_id, tool)
+
+
+def discard_live_source(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    """Drop the document of a live recording that ended before any audio arrived."""
+    source_repository.delete(_source_ref(user_id, source_id, tool))
+
+
+def fail_live_source(user_id: str, source_id: str, error: str, tool: str = DEFAULT_TOOL):
+    """Mark a live recording that could not be saved as failed, instead of leaving it "live"."""
+    try:
+        _set_stage_status(_source_ref(user_id, source_id, tool), "transcription", "failed", error=error)
+    except SourceNotFound:
+        pass
+
+
+# Fields returned for the sources list view (no transcript/summary bodies)
+LIST_VIEW_FIELDS = [
+    "name", "path", "fileType", "size", "groupId", "topic", "status", "processing", "created_at",
+]
+
+
+def _encode_cursor(created_at: datetime, source_id: str) -> str:
+    raw = json.dumps({"created_at": created_at.isoformat(), "id": source_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return {"created_at": datetime.fromisoformat(raw["created_at"]), "__name__": raw["id"]}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_all_sources(
+    user_id: str,
+    tool: str = DEFAULT_TOOL,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: str = "list",
+    group_id: Optional[str] = None,
+    topic: Optional[str] = None,
+) -> dict:
+    return run_sync(aget_all_sources(user_id, tool, limit, cursor, fields, group_id, topic))
+
+
+async def aget_all_sources(
+    user_id: str,
+    tool: str = DEFAULT_TOOL,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: str = "list",
+    group_id: Optional[str] = None,
+    topic: Optional[str] = None,
+) -> dict:
+    """
+    List a user's sources, newest first. Returns `{"items": [...], "nextCursor": ...}`;
+    `nextCursor` is set when `limit` cut the page short. With `fields="list"`
+    only list-view fields are read from Firestore.
+    """
+    query = source_repository.sources_collection(user_id, tool)
+    # groupId/topic filters are backed by composite indexes in firestore.indexes.json
+    if group_id:
+        query = query.where(filter=FieldFilter("groupId", "==", group_id))
+    if topic:
+        query = query.where(filter=FieldFilter("topic", "==", topic))
+
+    query = query.order_by("created_at", direction="DESCENDING").order_by("__name__", direction="DESCENDING")
+    if fields == "list":
+        query = query.select(LIST_VIEW_FIELDS)
+    if cursor:
+        query = query.start_after(_decode_cursor(cursor))
+    if limit:
+        query = query.limit(limit)
+
+    try:
+        docs = [doc async for doc in query.stream()]
     except Exception as e:
         print(f"[error] Failed to fetch sources for {user_id}: {e}")
-        return []
+        return {"items": [], "nextCursor": None}
+
+    items = [doc.to_dict() | {"sourceId": doc.id} for doc in docs]
+    next_cursor = None
+    if limit and len(items) == limit and items[-1].get("created_at"):
+        next_cursor = _encode_cursor(items[-1]["created_at"], items[-1]["sourceId"])
+    return {"items": items, "nextCursor": next_cursor}
 
 
 def delete_source(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
+    ref = _source_ref(user_id, source_id, tool)
 
-    doc = ref.get()
+    doc = source_repository.get(ref, ["path"])
     if not doc.exists:
         raise ValueError("Source not found")
 
@@ -139,14 +399,14 @@ def delete_source(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
     if not path:
         raise ValueError("Missing GCS path in metadata")
 
-    # Delete from GCS
-    client = storage.Client()
-    bucket = client.bucket(GCS_AUDIO_BUCKET)
+    # Delete from GCS (audio plus offloaded transcript/summary bodies)
+    bucket = get_bucket()
     blob = bucket.blob(path)
     if blob.exists():
         blob.delete()
+    text_store.delete_all_text(ref)
 
-    # Delete from Firestore
-    ref.delete()
+    # Delete from Firestore, with the subcollections (summaryChunks, index/sentences, answers, timing)
+    source_repository.delete(ref, recursive=True)
 
     return {"message": "Source deleted", "sourceId": source_id}
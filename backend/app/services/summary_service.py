@@ -1,54 +1,175 @@
-from app.core.firebase_client import db as _db
-from app.services.model_registry import ModelRegistry
+from app.core.firebase_client import get_async_db
+from app.services.model_registry import get_registry
+from app.services.provider_router import get_router
+from app.services import source_repository, text_store
+from app.core.request_context import set_user_id, user_scope
+from app.services.single_flight import flight_key, run_idempotent, single_flight
+from app.services.transcript_service import chunk_hashes
+from app.utils.async_utils import run_sync
+from app.utils.text_utils import text_hash
+from typing import Optional
 from app.core.constants import DEFAULT_TOOL
+from app.utils.sse import sse_event
 from datetime import datetime
+import asyncio
+
+# Sync wrappers for job workers and other non-async callers
 
 def get_summary(user_id: str, source_id: str, tool: str = DEFAULT_TOOL) -> dict:
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
-    doc = ref.get()
+    return run_sync(aget_summary(user_id, source_id, tool))
+
+
+def summarize_and_save(user_id: str, source_id: str, provider: str = "groq_summarizer", tool: str = DEFAULT_TOOL,
+                       idempotency_key: Optional[str] = None) -> str:
+    return run_sync(asummarize_and_save(user_id, source_id, provider, tool, idempotency_key))
+
+
+async def aget_summary(user_id: str, source_id: str, tool: str = DEFAULT_TOOL) -> dict:
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    doc = await source_repository.aget(ref, ["summary"])
     if not doc.exists:
         raise ValueError("Source not found")
 
-    summary = doc.to_dict().get("summary")
+    summary = await text_store.ahydrate(ref, doc.to_dict() or {}, "summary")
     if not summary:
         raise ValueError("Summary not available")
 
     return summary
 
 
-def summarize_and_save(user_id: str, source_id: str, provider: str = "groq_summarizer", tool: str = DEFAULT_TOOL) -> str:
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
+async def asummarize_and_save(user_id: str, source_id: str, provider: str = "groq_summarizer",
+                              tool: str = DEFAULT_TOOL, idempotency_key: Optional[str] = None) -> str:
+    return await run_idempotent(
+        user_id, idempotency_key, f"summarize:{tool}:{source_id}:{provider}",
+        lambda: _summarize_and_save(user_id, source_id, provider, tool),
     )
-    doc = ref.get()
+
+
+async def _summarize_and_save(user_id: str, source_id: str, provider: str, tool: str) -> str:
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    transcript = await _load_transcript(ref)
+
+    # Concurrent requests for the same transcript share one summary
+    key = flight_key(user_id, tool, source_id, "summarize", provider, text_hash(transcript))
+    return await single_flight.do(key, lambda: _summarize(ref, user_id, transcript, provider))
+
+
+async def _summarize(ref, user_id: str, transcript: str, provider: str) -> str:
+    # Reuse chunk summaries from earlier runs (map-reduce for long transcripts)
+    hashes, stored_chunks = await _load_chunk_summaries(ref, transcript, provider)
+    chunk_cache = dict(stored_chunks)
+
+    # The router may answer from a fallback provider; record whichever did
+    with user_scope(user_id):
+        served_by, summary_text = await get_router().arun(provider, "arun", transcript, chunk_cache=chunk_cache)
+
+    await _save_summary(ref, summary_text, served_by, provider, hashes, stored_chunks, chunk_cache)
+    return summary_text
+
+
+async def stream_summary(user_id: str, source_id: str, provider: str = "groq_summarizer", tool: str = DEFAULT_TOOL):
+    """
+    Validate the source and return an async generator of SSE events relaying
+    summary tokens as they arrive; the summary is saved once the stream completes.
+    """
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    transcript = await _load_transcript(ref)
+    router = get_router()
+    router.route(provider, "astream")  # unknown provider -> ValueError before streaming starts
+    hashes, stored_chunks = await _load_chunk_summaries(ref, transcript, provider)
+    chunk_cache = dict(stored_chunks)
+
+    async def events():
+        set_user_id(user_id)  # provider calls are scheduled per user
+        parts = []
+        served_by = provider
+        try:
+            async for served_by, delta in router.astream(provider, "astream", transcript, chunk_cache=chunk_cache):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+
+            summary_text = "".join(parts).strip()
+            await _save_summary(ref, summary_text, served_by, provider, hashes, stored_chunks, chunk_cache)
+            yield sse_event("done", {"summary": summary_text})
+        except Exception as e:
+            print(f"[error] Summary stream failed for {source_id}: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return events()
+
+
+async def _load_transcript(ref) -> str:
+    doc = await source_repository.aget(ref, ["transcript"])
     if not doc.exists:
         raise ValueError("Source not found")
 
-    transcript = doc.to_dict().get("transcript", {}).get("text")
+    transcript = await text_store.aload_text(ref, doc.to_dict() or {}, "transcript")
     if not transcript:
         raise ValueError("Transcript missing for this source")
+    return transcript
 
-    pipeline = ModelRegistry().get_pipeline(provider)
-    summary_text = pipeline.run(transcript)
 
-    ref.update({
-        "summary": {
-            "text": summary_text,
-            "provider": provider,
-            "created_at": datetime.utcnow()
-        }
-    })
+def is_fallback(provider: Optional[str]) -> bool:
+    """Whether `provider` is a local stand-in (e.g. the extractive summarizer) whose output should be redone."""
+    registry = get_registry()
+    if provider not in registry.providers():
+        return False
+    return bool(getattr(registry.get_pipeline(provider), "fallback_only", False))
 
-    return summary_text
+
+def _chunk_id(provider: str, chunk_hash: str) -> str:
+    # Chunk summaries are only reused by the provider and model that wrote them
+    model = getattr(get_registry().get_pipeline(provider), "model", "")
+    return f"{provider}:{model.replace('/', '_')}:{chunk_hash}"
+
+
+def _chunk_hash(chunk_id: str) -> Optional[str]:
+    # None for ids from before chunk summaries were keyed by model
+    return chunk_id.rpartition(":")[2] if chunk_id.count(":") >= 2 else None
+
+
+async def _load_chunk_summaries(ref, transcript: str, provider: str) -> tuple:
+    """
+    The transcript's chunk hashes and the chunk summaries `provider` already
+    wrote for them ({chunk hash: summary}), read in one batch.
+    """
+    field = ((await source_repository.aget(ref, ["transcript.chunks"])).to_dict() or {}).get("transcript") or {}
+    hashes = field.get("chunks") or await asyncio.to_thread(chunk_hashes, transcript)
+    chunks_ref = ref.collection("summaryChunks")
+    refs = [chunks_ref.document(_chunk_id(provider, h)) for h in dict.fromkeys(hashes)]
+    stored = {}
+    if refs:
+        async for snapshot in get_async_db().get_all(refs, field_paths=["text"]):
+            if snapshot.exists:
+                stored[_chunk_hash(snapshot.id)] = snapshot.get("text") or ""
+    return set(hashes), stored
+
+
+async def _save_summary(ref, summary_text: str, served_by: str, provider: str, hashes: set,
+                        stored_chunks: dict, chunk_cache: dict):
+    chunks_ref = ref.collection("summaryChunks")
+    batch = get_async_db().batch()
+    writes = 0
+    # After a fallback the new chunk summaries may come from either provider: keep none of them
+    if served_by == provider:
+        model = getattr(get_registry().get_pipeline(provider), "model", "")
+        for key, text in chunk_cache.items():
+            if key in hashes and key not in stored_chunks:
+                batch.set(chunks_ref.document(_chunk_id(provider, key)),
+                          {"text": text, "provider": provider, "model": model, "created_at": datetime.utcnow()})
+                writes += 1
+    # Chunks edited out of the transcript (and higher map-reduce levels) are never read again
+    async for doc in chunks_ref.select([]).stream():
+        if _chunk_hash(doc.id) not in hashes:
+            batch.delete(doc.reference)
+            writes += 1
+    if writes:
+        await batch.commit()
+
+    old_summary = ((await source_repository.aget(ref, ["summary"])).to_dict() or {}).get("summary")
+    new_summary = await asyncio.to_thread(
+        text_store.text_field, ref, "summary", summary_text,
+        provider=served_by, fallback=is_fallback(served_by), created_at=datetime.utcnow(),
+    )
+    await source_repository.aupdate(ref, {"summary": new_summary})
+    await asyncio.to_thread(text_store.delete_text, old_summary, new_summary)
@@ -0,0 +1,161 @@
+# app/services/text_store.py
+
+"""
+Large text fields (transcript, summary) live as gzip-compressed objects in
+the audio bucket; the Firestore field keeps only a pointer:
+
+    "transcript": {
+        "provider": ..., "created_at": ...,
+        "blob": {"path", "encoding", "size", "compressedSize", "sha256"},
+    }
+
+Texts below TEXT_OFFLOAD_MIN_BYTES stay inline under "text". Documents written
+before offloading existed are migrated the first time their text is loaded.
+"""
+
+import asyncio
+import gzip
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+from google.api_core.exceptions import GoogleAPICallError, NotFound
+from app.core.settings import settings
+from app.core.tracing import span
+from app.services import source_repository
+from app.utils.gcs_utils import get_bucket, record_transfer
+
+
+def _blob_prefix(source_ref) -> str:
+    return f"{settings.TEXT_BLOB_PREFIX}/{source_ref.path}/"
+
+
+def put_text(source_ref, kind: str, text: str) -> dict:
+    """Upload `text` compressed and return the pointer to store in Firestore."""
+    raw = text.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    compressed = gzip.compress(raw, compresslevel=6)
+
+    # Content-addressed name: readers holding an older pointer never see new bytes
+    path = f"{_blob_prefix(source_ref)}{kind}-{digest[:16]}.txt.gz"
+    blob = get_bucket().blob(path)
+    with span("gcs.upload", kind=kind):
+        blob.upload_from_string(compressed, content_type="application/gzip")
+    record_transfer("upload", len(compressed))
+
+    return {
+        "path": path,
+        "encoding": "gzip",
+        "size": len(raw),
+        "compressedSize": len(compressed),
+        "sha256": digest,
+    }
+
+
+@lru_cache(maxsize=64)
+def _fetch_text(path: str, sha256: str) -> str:
+    with span("gcs.download"):
+        compressed = get_bucket().blob(path).download_as_bytes()
+    record_transfer("download", len(compressed))
+    return gzip.decompress(compressed).decode("utf-8")
+
+
+def text_field(source_ref, kind: str, text: str, **meta) -> dict:
+    """Build the Firestore value for a text field, offloading the body when it is large."""
+    if len(text.encode("utf-8")) < settings.TEXT_OFFLOAD_MIN_BYTES:
+        return {"text": text, **meta}
+    return {"blob": put_text(source_ref, kind, text), "length": len(text), **meta}
+
+
+def load_text(source_ref, data: dict, kind: str) -> Optional[str]:
+    """
+    Return the text of `data[kind]`, fetching and decompressing it from GCS if it
+    was offloaded. Large inline texts are migrated to GCS on the way.
+    """
+    field = data.get(kind) or {}
+    if field.get("blob"):
+        pointer = field["blob"]
+        return _fetch_text(pointer["path"], pointer["sha256"])
+
+    text = field.get("text")
+    if text and len(text.encode("utf-8")) >= settings.TEXT_OFFLOAD_MIN_BYTES:
+        try:
+            migrated = {k: v for k, v in field.items() if k != "text"}
+            migrated.update(text_field(source_ref, kind, text))
+            source_repository.update(source_ref, {kind: migrated})
+        except Exception as e:
+            print(f"[warn] Failed to migrate inline {kind} to GCS: {e}")
+    return text
+
+
+def text_sha256(field: Optional[dict]) -> Optional[str]:
+    """Hash of the text behind a field (`text_hash`), without downloading offloaded bodies."""
+    field = field or {}
+    if field.get("blob"):
+        return field["blob"]["sha256"]
+    return hashlib.sha256(field["text"].encode("utf-8")).hexdigest() if field.get("text") else None
+
+
+# Bookkeeping kept next to a text that API responses don't include
+_STORAGE_KEYS = ("blob", "length", "chunks")
+
+
+def hydrate(source_ref, data: dict, kind: str) -> Optional[dict]:
+    """`data[kind]` with its text loaded, as API responses expect."""
+    field = data.get(kind)
+    if not field:
+        return None
+    hydrated = {k: v for k, v in field.items() if k not in _STORAGE_KEYS}
+    hydrated["text"] = load_text(source_ref, data, kind)
+    return hydrated
+
+
+async def aload_text(source_ref, data: dict, kind: str) -> Optional[str]:
+    """`load_text` for an async Firestore reference; GCS reads run on a worker thread."""
+    field = data.get(kind) or {}
+    if field.get("blob"):
+        pointer = field["blob"]
+        return await asyncio.to_thread(_fetch_text, pointer["path"], pointer["sha256"])
+
+    text = field.get("text")
+    if text and len(text.encode("utf-8")) >= settings.TEXT_OFFLOAD_MIN_BYTES:
+        try:
+            migrated = {k: v for k, v in field.items() if k != "text"}
+            migrated.update(await asyncio.to_thread(text_field, source_ref, kind, text))
+            await source_repository.aupdate(source_ref, {kind: migrated})
+        except Exception as e:
+            print(f"[warn] Failed to migrate inline {kind} to GCS: {e}")
+    return text
+
+
+async def ahydrate(source_ref, data: dict, kind: str) -> Optional[dict]:
+    field = data.get(kind)
+    if not field:
+        return None
+    hydrated = {k: v for k, v in field.items() if k not in _STORAGE_KEYS}
+    hydrated["text"] = await aload_text(source_ref, data, kind)
+    return hydrated
+
+
+def delete_text(old_field: Optional[dict], new_field: Optional[dict] = None):
+    """Best-effort removal of the blob behind a replaced or deleted text field."""
+    old_pointer = (old_field or {}).get("blob")
+    new_pointer = (new_field or {}).get("blob")
+    if not old_pointer or (new_pointer and new_pointer["path"] == old_pointer["path"]):
+        return
+    try:
+        with span("gcs.delete"):
+            get_bucket().blob(old_pointer["path"]).delete()
+    except NotFound:
+        pass
+    except GoogleAPICallError as e:
+        # The new text is already saved; an orphaned blob only costs storage
+        print(f"[warn] Failed to delete text blob {old_pointer['path']}: {e}")
+
+
+def delete_all_text(source_ref):
+    for blob in get_bucket().list_blobs(prefix=_blob_prefix(source_ref)):
+        try:
+            blob.delete()
+        except NotFound:
+            pass
@@ -1,11 +1,59 @@
 # backend/app/services/transcribe_service.py
 
-from app.services.model_registry import ModelRegistry
+import asyncio
+from typing import Optional
+from app.core.request_context import user_scope
+from app.core.settings import settings
+from app.services.model_registry import get_registry
+from app.services.provider_router import get_router
+from app.services.single_flight import flight_key, run_idempotent, single_flight
+from app.services.transcript_cache import transcript_cache
+from app.utils.async_utils import run_sync
+from app.utils.gcs_utils import get_audio_fingerprint
 
 class TranscribeService:
     def __init__(self):
-        self.registry = ModelRegistry()
+        self.registry = get_registry()
 
-    def transcribe(self, provider: str, gcs_path: str, user_id: str):
+    def transcribe(self, provider: str, gcs_path: str, user_id: str, idempotency_key: Optional[str] = None):
+        """Sync wrapper for job workers and other non-async callers."""
+        return run_sync(self.atranscribe(provider, gcs_path, user_id, idempotency_key))
+
+    async def atranscribe(self, provider: str, gcs_path: str, user_id: str, idempotency_key: Optional[str] = None):
+        return await run_idempotent(
+            user_id, idempotency_key, f"transcribe:{provider}:{gcs_path}",
+            lambda: self._transcribe(provider, gcs_path, user_id),
+        )
+
+    async def _transcribe(self, provider: str, gcs_path: str, user_id: str):
         pipeline = self.registry.get_pipeline(provider)
-        return pipeline.run(gcs_path, user_id)
+        fingerprint = await asyncio.to_thread(self._fingerprint, gcs_path, user_id)
+
+        cache_key = None
+        if settings.TRANSCRIPT_CACHE_ENABLED and fingerprint:
+            cache_key = transcript_cache.make_key(fingerprint, provider, getattr(pipeline, "model", ""))
+            cached = await asyncio.to_thread(transcript_cache.get, cache_key)
+            if cached:
+                print(f"[info] Transcript cache hit for {gcs_path}")
+                return cached
+
+        async def run():
+            with user_scope(user_id):
+                served_by, result = await get_router().arun(provider, "arun", gcs_path, user_id)
+
+            # Only cache answers from the requested provider, not degraded fallbacks
+            if cache_key and served_by == provider:
+                await asyncio.to_thread(transcript_cache.put, cache_key, result)
+            return result
+
+        # Concurrent requests for the same audio share one transcription
+        return await single_flight.do(flight_key(user_id, "transcribe", provider, fingerprint or gcs_path), run)
+
+    def _fingerprint(self, gcs_path: str, user_id: str) -> Optional[str]:
+        try:
+            return get_audio_fingerprint(gcs_path, user_id)
+        except (FileNotFoundError, PermissionError):
+            raise
+        except Exception as e:
+            print(f"[warn] Could not fingerprint {gcs_path}: {e}")
+            return None
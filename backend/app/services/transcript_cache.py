@@ -0,0 +1,113 @@
+# app/services/transcript_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core import metrics
+from app.core.settings import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcript_cache_last_access ON transcript_cache (last_access);
+"""
+
+
+class SQLiteCacheBackend:
+    """Local cache storage in a SQLite file (or `:memory:` for tests)."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM transcript_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE transcript_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcript_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM transcript_cache WHERE key = ?", (key,))
+
+    def evict(self, ttl_seconds: float, max_entries: int) -> int:
+        """Drop expired entries, then least-recently-used ones beyond `max_entries`."""
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM transcript_cache WHERE created_at < ?", (time.time() - ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM transcript_cache WHERE key IN ("
+                "  SELECT key FROM transcript_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?"
+                ")",
+                (max_entries,),
+            ).rowcount
+        return expired + overflow
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM transcript_cache").fetchone()[0]
+
+
+class TranscriptCache:
+    """
+    Content-addressed transcript cache: the key is the audio content hash plus
+    provider and model, so re-uploads of the same recording skip transcription.
+    """
+
+    def __init__(self, backend, ttl_seconds: float, max_entries: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+
+    @staticmethod
+    def make_key(fingerprint: str, provider: str, model: str) -> str:
+        return hashlib.sha256(f"{fingerprint}|{provider}|{model}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.backend.get(key)
+        if entry and time.time() - entry[1] <= self.ttl_seconds:
+            metrics.TRANSCRIPT_CACHE.inc(result="hit")
+            return entry[0]
+        if entry:
+            self.backend.delete(key)
+        metrics.TRANSCRIPT_CACHE.inc(result="miss")
+        return None
+
+    def put(self, key: str, value: dict):
+        self.backend.set(key, value)
+        self._writes += 1
+        if self._writes % 50 == 0:
+            self.backend.evict(self.ttl_seconds, self.max_entries)
+
+
+transcript_cache = TranscriptCache(
+    SQLiteCacheBackend(settings.TRANSCRIPT_CACHE_PATH),
+    ttl_seconds=settings.TRANSCRIPT_CACHE_TTL_SECONDS,
+    max_entries=settings.TRANSCRIPT_CACHE_MAX_ENTRIES,
+)
+
+metrics.TRANSCRIPT_CACHE_ENTRIES.set_function(lambda: {(): transcript_cache.backend.count()})
@@ -1,59 +1,205 @@
+import asyncio
 from google.cloud import firestore
 from datetime import datetime
-from app.core.firebase_client import db as _db
+from typing import List, Optional
 from app.core.constants import DEFAULT_TOOL
+from app.core.settings import settings
+from app.services import answer_cache, sentence_index, source_repository, text_store, transcript_timing
+from app.utils.async_utils import run_sync
+from app.utils.text_utils import chunk_text, text_hash
+
+
+class InvalidEdit(ValueError):
+    """A transcript edit is out of range or overlaps another edit."""
+
+
+class TranscriptConflict(ValueError):
+    """The transcript changed since the client read the version its edits are based on."""
+
+
+# Sync wrappers for non-async callers
 
 def get_transcript(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
+    return run_sync(aget_transcript(user_id, source_id, tool))
+
+
+def update_transcript(user_id: str, source_id: str, text: str, provider: str, tool: str = DEFAULT_TOOL):
+    return run_sync(aupdate_transcript(user_id, source_id, text, provider, tool))
+
+
+def edit_transcript(user_id: str, source_id: str, edits: List[dict], base_sha256: Optional[str] = None,
+                    provider: str = "manual", tool: str = DEFAULT_TOOL) -> dict:
+    return run_sync(aedit_transcript(user_id, source_id, edits, base_sha256, provider, tool))
+
+
+def delete_transcript(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    return run_sync(adelete_transcript(user_id, source_id, tool))
+
+
+def transcript_field(source_ref, text: str, provider: str) -> dict:
+    """
+    Firestore value for a transcript. Besides the text (or its blob pointer) it
+    keeps the hashes of the transcript's summary chunks, which are the ids of
+    the cached chunk summaries in `summaryChunks`.
+    """
+    return text_store.text_field(
+        source_ref, "transcript", text,
+        provider=provider, created_at=datetime.utcnow(), chunks=chunk_hashes(text),
     )
-    doc = ref.get()
+
+
+def chunk_hashes(text: str) -> List[str]:
+    return [text_hash(chunk) for chunk in chunk_text(text, settings.SUMMARY_CHUNK_TOKENS)]
+
+
+def apply_edits(text: str, edits: List[dict]) -> str:
+    """
+    Apply `{"start", "end", "text"}` replacements, with character offsets into
+    `text` (the version the client read). Edits may come in any order but must
+    not overlap.
+    """
+    ordered = sorted(edits, key=lambda e: (e["start"], e["end"]))
+    previous_end = 0
+    for edit in ordered:
+        if not 0 <= edit["start"] <= edit["end"] <= len(text):
+            raise InvalidEdit(f"Edit range {edit['start']}-{edit['end']} is outside the transcript (0-{len(text)})")
+        if edit["start"] < previous_end:
+            raise InvalidEdit(f"Edit at {edit['start']} overlaps the previous edit")
+        previous_end = edit["end"]
+
+    parts, cursor = [], 0
+    for edit in ordered:
+        parts.append(text[cursor:edit["start"]])
+        parts.append(edit.get("text", ""))
+        cursor = edit["end"]
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+async def aget_transcript(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    doc = await source_repository.aget(ref, ["transcript"])
     if not doc.exists:
         raise ValueError("Source not found")
 
-    data = doc.to_dict()
-    transcript = data.get("transcript")
+    transcript = await text_store.ahydrate(ref, doc.to_dict(), "transcript")
     if not transcript:
         raise ValueError("Transcript not found")
+    # Edits (PATCH) can be made conditional on this
+    transcript["sha256"] = text_hash(transcript["text"])
     return transcript
 
 
-def update_transcript(user_id: str, source_id: str, text: str, provider: str, tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
-    if not ref.get().exists:
+async def aupdate_transcript(user_id: str, source_id: str, text: str, provider: str, tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool)
+
+    async def replace(data):
+        return None, text
+
+    await _asave_transcript(ref, replace, provider)
+
+
+async def aedit_transcript(user_id: str, source_id: str, edits: List[dict], base_sha256: Optional[str] = None,
+                           provider: str = "manual", tool: str = DEFAULT_TOOL) -> dict:
+    """
+    Patch the transcript with a few replacements instead of re-sending it.
+    Reports how many summary chunks the edit touched: only those are
+    re-summarized on the next summary run.
+    """
+    ref = source_repository.source_ref(user_id, source_id, tool)
+
+    async def edit(data):
+        text = await text_store.aload_text(ref, data, "transcript")
+        if text is None:
+            raise ValueError("Transcript not found")
+        if base_sha256 and text_hash(text) != base_sha256:
+            raise TranscriptConflict("Transcript was modified since it was read; reload it and retry")
+        return text, apply_edits(text, edits)
+
+    old_field, old_text, new_text, new_field = await _asave_transcript(ref, edit, provider)
+    try:
+        await transcript_timing.aremap_timing(ref, old_text, new_text, edits)
+    except Exception as e:
+        print(f"[warn] Failed to update transcript timestamps: {e}")
+    old_chunks = set(old_field.get("chunks") or await asyncio.to_thread(chunk_hashes, old_text))
+    return {
+        "sha256": text_hash(new_text),
+        "length": len(new_text),
+        "chunks": len(new_field["chunks"]),
+        "changedChunks": sum(1 for h in new_field["chunks"] if h not in old_chunks),
+    }
+
+
+async def _asave_transcript(ref, make_text, provider: str):
+    """
+    Read-modify-write of the transcript: `await make_text(data)` returns
+    (old text or None, new text). The write only succeeds if the document is
+    unchanged since it was read (possibly from cache); on a conflict it is
+    retried once against a fresh read.
+    """
+    for attempt in range(2):
+        doc = await source_repository.aget(ref, ["transcript"], fresh=attempt > 0)
+        if not doc.exists:
+            raise ValueError("Source not found")
+        data = doc.to_dict() or {}
+        old_text, text = await make_text(data)
+        new_field = await asyncio.to_thread(transcript_field, ref, text, provider)
+        try:
+            await source_repository.aupdate(ref, {"transcript": new_field}, last_update_time=doc.update_time)
+            break
+        except source_repository.SourceChanged:
+            if attempt:
+                raise TranscriptConflict("Transcript is being modified concurrently; reload it and retry")
+
+    old_field = data.get("transcript") or {}
+    await asyncio.to_thread(text_store.delete_text, old_field, new_field)
+    try:
+        await sentence_index.arefresh_index(ref, text)
+    except Exception as e:
+        print(f"[warn] Failed to rebuild sentence index: {e}")
+    return old_field, old_text, text, new_field
+
+
+async def adelete_transcript(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    doc = await source_repository.aget(ref, ["transcript"])
+    if not doc.exists:
         raise ValueError("Source not found")
 
-    ref.update({
-        "transcript": {
-            "text": text,
-            "provider": provider,
-            "created_at": datetime.utcnow()
-        }
-    })
+    # Conditional on existence only: nothing to lose if it changed meanwhile, it's being deleted
+    await source_repository.aupdate(ref, {"transcript": firestore.DELETE_FIELD})
+    await asyncio.to_thread(text_store.delete_text, (doc.to_dict() or {}).get("transcript"))
+    await sentence_index.adelete_index(ref)
+    await answer_cache.adelete(ref)
+    await transcript_timing.adelete_timing(ref)
 
 
-def delete_transcript(user_id: str, source_id: str, tool: str = DEFAULT_TOOL):
-    ref = (
-        _db.collection("tools")
-        .document(tool)
-        .collection("users")
-        .document(user_id)
-        .collection("sources")
-        .document(source_id)
-    )
-    if not ref.get().exists:
+async def alocate_span(user_id: str, source_id: str, start: Optional[int] = None, end: Optional[int] = None,
+                       text: Optional[str] = None, tool: str = DEFAULT_TOOL) -> dict:
+    """
+    Audio time of a transcript span, given as character offsets (`start`,
+    `end`) or as a snippet of its text (e.g. a highlighted sentence).
+    """
+    ref = source_repository.source_ref(user_id, source_id, tool)
+    doc = await source_repository.aget(ref, ["transcript"])
+    if not doc.exists:
         raise ValueError("Source not found")
+    data = doc.to_dict() or {}
+    if not data.get("transcript"):
+        raise ValueError("Transcript not found")
+
+    timing = await transcript_timing.aload_timing(ref, text_store.text_sha256(data["transcript"]))
+    if timing is None:
+        raise ValueError("No timestamps for this transcript")
+
+    if text is not None:
+        transcript = await text_store.aload_text(ref, data, "transcript")
+        span = transcript_timing.find_span(transcript, text)
+        if span is None:
+            raise ValueError("Text not found in the transcript")
+        start, end = span
 
-    ref.update({"transcript": firestore.DELETE_FIELD})
+    located = transcript_timing.lookup(timing, start, end)
+    if located is None:
+        raise ValueError("No timestamps for this transcript")
+    return {"charStart": start, "charEnd": end, **located}
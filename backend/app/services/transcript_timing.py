@@ -0,0 +1,180 @@
+# app/services/transcript_timing.py
+
+"""
+Audio timestamps for transcripts, so a text span (e.g. a highlighted
+sentence) can be mapped back to a point in the recording.
+
+Whisper's verbose_json segments, and its words when they are returned, are
+stored next to the source document (`sources/{id}/index/timing`) as NumPy
+array blobs, like the sentence index. Each level is two int32 arrays of
+shape (n, 2): character offsets `[start, end)` into the transcript and
+times `[start, end]` in milliseconds. Units are kept in transcript order,
+so a span lookup is two binary searches. The document records the hash of
+the transcript it belongs to; patches shift the offsets along with the text.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from app.utils.text_utils import text_hash
+
+# Firestore caps a document at 1 MiB; word timings are dropped above this
+MAX_TIMING_BYTES = 900_000
+# How far past its expected position a unit's text is searched for
+_ALIGN_LOOKAHEAD = 200
+
+LEVELS = ("segments", "words")
+
+
+def _align(text: str, units: List[dict], key: str) -> tuple:
+    """
+    Character offsets of each unit's text in `text`, searched in order.
+    Units whose text can't be found (e.g. trimmed where chunks overlapped)
+    are skipped; the search window after them grows by their length, so
+    the units that follow are still found.
+    """
+    chars, times, cursor, skipped = [], [], 0, 0
+    for unit in units:
+        needle = (unit.get(key) or "").strip()
+        if not needle:
+            continue
+        start = text.find(needle, cursor, cursor + skipped + len(needle) + _ALIGN_LOOKAHEAD)
+        if start < 0:
+            skipped += len(needle) + 1
+            continue
+        end = start + len(needle)
+        chars.append((start, end))
+        times.append((round(float(unit.get("start", 0.0)) * 1000), round(float(unit.get("end", 0.0)) * 1000)))
+        cursor, skipped = end, 0
+    return (np.array(chars, dtype=np.int32).reshape(-1, 2),
+            np.array(times, dtype=np.int32).reshape(-1, 2))
+
+
+def build_timing(text: str, segments: List[dict], words: Optional[List[dict]] = None) -> dict:
+    """Timing index for `text` from Whisper segments ({start, end, text}) and words ({start, end, word})."""
+    timing = {"transcriptHash": text_hash(text)}
+    timing["segments"] = _align(text, segments or [], "text")
+    if words:
+        timing["words"] = _align(text, words, "word")
+    return timing
+
+
+def _level(timing: dict) -> Optional[tuple]:
+    # Words give the tighter range; segments cover transcripts timed without them
+    for name in reversed(LEVELS):
+        level = timing.get(name)
+        if level is not None and len(level[0]):
+            return level
+    return None
+
+
+def lookup(timing: dict, start: int, end: int) -> Optional[dict]:
+    """
+    Audio range, in seconds, of the transcript characters `[start, end)`: from
+    the first timed unit overlapping the span to the last one. A span between
+    units maps to the next unit (the last one at the end of the transcript).
+    """
+    level = _level(timing)
+    if level is None:
+        return None
+    chars, times = level
+    first = int(np.searchsorted(chars[:, 1], start, side="right"))
+    last = int(np.searchsorted(chars[:, 0], max(end, start + 1), side="left")) - 1
+    first = min(first, len(chars) - 1)
+    last = max(last, first)
+    return {"start": int(times[first, 0]) / 1000, "end": int(times[last, 1]) / 1000}
+
+
+def find_span(text: str, snippet: str) -> Optional[tuple]:
+    """Character range of `snippet` (e.g. a highlighted sentence) in `text` (case-insensitive as a fallback)."""
+    snippet = (snippet or "").strip()
+    if not snippet:
+        return None
+    start = text.find(snippet)
+    if start < 0:
+        start = text.lower().find(snippet.lower())
+    return (start, start + len(snippet)) if start >= 0 else None
+
+
+def remap(timing: dict, edits: List[dict], new_text: str) -> dict:
+    """
+    Shift the character offsets through transcript edits (`{"start", "end",
+    "text"}` against the old text, as in `transcript_service.apply_edits`).
+    Offsets inside a replaced range are clamped into the replacement, so an
+    edited word keeps its audio time.
+    """
+    remapped = {"transcriptHash": text_hash(new_text)}
+    for name in LEVELS:
+        if timing.get(name) is None:
+            continue
+        chars, times = timing[name]
+        chars = chars.astype(np.int64)
+        # Last edit first: the offsets still to be compared are all before it
+        for edit in sorted(edits, key=lambda e: (e["start"], e["end"]), reverse=True):
+            new_len = len(edit.get("text", ""))
+            inside = (chars > edit["start"]) & (chars < edit["end"])
+            chars[inside] = edit["start"] + np.minimum(chars[inside] - edit["start"], new_len)
+            chars[chars >= edit["end"]] += new_len - (edit["end"] - edit["start"])
+        remapped[name] = (chars.astype(np.int32), times)
+    return remapped
+
+
+# ---------------------------------------------------------------------- #
+# Storage
+# ---------------------------------------------------------------------- #
+
+def _timing_ref(source_ref):
+    return source_ref.collection("index").document("timing")
+
+
+def _encode_timing(timing: dict) -> dict:
+    doc = {"transcriptHash": timing["transcriptHash"], "created_at": datetime.utcnow()}
+    size = 0
+    for name in LEVELS:
+        if timing.get(name) is None:
+            continue
+        chars, times = timing[name]
+        blobs = (chars.astype(np.int32).tobytes(), times.astype(np.int32).tobytes())
+        if size + len(blobs[0]) + len(blobs[1]) >= MAX_TIMING_BYTES:
+            print(f"[warn] {len(chars)} {name} timings exceed the document size limit, not stored")
+            continue
+        size += len(blobs[0]) + len(blobs[1])
+        doc[name] = {"chars": blobs[0], "times": blobs[1]}
+    return doc
+
+
+def _decode_timing(doc: dict) -> dict:
+    timing = {"transcriptHash": doc.get("transcriptHash")}
+    for name in LEVELS:
+        if doc.get(name):
+            timing[name] = (np.frombuffer(doc[name]["chars"], dtype=np.int32).reshape(-1, 2),
+                            np.frombuffer(doc[name]["times"], dtype=np.int32).reshape(-1, 2))
+    return timing
+
+
+def save_timing(source_ref, text: str, segments: List[dict], words: Optional[List[dict]] = None) -> dict:
+    timing = build_timing(text, segments, words)
+    _timing_ref(source_ref).set(_encode_timing(timing))
+    return timing
+
+
+async def aload_timing(source_ref, transcript_hash: str) -> Optional[dict]:
+    """Timing for the transcript with `transcript_hash` (None if there is none or it is outdated)."""
+    snapshot = await _timing_ref(source_ref).get()
+    doc = snapshot.to_dict() if snapshot.exists else None
+    if not doc or doc.get("transcriptHash") != transcript_hash:
+        return None
+    return _decode_timing(doc)
+
+
+async def aremap_timing(source_ref, old_text: str, new_text: str, edits: List[dict]):
+    """Carry the timing of `old_text` over to its patched version `new_text`."""
+    timing = await aload_timing(source_ref, text_hash(old_text))
+    if timing is not None:
+        await _timing_ref(source_ref).set(_encode_timing(remap(timing, edits, new_text)))
+
+
+async def adelete_timing(source_ref):
+    await _timing_ref(source_ref).delete()
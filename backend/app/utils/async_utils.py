@@ -0,0 +1,30 @@
+# backend/app/utils/async_utils.py
+
+import asyncio
+import threading
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+
+def run_sync(awaitable: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion from sync code (job workers, sync service
+    wrappers). Each thread keeps one event loop, so loop-bound clients (async
+    Firestore, httpx) are reused across calls instead of rebuilt every time.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        if hasattr(awaitable, "close"):
+            awaitable.close()
+        raise RuntimeError("run_sync() called from a running event loop; await the coroutine instead")
+
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(awaitable)
@@ -0,0 +1,291 @@
+# backend/app/utils/audio_utils.py
+
+import bisect
+import json
+import os
+import re
+import shutil
+import subprocess
+from typing import List, Optional, Tuple
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+# Containers the Whisper APIs accept: extension -> MIME type
+AUDIO_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+    ".webm": "audio/webm",
+    ".m4a": "audio/mp4",
+}
+# ffprobe format_name -> extension
+_PROBE_FORMATS = {
+    "wav": ".wav",
+    "mp3": ".mp3",
+    "ogg": ".ogg",
+    "flac": ".flac",
+    "matroska,webm": ".webm",
+    "mov,mp4,m4a,3gp,3g2,mj2": ".m4a",
+}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def probe_duration(path: str) -> float:
+    """Duration of an audio file in seconds (via ffprobe)."""
+    out = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            path,
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip())
+
+
+def sniff_audio_type(header: bytes, filename: str = "") -> Tuple[str, str]:
+    """
+    (extension, MIME type) of an audio file from its first bytes, falling back
+    to the file name's extension and then to WebM (what browsers record).
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        ext = ".wav"
+    elif header[:4] == b"fLaC":
+        ext = ".flac"
+    elif header[:4] == b"OggS":
+        ext = ".ogg"
+    elif header[:4] == b"\x1a\x45\xdf\xa3":
+        ext = ".webm"
+    elif header[4:8] == b"ftyp":
+        ext = ".m4a"
+    elif header[:3] == b"ID3" or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        ext = ".mp3"
+    else:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in AUDIO_TYPES:
+            ext = ".webm"
+    return ext, AUDIO_TYPES[ext]
+
+
+def probe_audio(path: str) -> dict:
+    """Container, codec, channels, sample rate and duration of the first audio stream (via ffprobe)."""
+    out = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "a:0",
+            "-show_entries", "format=format_name,duration:stream=codec_name,channels,sample_rate",
+            "-of", "json",
+            path,
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    info = json.loads(out.stdout)
+    fmt = info.get("format", {})
+    streams = info.get("streams") or [{}]
+    return {
+        "format": fmt.get("format_name", ""),
+        "extension": _PROBE_FORMATS.get(fmt.get("format_name", "")),
+        "codec": streams[0].get("codec_name", ""),
+        "channels": int(streams[0].get("channels") or 0),
+        "sample_rate": int(streams[0].get("sample_rate") or 0),
+        "duration": float(fmt.get("duration") or 0.0),
+    }
+
+
+def detect_silences(path: str, noise_db: int = -35, min_silence: float = 0.5) -> List[Tuple[float, float]]:
+    """Return (start, end) pairs of silent stretches found by ffmpeg's silencedetect filter."""
+    out = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+            "-f", "null", "-",
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    silences, start = [], None
+    for line in out.stderr.splitlines():
+        m = _SILENCE_START_RE.search(line)
+        if m:
+            start = max(float(m.group(1)), 0.0)
+            continue
+        m = _SILENCE_END_RE.search(line)
+        if m and start is not None:
+            silences.append((start, float(m.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]], target: float,
+                search_window: float = 30.0) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration] into consecutive (start, end) windows of roughly `target`
+    seconds, cutting in the middle of a silence near each boundary when one exists.
+    """
+    midpoints = [(s + e) / 2 for s, e in silences]
+    chunks, cursor = [], 0.0
+    while duration - cursor > target:
+        ideal = cursor + target
+        candidates = [m for m in midpoints if ideal - search_window <= m <= ideal and m > cursor]
+        cut = max(candidates) if candidates else ideal
+        chunks.append((cursor, cut))
+        cursor = cut
+    chunks.append((cursor, duration))
+    return chunks
+
+
+def extract_segment(path: str, start: float, end: float, dest: str):
+    """Cut [start, end] out of `path` into `dest` as 16 kHz mono FLAC."""
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-ss", f"{max(start, 0.0):.3f}", "-t", f"{end - max(start, 0.0):.3f}",
+            "-i", path,
+            "-vn", "-ac", "1", "-ar", "16000", "-c:a", "flac",
+            "-f", "flac", "-y", dest,
+        ],
+        capture_output=True, check=True,
+    )
+
+
+# Raw PCM produced by `pcm_decoder_command`: 16 kHz mono signed 16-bit little-endian
+PCM_SAMPLE_RATE = 16000
+PCM_BYTES_PER_SECOND = PCM_SAMPLE_RATE * 2
+
+
+def pcm_decoder_command() -> List[str]:
+    """ffmpeg reading a (growing) recording on stdin and writing 16 kHz mono s16le PCM to stdout."""
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-probesize", "64000", "-i", "pipe:0",
+        "-vn", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-f", "s16le", "pipe:1",
+    ]
+
+
+def encode_pcm(pcm: bytes) -> bytes:
+    """Encode raw PCM (see `pcm_decoder_command`) as FLAC."""
+    out = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "s16le", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-i", "pipe:0",
+            "-c:a", "flac", "-f", "flac", "pipe:1",
+        ],
+        input=pcm, capture_output=True, check=True,
+    )
+    return out.stdout
+
+
+# ---------------------------------------------------------------------- #
+# Preprocessing for transcription: 16 kHz mono in a compact codec, with
+# long silences optionally cut out
+# ---------------------------------------------------------------------- #
+
+# codec -> (extension, ffmpeg encoder arguments); Opus bitrate is filled in by the caller
+_CODECS = {
+    "flac": (".flac", ["-c:a", "flac"]),
+    "opus": (".ogg", ["-c:a", "libopus", "-application", "voip"]),
+}
+
+
+def speech_intervals(duration: float, silences: List[Tuple[float, float]], min_silence: float,
+                     keep: float) -> List[Tuple[float, float]]:
+    """
+    (start, end) stretches of `[0, duration]` to keep when silences longer than
+    `min_silence` are cut, leaving `keep` seconds of each silence on both sides
+    so words at the edges are not clipped.
+    """
+    intervals, cursor = [], 0.0
+    for start, end in silences:
+        if end - start < max(min_silence, 2 * keep):
+            continue
+        cut_start, cut_end = start + keep, min(end - keep, duration)
+        if cut_start > cursor:
+            intervals.append((cursor, cut_start))
+        cursor = max(cursor, cut_end)
+    if duration - cursor > 0.01:
+        intervals.append((cursor, duration))
+    return intervals
+
+
+def offset_map(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """(time in the trimmed audio, time in the source) at the start of every kept interval."""
+    offsets, t = [], 0.0
+    for start, end in intervals:
+        offsets.append((t, start))
+        t += end - start
+    return offsets
+
+
+def to_source_time(offsets: Optional[List[Tuple[float, float]]], t: float) -> float:
+    """Map a timestamp in trimmed audio back to the source recording."""
+    if not offsets:
+        return t
+    i = max(bisect.bisect_right(offsets, (t, float("inf"))) - 1, 0)
+    trimmed, source = offsets[i]
+    return source + (t - trimmed)
+
+
+def transcode_for_transcription(src: str, dest: str, codec: str = "flac", opus_bitrate: str = "32k",
+                                intervals: Optional[List[Tuple[float, float]]] = None):
+    """Downmix to mono, resample to 16 kHz (what Whisper uses) and encode as FLAC or Opus, keeping only `intervals`."""
+    _, encoder = _CODECS[codec]
+    if codec == "opus":
+        encoder = encoder + ["-b:a", opus_bitrate]
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", src, "-vn"]
+    if intervals:
+        keep = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in intervals)
+        cmd += ["-af", f"aselect='{keep}',asetpts=N/SR/TB"]
+    cmd += ["-ac", "1", "-ar", "16000", *encoder, "-y", dest]
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def prepare_audio(src: str, workdir: str, codec: str = "flac", opus_bitrate: str = "32k",
+                  trim_silence: bool = False, min_silence: float = 2.0, keep: float = 0.3,
+                  noise_db: int = -35) -> dict:
+    """
+    Probe `src` and re-encode it for upload into `workdir`. Returns the file to
+    send ("path", "extension", "mime_type"), its "duration" and "size", the
+    source's "source_duration", and "offsets" (see `offset_map`) when silences
+    were cut. The source is sent as-is (correctly labelled) when re-encoding
+    would not make it smaller and nothing was trimmed.
+    """
+    info = probe_audio(src)
+    source_duration = info["duration"] or probe_duration(src)
+
+    intervals = None
+    if trim_silence:
+        silences = detect_silences(src, noise_db=noise_db, min_silence=min_silence)
+        intervals = speech_intervals(source_duration, silences, min_silence, keep)
+        if sum(end - start for start, end in intervals) > source_duration - min_silence:
+            intervals = None  # nothing worth cutting
+
+    extension, _ = _CODECS[codec]
+    dest = os.path.join(workdir, f"audio{extension}")
+    transcode_for_transcription(src, dest, codec=codec, opus_bitrate=opus_bitrate, intervals=intervals)
+
+    size = os.path.getsize(dest)
+    if not intervals and size >= os.path.getsize(src) and info["extension"]:
+        return {
+            "path": src,
+            "extension": info["extension"],
+            "mime_type": AUDIO_TYPES[info["extension"]],
+            "duration": source_duration,
+            "size": os.path.getsize(src),
+            "source_duration": source_duration,
+            "offsets": None,
+        }
+
+    return {
+        "path": dest,
+        "extension": extension,
+        "mime_type": AUDIO_TYPES[extension],
+        "duration": sum(end - start for start, end in intervals) if intervals else source_duration,
+        "size": size,
+        "source_duration": source_duration,
+        "offsets": offset_map(intervals) if intervals else None,
+    }
@@ -1,19 +1,111 @@
 # backend/app/utils/gcs_utils.py
 
+import asyncio
+import hashlib
 import os
+import shutil
+import tempfile
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from functools import lru_cache
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
+from app.core import metrics
+from app.core.settings import settings
+from app.core.tracing import current_route, span
 
 GCS_AUDIO_BUCKET = os.getenv("GCS_AUDIO_BUCKET")
 
+
+@lru_cache(maxsize=1)
+def get_storage_client() -> storage.Client:
+    return storage.Client()
+
+
+def get_bucket() -> storage.Bucket:
+    return get_storage_client().bucket(GCS_AUDIO_BUCKET)
+
+
+def record_transfer(direction: str, size: int):
+    """Count bytes moved to ("upload") or from ("download") GCS."""
+    metrics.GCS_BYTES.inc(size, direction=direction, route=current_route())
+
+
+@contextmanager
+def open_audio_from_gcs(gcs_path: str, user_id: str, named: bool = False):
+    """
+    Stream an audio object from GCS into a temp file using chunked range reads
+    and yield it rewound to the start. Memory use is bounded by
+    `GCS_READ_CHUNK_BYTES` / `AUDIO_SPOOL_MAX_BYTES`, not by the object size.
+
+    With `named=True` the data always goes to a named file on disk so it can
+    be handed to ffmpeg by path.
+    """
+    if not gcs_path.startswith(f"{user_id}/"):
+        raise PermissionError("Access denied to file")
+
+    blob = get_bucket().blob(gcs_path)
+    suffix = os.path.splitext(gcs_path)[1]
+    if named:
+        tmp = tempfile.NamedTemporaryFile(suffix=suffix)
+    else:
+        tmp = tempfile.SpooledTemporaryFile(max_size=settings.AUDIO_SPOOL_MAX_BYTES, suffix=suffix)
+
+    try:
+        try:
+            with span("gcs.download", path=gcs_path), \
+                    blob.open("rb", chunk_size=settings.GCS_READ_CHUNK_BYTES) as reader:
+                shutil.copyfileobj(reader, tmp, settings.GCS_READ_CHUNK_BYTES)
+        except NotFound:
+            raise FileNotFoundError("Audio file not found")
+        record_transfer("download", tmp.tell())
+        tmp.flush()
+        tmp.seek(0)
+        yield tmp
+    finally:
+        tmp.close()
+
+
+@asynccontextmanager
+async def aopen_audio_from_gcs(gcs_path: str, user_id: str, named: bool = False):
+    """`open_audio_from_gcs` for async callers: the download runs on a worker thread."""
+    with ExitStack() as stack:
+        yield await asyncio.to_thread(stack.enter_context, open_audio_from_gcs(gcs_path, user_id, named))
+
+
 def fetch_audio_from_gcs(gcs_path: str, user_id: str) -> bytes:
+    """Download a whole audio object into memory. Prefer `open_audio_from_gcs` for large files."""
     if not gcs_path.startswith(f"{user_id}/"):
         raise PermissionError("Access denied to file")
 
-    client = storage.Client()
-    bucket = client.bucket(GCS_AUDIO_BUCKET)
-    blob = bucket.blob(gcs_path)
+    try:
+        with span("gcs.download", path=gcs_path):
+            data = get_bucket().blob(gcs_path).download_as_bytes()
+    except NotFound:
+        raise FileNotFoundError("Audio file not found")
+    record_transfer("download", len(data))
+    return data
+
+
+def get_audio_fingerprint(gcs_path: str, user_id: str) -> str:
+    """
+    Content fingerprint of an audio object. Uses the md5/crc32c checksum GCS
+    already stores in the object metadata (one metadata GET); falls back to a
+    streamed sha256 when neither is present.
+    """
+    if not gcs_path.startswith(f"{user_id}/"):
+        raise PermissionError("Access denied to file")
 
-    if not blob.exists():
+    with span("gcs.metadata", path=gcs_path):
+        blob = get_bucket().get_blob(gcs_path)
+    if blob is None:
         raise FileNotFoundError("Audio file not found")
+    if blob.md5_hash:
+        return f"md5:{blob.md5_hash}"
+    if blob.crc32c:
+        return f"crc32c:{blob.crc32c}:{blob.size}"
 
-    return blob.download_as_bytes()
+    digest = hashlib.sha256()
+    with open_audio_from_gcs(gcs_path, user_id) as audio_file:
+        for chunk in iter(lambda: audio_file.read(settings.GCS_READ_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
@@ -0,0 +1,77 @@
+# backend/app/utils/text_utils.py
+
+import hashlib
+import math
+import re
+from typing import List
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences with nltk's punkt model, or a regex if it is not downloaded."""
+    try:
+        from nltk.tokenize import sent_tokenize
+        return [s.strip() for s in sent_tokenize(text) if s.strip()]
+    except LookupError:
+        return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Llama-family tokenizers (~4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into chunks of at most ~`max_tokens` tokens at content-defined
+    sentence boundaries: a chunk ends after a sentence whose hash falls under a
+    threshold proportional to the sentence's length (about `max_tokens / 2`
+    tokens per chunk on average, never less than `max_tokens / 4`). Boundaries
+    depend only on nearby sentences, so an edit changes the chunk it falls in
+    while the chunks after it keep their exact text (and hash).
+    """
+    min_tokens = max_tokens / 4
+    boundary_every = max_tokens / 4  # tokens between content-defined boundaries, on average
+    chunks, current, current_tokens = [], [], 0
+    for sentence in _bounded_sentences(text, max_tokens):
+        tokens = estimate_tokens(sentence) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+        if current_tokens >= min_tokens and _boundary_score(sentence) < tokens / boundary_every:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _boundary_score(sentence: str) -> float:
+    """Uniform in [0, 1), a pure function of the sentence text."""
+    return int.from_bytes(hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).digest(), "big") / 2 ** 64
+
+
+def _bounded_sentences(text: str, max_tokens: int):
+    """Sentences, with any single sentence longer than `max_tokens` split on word boundaries."""
+    max_chars = max_tokens * 4
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            yield sentence
+            continue
+        piece = []
+        length = 0
+        for word in sentence.split():
+            if piece and length + len(word) + 1 > max_chars:
+                yield " ".join(piece)
+                piece, length = [], 0
+            piece.append(word)
+            length += len(word) + 1
+        if piece:
+            yield " ".join(piece)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,77 @@
+# bench/compare.py
+
+"""
+Side-by-side diff of two `bench.run` reports:
+
+    python -m bench.compare before.json after.json
+
+Latency and throughput per endpoint, outbound work per request per route,
+and peak memory, with the relative change. Reports from runs with different
+arguments are compared anyway, with a warning.
+"""
+
+import argparse
+import json
+
+
+def _change(old, new) -> str:
+    if not old:
+        return "" if not new else "new"
+    return f"{100 * (new - old) / old:+.1f}%"
+
+
+def _row(label: str, old, new, width: int = 44):
+    print(f"{label:<{width}} {old:>10} {new:>10} {_change(old, new):>9}")
+
+
+def compare(before: dict, after: dict):
+    old_args = dict(before["meta"]["args"], out=None)
+    new_args = dict(after["meta"]["args"], out=None)
+    if old_args != new_args:
+        changed = sorted(k for k in set(old_args) | set(new_args) if old_args.get(k) != new_args.get(k))
+        print(f"[warn] Runs used different arguments: {', '.join(changed)}")
+    print(f"before: {before['meta']['commit'][:10]}{' (dirty)' if before['meta']['dirty'] else ''}   "
+          f"after: {after['meta']['commit'][:10]}{' (dirty)' if after['meta']['dirty'] else ''}")
+
+    print(f"\n{'endpoint':<44} {'before':>10} {'after':>10} {'change':>9}")
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(name), after["endpoints"].get(name)
+        if not old or not new:
+            print(f"{name:<44} {'-' if not old else 'present':>10} {'-' if not new else 'present':>10}")
+            continue
+        _row(f"{name} rps", old["throughput_rps"], new["throughput_rps"])
+        for q in ("p50", "p95", "p99"):
+            _row(f"{name} {q} ms", old["latency_ms"][q], new["latency_ms"][q])
+        if old["errors"] or new["errors"]:
+            _row(f"{name} errors", old["errors"], new["errors"])
+    _row("total rps", before["totals"]["throughput_rps"], after["totals"]["throughput_rps"])
+
+    print(f"\n{'outbound per request':<44} {'before':>10} {'after':>10} {'change':>9}")
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        old = before["routes"].get(route, {}).get("per_request")
+        new = after["routes"].get(route, {}).get("per_request")
+        if not old or not new:
+            continue
+        for key in sorted(set(old) | set(new)):
+            if old.get(key) or new.get(key):
+                _row(f"{route} {key}", old.get(key, 0), new.get(key, 0), width=44)
+
+    print()
+    _row("app peak RSS MB", before["resources"]["app_peak_rss_mb"], after["resources"]["app_peak_rss_mb"])
+    _row("app CPU s", before["resources"]["app_cpu_seconds"], after["resources"]["app_cpu_seconds"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    compare(before, after)
+
+
+if __name__ == "__main__":
+    main()
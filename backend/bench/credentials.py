@@ -0,0 +1,53 @@
+# bench/credentials.py
+
+"""
+Throwaway Google credentials for running the app against local fakes and
+emulators (the load test in `bench.run`, the unit tests). Nothing signed
+with them is ever sent to Google.
+"""
+
+import base64
+import json
+import time
+
+PROJECT = "bench-project"
+BUCKET = "bench-audio"
+
+
+def service_account() -> dict:
+    """Throwaway service account; the key is real because the Firebase/Google clients parse it at startup."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    return {
+        "type": "service_account",
+        "project_id": PROJECT,
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": f"bench@{PROJECT}.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+def id_token(uid: str) -> str:
+    """Unsigned Firebase ID token; accepted because the app runs with FIREBASE_AUTH_EMULATOR_HOST."""
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b"=").decode()
+
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT}",
+        "aud": PROJECT,
+        "sub": uid,
+        "user_id": uid,
+        "auth_time": now,
+        "iat": now,
+        "exp": now + 24 * 3600,
+        "firebase": {"sign_in_provider": "custom", "identities": {}},
+    }
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode(claims)}."
@@ -0,0 +1,441 @@
+# bench/fake_firestore.py
+
+"""
+In-memory stand-in for the Firestore gRPC API, reached by the real sync and
+async clients through FIRESTORE_EMULATOR_HOST. Supports what the app uses:
+batched document gets with field masks, commits (set / merge / update with
+preconditions / delete / server-value transforms), transactions, batch
+writes and subcollection listing (for recursive deletes) and structured
+queries (field filters, ordering, cursors, limit, offset, projection) over
+one collection level or all descendants.
+
+Consistency is trivial (one lock, no contention handling); this is a
+latency-free backend for load tests, not an emulator of Firestore's
+semantics in general.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent import futures
+
+import grpc
+from google.cloud.firestore_v1.types import document, firestore, query
+from google.protobuf import empty_pb2, timestamp_pb2
+
+SERVICE = "google.firestore.v1.Firestore"
+
+BatchGetDocumentsRequest = firestore.BatchGetDocumentsRequest.pb()
+BatchGetDocumentsResponse = firestore.BatchGetDocumentsResponse.pb()
+BeginTransactionRequest = firestore.BeginTransactionRequest.pb()
+BeginTransactionResponse = firestore.BeginTransactionResponse.pb()
+BatchWriteRequest = firestore.BatchWriteRequest.pb()
+BatchWriteResponse = firestore.BatchWriteResponse.pb()
+CommitRequest = firestore.CommitRequest.pb()
+CommitResponse = firestore.CommitResponse.pb()
+ListCollectionIdsRequest = firestore.ListCollectionIdsRequest.pb()
+ListCollectionIdsResponse = firestore.ListCollectionIdsResponse.pb()
+RollbackRequest = firestore.RollbackRequest.pb()
+RunQueryRequest = firestore.RunQueryRequest.pb()
+RunQueryResponse = firestore.RunQueryResponse.pb()
+Document = document.Document.pb()
+Value = document.Value.pb()
+StructuredQuery = query.StructuredQuery.pb()
+Direction = query.StructuredQuery.Direction
+FieldOp = query.StructuredQuery.FieldFilter.Operator
+UnaryOp = query.StructuredQuery.UnaryFilter.Operator
+CompositeOp = query.StructuredQuery.CompositeFilter.Operator
+
+
+def _now() -> timestamp_pb2.Timestamp:
+    ts = timestamp_pb2.Timestamp()
+    ts.FromNanoseconds(time.time_ns())
+    return ts
+
+
+# ---------------------------------------------------------------------- #
+# Field paths and values
+# ---------------------------------------------------------------------- #
+
+def _split_path(path: str) -> list:
+    """Split a field path on dots, honoring `backquoted` segments."""
+    parts, current, quoted = [], [], False
+    i = 0
+    while i < len(path):
+        ch = path[i]
+        if ch == "`":
+            quoted = not quoted
+        elif ch == "\\" and quoted and i + 1 < len(path):
+            i += 1
+            current.append(path[i])
+        elif ch == "." and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    parts.append("".join(current))
+    return parts
+
+
+def _get_field(doc, path: str):
+    if path == "__name__":
+        return Value(reference_value=doc.name)
+    fields = doc.fields
+    parts = _split_path(path)
+    for part in parts[:-1]:
+        if part not in fields or fields[part].WhichOneof("value_type") != "map_value":
+            return None
+        fields = fields[part].map_value.fields
+    return fields[parts[-1]] if parts[-1] in fields else None
+
+
+def _set_field(fields, path: str, value):
+    parts = _split_path(path)
+    for part in parts[:-1]:
+        if fields[part].WhichOneof("value_type") != "map_value":
+            fields[part].map_value.SetInParent()
+            fields[part].map_value.fields.clear()
+        fields = fields[part].map_value.fields
+    fields[parts[-1]].CopyFrom(value)
+
+
+def _delete_field(fields, path: str):
+    parts = _split_path(path)
+    for part in parts[:-1]:
+        if part not in fields or fields[part].WhichOneof("value_type") != "map_value":
+            return
+        fields = fields[part].map_value.fields
+    if parts[-1] in fields:
+        del fields[parts[-1]]
+
+
+def _sort_key(value):
+    """Firestore's cross-type value ordering."""
+    kind = value.WhichOneof("value_type")
+    if kind == "null_value":
+        return (0,)
+    if kind == "boolean_value":
+        return (1, value.boolean_value)
+    if kind in ("integer_value", "double_value"):
+        return (2, getattr(value, kind))
+    if kind == "timestamp_value":
+        return (3, value.timestamp_value.seconds, value.timestamp_value.nanos)
+    if kind == "string_value":
+        return (4, value.string_value)
+    if kind == "bytes_value":
+        return (5, value.bytes_value)
+    if kind == "reference_value":
+        return (6, tuple(value.reference_value.split("/")))
+    if kind == "geo_point_value":
+        return (7, value.geo_point_value.latitude, value.geo_point_value.longitude)
+    if kind == "array_value":
+        return (8, tuple(_sort_key(v) for v in value.array_value.values))
+    if kind == "map_value":
+        return (9, tuple(sorted((k, _sort_key(v)) for k, v in value.map_value.fields.items())))
+    return (10,)
+
+
+def _project(doc, field_paths) -> "Document":
+    projected = Document(name=doc.name, create_time=doc.create_time, update_time=doc.update_time)
+    for path in field_paths:
+        if path == "__name__":
+            continue
+        value = _get_field(doc, path)
+        if value is not None:
+            _set_field(projected.fields, path, value)
+    return projected
+
+
+# ---------------------------------------------------------------------- #
+# Queries
+# ---------------------------------------------------------------------- #
+
+def _matches(doc, where) -> bool:
+    kind = where.WhichOneof("filter_type")
+    if kind is None:
+        return True
+    if kind == "composite_filter":
+        results = (_matches(doc, f) for f in where.composite_filter.filters)
+        return any(results) if where.composite_filter.op == CompositeOp.OR else all(results)
+    if kind == "unary_filter":
+        value = _get_field(doc, where.unary_filter.field.field_path)
+        op = where.unary_filter.op
+        is_null = value is not None and value.WhichOneof("value_type") == "null_value"
+        is_nan = value is not None and value.WhichOneof("value_type") == "double_value" and value.double_value != value.double_value
+        return {
+            UnaryOp.IS_NULL: is_null,
+            UnaryOp.IS_NOT_NULL: value is not None and not is_null,
+            UnaryOp.IS_NAN: is_nan,
+            UnaryOp.IS_NOT_NAN: value is not None and not is_nan,
+        }.get(op, False)
+
+    f = where.field_filter
+    value = _get_field(doc, f.field.field_path)
+    op = FieldOp(f.op).name
+    if value is None:
+        return False
+    key, other = _sort_key(value), _sort_key(f.value)
+    if op == "EQUAL":
+        return key == other
+    if op == "NOT_EQUAL":
+        return key != other
+    if op in ("LESS_THAN", "LESS_THAN_OR_EQUAL", "GREATER_THAN", "GREATER_THAN_OR_EQUAL"):
+        if key[0] != other[0]:  # range filters never cross types
+            return False
+        return {"LESS_THAN": key < other, "LESS_THAN_OR_EQUAL": key <= other,
+                "GREATER_THAN": key > other, "GREATER_THAN_OR_EQUAL": key >= other}[op]
+    if op == "IN":
+        return key in {_sort_key(v) for v in f.value.array_value.values}
+    if op == "NOT_IN":
+        return key not in {_sort_key(v) for v in f.value.array_value.values}
+    if op == "ARRAY_CONTAINS":
+        return value.WhichOneof("value_type") == "array_value" and other in {
+            _sort_key(v) for v in value.array_value.values}
+    if op == "ARRAY_CONTAINS_ANY":
+        wanted = {_sort_key(v) for v in f.value.array_value.values}
+        return value.WhichOneof("value_type") == "array_value" and any(
+            _sort_key(v) in wanted for v in value.array_value.values)
+    return False
+
+
+def _compare(doc_keys: list, cursor_keys: list, descending: list) -> int:
+    for a, b, desc in zip(doc_keys, cursor_keys, descending):
+        if a != b:
+            result = -1 if a < b else 1
+            return -result if desc else result
+    return 0
+
+
+def _run_structured_query(docs: dict, parent: str, q) -> list:
+    collection = q.from_[0]
+    # No collection id: every collection (recursive deletes bound it with __name__ cursors)
+    prefix = f"{parent}/{collection.collection_id}/" if collection.collection_id else f"{parent}/"
+    candidates = [
+        doc for name, doc in docs.items()
+        if name.startswith(prefix) and (collection.all_descendants or "/" not in name[len(prefix):])
+    ]
+    candidates = [doc for doc in candidates if _matches(doc, q.where)]
+
+    orders = [(o.field.field_path, o.direction == Direction.DESCENDING) for o in q.order_by]
+    if not any(path == "__name__" for path, _ in orders):
+        orders.append(("__name__", orders[-1][1] if orders else False))
+    # Documents missing an order-by field are not returned
+    candidates = [doc for doc in candidates if all(_get_field(doc, path) is not None for path, _ in orders)]
+
+    descending = [desc for _, desc in orders]
+
+    def keys(doc):
+        return [_sort_key(_get_field(doc, path)) for path, _ in orders]
+
+    # Python sorts ascending: sort by each field from last to first, flipping per direction
+    for index in reversed(range(len(orders))):
+        candidates.sort(key=lambda doc: keys(doc)[index], reverse=descending[index])
+
+    if q.HasField("start_at"):
+        cursor = [_sort_key(v) for v in q.start_at.values]
+        before = q.start_at.before
+        candidates = [
+            doc for doc in candidates
+            if (c := _compare(keys(doc)[:len(cursor)], cursor, descending)) > 0 or (c == 0 and before)
+        ]
+    if q.HasField("end_at"):
+        cursor = [_sort_key(v) for v in q.end_at.values]
+        before = q.end_at.before
+        candidates = [
+            doc for doc in candidates
+            if (c := _compare(keys(doc)[:len(cursor)], cursor, descending)) < 0 or (c == 0 and not before)
+        ]
+
+    candidates = candidates[q.offset:]
+    if q.HasField("limit"):
+        candidates = candidates[:q.limit.value]
+    if q.HasField("select"):
+        paths = [f.field_path for f in q.select.fields]
+        candidates = [_project(doc, paths) for doc in candidates]
+    return candidates
+
+
+# ---------------------------------------------------------------------- #
+# Service
+# ---------------------------------------------------------------------- #
+
+class FakeFirestore:
+    def __init__(self):
+        self.docs = {}  # full document name -> Document
+        self.calls = Counter()  # rpc -> count
+        self.documents = Counter()  # "read" / "write" -> count
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _transaction_id(self) -> bytes:
+        return uuid.uuid4().bytes
+
+    def batch_get_documents(self, request, context):
+        self.calls["BatchGetDocuments"] += 1
+        read_time = _now()
+        transaction = self._transaction_id() if request.HasField("new_transaction") else None
+        with self._lock:
+            found = [(name, self.docs.get(name)) for name in request.documents]
+        for i, (name, doc) in enumerate(found):
+            self.documents["read"] += 1
+            response = BatchGetDocumentsResponse(read_time=read_time)
+            if doc is None:
+                response.missing = name
+            else:
+                response.found.CopyFrom(_project(doc, request.mask.field_paths) if request.HasField("mask") else doc)
+            if transaction and i == 0:
+                response.transaction = transaction
+            yield response
+
+    def run_query(self, request, context):
+        self.calls["RunQuery"] += 1
+        read_time = _now()
+        with self._lock:
+            results = _run_structured_query(self.docs, request.parent, request.structured_query)
+        if request.HasField("new_transaction"):
+            yield RunQueryResponse(transaction=self._transaction_id(), read_time=read_time)
+        if not results:
+            yield RunQueryResponse(read_time=read_time)
+        for doc in results:
+            self.documents["read"] += 1
+            yield RunQueryResponse(document=doc, read_time=read_time)
+
+    def begin_transaction(self, request, context):
+        self.calls["BeginTransaction"] += 1
+        return BeginTransactionResponse(transaction=self._transaction_id())
+
+    def rollback(self, request, context):
+        self.calls["Rollback"] += 1
+        return empty_pb2.Empty()
+
+    def list_collection_ids(self, request, context):
+        self.calls["ListCollectionIds"] += 1
+        prefix = request.parent + "/"
+        with self._lock:
+            ids = sorted({name[len(prefix):].split("/", 1)[0] for name in self.docs if name.startswith(prefix)})
+        return ListCollectionIdsResponse(collection_ids=ids)
+
+    def batch_write(self, request, context):
+        # Writes are applied together here; Firestore applies them independently (no atomicity)
+        self.calls["BatchWrite"] += 1
+        committed = self._commit(request.writes, context)
+        response = BatchWriteResponse(write_results=committed.write_results)
+        for _ in request.writes:
+            response.status.add()
+        return response
+
+    def commit(self, request, context):
+        self.calls["Commit"] += 1
+        return self._commit(request.writes, context)
+
+    def _commit(self, writes, context):
+        commit_time = _now()
+        response = CommitResponse(commit_time=commit_time)
+        with self._lock:
+            staged = {}
+            for w in writes:
+                name = w.update.name if w.HasField("update") else w.delete
+                current = staged[name] if name in staged else self.docs.get(name)
+                if w.HasField("current_document"):
+                    precondition = w.current_document
+                    if precondition.HasField("exists"):
+                        if precondition.exists and current is None:
+                            context.abort(grpc.StatusCode.NOT_FOUND, f"No document to update: {name}")
+                        if not precondition.exists and current is not None:
+                            context.abort(grpc.StatusCode.ALREADY_EXISTS, f"Document already exists: {name}")
+                    elif precondition.HasField("update_time") and (
+                            current is None or current.update_time != precondition.update_time):
+                        context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Stale update_time: {name}")
+
+                result = response.write_results.add(update_time=commit_time)
+                if w.HasField("delete"):
+                    staged[name] = None
+                    continue
+
+                doc = Document(name=name, update_time=commit_time)
+                doc.create_time.CopyFrom(current.create_time if current is not None else commit_time)
+                if w.HasField("update_mask"):
+                    if current is not None:
+                        doc.fields.MergeFrom(current.fields)
+                    for path in w.update_mask.field_paths:
+                        value = _get_field(w.update, path)
+                        if value is None:
+                            _delete_field(doc.fields, path)
+                        else:
+                            _set_field(doc.fields, path, value)
+                else:
+                    doc.fields.MergeFrom(w.update.fields)
+                for transform in w.update_transforms:
+                    result.transform_results.add().CopyFrom(self._transform(doc, transform, commit_time))
+                staged[name] = doc
+
+            for name, doc in staged.items():
+                self.documents["write"] += 1
+                if doc is None:
+                    self.docs.pop(name, None)
+                else:
+                    self.docs[name] = doc
+        return response
+
+    @staticmethod
+    def _transform(doc, transform, commit_time):
+        path = transform.field_path
+        kind = transform.WhichOneof("transform_type")
+        if kind == "set_to_server_value":
+            value = Value(timestamp_value=commit_time)
+        elif kind == "increment":
+            current = _get_field(doc, path)
+            inc = transform.increment
+            if current is not None and current.WhichOneof("value_type") == inc.WhichOneof("value_type"):
+                field = inc.WhichOneof("value_type")
+                value = Value(**{field: getattr(current, field) + getattr(inc, field)})
+            else:
+                value = inc
+        elif kind == "append_missing_elements":
+            current = _get_field(doc, path)
+            value = Value(array_value={})
+            if current is not None and current.WhichOneof("value_type") == "array_value":
+                value.array_value.values.extend(current.array_value.values)
+            existing = {_sort_key(v) for v in value.array_value.values}
+            value.array_value.values.extend(
+                v for v in transform.append_missing_elements.values if _sort_key(v) not in existing)
+        elif kind == "remove_all_from_array":
+            current = _get_field(doc, path)
+            removed = {_sort_key(v) for v in transform.remove_all_from_array.values}
+            value = Value(array_value={})
+            if current is not None and current.WhichOneof("value_type") == "array_value":
+                value.array_value.values.extend(v for v in current.array_value.values if _sort_key(v) not in removed)
+        else:
+            raise NotImplementedError(f"Transform {kind} is not supported by the fake")
+        _set_field(doc.fields, path, value)
+        return value
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        handlers = {
+            "BatchGetDocuments": grpc.unary_stream_rpc_method_handler(
+                self.batch_get_documents, BatchGetDocumentsRequest.FromString, BatchGetDocumentsResponse.SerializeToString),
+            "RunQuery": grpc.unary_stream_rpc_method_handler(
+                self.run_query, RunQueryRequest.FromString, RunQueryResponse.SerializeToString),
+            "BeginTransaction": grpc.unary_unary_rpc_method_handler(
+                self.begin_transaction, BeginTransactionRequest.FromString, BeginTransactionResponse.SerializeToString),
+            "Rollback": grpc.unary_unary_rpc_method_handler(
+                self.rollback, RollbackRequest.FromString, empty_pb2.Empty.SerializeToString),
+            "Commit": grpc.unary_unary_rpc_method_handler(
+                self.commit, CommitRequest.FromString, CommitResponse.SerializeToString),
+            "BatchWrite": grpc.unary_unary_rpc_method_handler(
+                self.batch_write, BatchWriteRequest.FromString, BatchWriteResponse.SerializeToString),
+            "ListCollectionIds": grpc.unary_unary_rpc_method_handler(
+                self.list_collection_ids, ListCollectionIdsRequest.FromString,
+                ListCollectionIdsResponse.SerializeToString),
+        }
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+        self._server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE, handlers),))
+        bound = self._server.add_insecure_port(f"{host}:{port}")
+        self._server.start()
+        return f"{host}:{bound}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
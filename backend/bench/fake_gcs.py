@@ -0,0 +1,124 @@
+# bench/fake_gcs.py
+
+"""
+In-memory stand-in for the GCS JSON API, enough for google-cloud-storage
+pointed at it through STORAGE_EMULATOR_HOST: object metadata, multipart
+uploads, (ranged) media downloads, listing by prefix and deletes.
+"""
+
+import base64
+import hashlib
+import json
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import google_crc32c
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+class ObjectStore:
+    def __init__(self):
+        self.objects = {}  # (bucket, name) -> (data, content_type, generation)
+
+    def put(self, bucket: str, name: str, data: bytes, content_type: str = "application/octet-stream") -> dict:
+        self.objects[(bucket, name)] = (data, content_type, time.time_ns())
+        return self.resource(bucket, name)
+
+    def resource(self, bucket: str, name: str) -> dict:
+        data, content_type, generation = self.objects[(bucket, name)]
+        return {
+            "kind": "storage#object",
+            "id": f"{bucket}/{name}/{generation}",
+            "bucket": bucket,
+            "name": name,
+            "generation": str(generation),
+            "metageneration": "1",
+            "contentType": content_type,
+            "size": str(len(data)),
+            "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode(),
+            "crc32c": base64.b64encode(google_crc32c.Checksum(data).digest()).decode(),
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(generation / 1e9)),
+        }
+
+
+def _not_found():
+    return JSONResponse({"error": {"code": 404, "message": "No such object"}}, status_code=404)
+
+
+def create_app(store: ObjectStore) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = Counter()  # operation -> count
+    app.state.bytes = Counter()  # "upload" / "download" -> bytes
+
+    @app.get("/storage/v1/b/{bucket}/o")
+    async def list_objects(bucket: str, prefix: str = ""):
+        app.state.calls["list"] += 1
+        names = sorted(name for b, name in store.objects if b == bucket and name.startswith(prefix))
+        return {"kind": "storage#objects", "items": [store.resource(bucket, name) for name in names]}
+
+    @app.get("/storage/v1/b/{bucket}/o/{name:path}")
+    async def get_metadata(bucket: str, name: str):
+        app.state.calls["metadata"] += 1
+        if (bucket, name) not in store.objects:
+            return _not_found()
+        return store.resource(bucket, name)
+
+    @app.delete("/storage/v1/b/{bucket}/o/{name:path}")
+    async def delete_object(bucket: str, name: str):
+        app.state.calls["delete"] += 1
+        if store.objects.pop((bucket, name), None) is None:
+            return _not_found()
+        return Response(status_code=204)
+
+    @app.get("/download/storage/v1/b/{bucket}/o/{name:path}")
+    async def download(bucket: str, name: str, request: Request):
+        app.state.calls["download"] += 1
+        if (bucket, name) not in store.objects:
+            return _not_found()
+        data, content_type, generation = store.objects[(bucket, name)]
+        resource = store.resource(bucket, name)
+        headers = {
+            "x-goog-generation": str(generation),
+            "x-goog-hash": f"crc32c={resource['crc32c']},md5={resource['md5Hash']}",
+            "x-goog-stored-content-length": str(len(data)),
+        }
+
+        range_header = request.headers.get("range", "")
+        if range_header.startswith("bytes="):
+            start_text, _, end_text = range_header[len("bytes="):].partition("-")
+            start = int(start_text or 0)
+            end = min(int(end_text) if end_text else len(data) - 1, len(data) - 1)
+            body = data[start:end + 1]
+            headers["content-range"] = f"bytes {start}-{start + len(body) - 1}/{len(data)}"
+            headers.pop("x-goog-hash")  # hashes describe the whole object, not the range
+            app.state.bytes["download"] += len(body)
+            return Response(body, status_code=206, media_type=content_type, headers=headers)
+
+        app.state.bytes["download"] += len(data)
+        return Response(data, media_type=content_type, headers=headers)
+
+    @app.post("/upload/storage/v1/b/{bucket}/o")
+    async def upload(bucket: str, request: Request, uploadType: str = "multipart", name: str = ""):
+        app.state.calls["upload"] += 1
+        body = await request.body()
+        if uploadType == "media":
+            data, content_type = body, request.headers.get("content-type", "application/octet-stream")
+        elif uploadType == "multipart":
+            message = BytesParser(policy=HTTP).parsebytes(
+                b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + body
+            )
+            metadata_part, media_part = list(message.iter_parts())[:2]
+            metadata = json.loads(metadata_part.get_payload(decode=True))
+            name = metadata.get("name", name)
+            data = media_part.get_payload(decode=True)
+            content_type = metadata.get("contentType") or media_part.get_content_type()
+        else:
+            return JSONResponse({"error": {"code": 501, "message": f"uploadType={uploadType} not supported"}},
+                                status_code=501)
+        app.state.bytes["upload"] += len(data)
+        return store.put(bucket, name, data, content_type)
+
+    return app
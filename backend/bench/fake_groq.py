@@ -0,0 +1,148 @@
+# bench/fake_groq.py
+
+"""
+OpenAI-compatible stand-in for the Groq API: chat completions (plain and
+SSE-streamed) and Whisper-style transcriptions, with configurable latency,
+streaming speed and injected 429/5xx errors. Randomness is seeded so runs
+are reproducible.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "today we reviewed the homework on photosynthesis and the light reactions then "
+    "students asked about the quiz on friday which covers chapters four and five"
+).split()
+
+
+@dataclass
+class FakeGroqConfig:
+    latency_ms: float = 300          # time to first byte of a chat completion
+    jitter_ms: float = 100
+    tokens_per_second: float = 400   # streaming speed after the first token
+    completion_tokens: int = 120
+    transcribe_ms_per_mb: float = 800
+    error_rate: float = 0.0          # fraction of calls answered with 500
+    rate_limit_rate: float = 0.0     # fraction of calls answered with 429 + Retry-After
+    seed: int = 0
+
+
+async def _read_form(request: Request) -> dict:
+    """multipart/form-data as {name: bytes} (stdlib parser, no python-multipart needed)."""
+    body = await request.body()
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + body
+    )
+    return {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.iter_parts()}
+
+
+def create_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.calls = Counter()  # (path, status) -> count
+
+    def delay(base_ms: float) -> float:
+        return max(0.0, rng.gauss(base_ms, config.jitter_ms)) / 1000
+
+    def injected_error(path: str):
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            app.state.calls[(path, 429)] += 1
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"Retry-After": "1"})
+        if roll < config.rate_limit_rate + config.error_rate:
+            app.state.calls[(path, 500)] += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+        return None
+
+    def completion_text(payload: dict) -> str:
+        prompt = payload["messages"][-1]["content"]
+        words = [rng.choice(WORDS) for _ in range(config.completion_tokens)]
+        if "Respond in JSON" in prompt:
+            return json.dumps({"sentence": " ".join(words[:12]), "answer": " ".join(words[12:40])})
+        return " ".join(words)
+
+    def usage(payload: dict, text: str) -> dict:
+        prompt_tokens = sum(len(m.get("content") or "") for m in payload["messages"]) // 4
+        completion_tokens = len(text) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        path = "chat/completions"
+        payload = await request.json()
+        await asyncio.sleep(delay(config.latency_ms))
+        error = injected_error(path)
+        if error is not None:
+            return error
+
+        app.state.calls[(path, 200)] += 1
+        text = completion_text(payload)
+        if not payload.get("stream"):
+            return {
+                "id": f"chatcmpl-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": payload["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage(payload, text),
+            }
+
+        async def events():
+            pieces = text.split(" ")
+            for i, piece in enumerate(pieces):
+                delta = piece if i == 0 else " " + piece
+                chunk = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / config.tokens_per_second)
+            final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "x_groq": {"usage": usage(payload, text)}}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/openai/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        path = "audio/transcriptions"
+        form = await _read_form(request)
+        audio = form["file"]
+        await asyncio.sleep(delay(config.latency_ms) + config.transcribe_ms_per_mb * len(audio) / 1e9)
+        error = injected_error(path)
+        if error is not None:
+            return error
+
+        app.state.calls[(path, 200)] += 1
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(max(3, len(audio) // 20_000))
+        ]
+        result = {"text": " ".join(sentences)}
+        if form.get("response_format") == b"verbose_json":
+            t = 0.0
+            result["segments"], result["words"] = [], []
+            for sentence in sentences:
+                result["segments"].append({"start": t, "end": t + 4.0, "text": " " + sentence})
+                tokens = sentence.split()
+                for i, token in enumerate(tokens):
+                    word_start = t + 4.0 * i / len(tokens)
+                    result["words"].append({"word": token.strip("."), "start": word_start,
+                                            "end": word_start + 4.0 / len(tokens)})
+                t += 4.0
+            result["duration"] = t
+        return result
+
+    return app
@@ -0,0 +1,561 @@
+# bench/run.py
+
+"""
+Load test for the API against local fakes of Groq, Firestore and GCS.
+
+    python -m bench.run --duration 60 --concurrency 32 --out results.json
+
+Starts the fakes in this process, runs the app (`uvicorn app.main:app`) as a
+subprocess pointed at them, seeds users and transcribed sources through the
+real upload -> background transcription path, then drives a weighted mix of
+endpoints from `--concurrency` closed-loop workers. Everything random is
+seeded, so two runs of the same command on two commits do the same work.
+
+The JSON report holds per-endpoint throughput and p50/p95/p99 latency, error
+counts, the app's peak memory, and outbound work per route (Firestore
+documents, GCS bytes, provider calls, span counts) taken from the app's own
+/metrics before and after the measured window. Compare two reports with
+`python -m bench.compare old.json new.json`.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import Counter, defaultdict
+
+import httpx
+import uvicorn
+
+from bench import fake_gcs, fake_groq
+from bench.credentials import BUCKET, PROJECT, id_token, service_account
+from bench.fake_firestore import FakeFirestore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "/api/v1"
+
+DEFAULT_MIX = "list=20,status=10,transcript=20,summary=15,history=10,highlight=10,summarize=5,upload=5"
+PROMPTS = [
+    "What did the teacher say about the quiz?",
+    "Summarize the homework discussion",
+    "Which chapters are covered on friday?",
+    "What questions did students ask?",
+]
+
+
+# ---------------------------------------------------------------------- #
+# Setup helpers
+# ---------------------------------------------------------------------- #
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wav_bytes(seconds: float, rng: random.Random) -> bytes:
+    """16 kHz mono 16-bit WAV of low noise (the fake transcriber only looks at the size)."""
+    frames = int(seconds * 16000)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(bytes(rng.getrandbits(4) for _ in range(frames * 2)))
+    return buf.getvalue()
+
+
+def _serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Fake server on port {port} did not start")
+        time.sleep(0.05)
+    return server
+
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = entry.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name} (known: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ---------------------------------------------------------------------- #
+# /metrics scraping
+# ---------------------------------------------------------------------- #
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> dict:
+    """{(name, ((label, value), ...)): value} for every sample line."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        samples[(name, tuple(sorted(_LABEL.findall(labels or ""))))] = float(value)
+    return samples
+
+
+def outbound_by_route(before: dict, after: dict) -> dict:
+    """Per-route outbound work during the measured window, from the difference of two scrapes."""
+    routes = defaultdict(lambda: {
+        "requests": 0, "firestore_reads": 0, "firestore_writes": 0, "gcs_bytes_down": 0, "gcs_bytes_up": 0,
+        "provider_calls": 0, "spans": Counter(),
+    })
+    for (name, labels), value in after.items():
+        delta = value - before.get((name, labels), 0.0)
+        if delta <= 0:
+            continue
+        labels = dict(labels)
+        route = labels.get("route")
+        if name == "slai_http_requests_total":
+            routes[route]["requests"] += delta
+        elif name == "slai_firestore_documents_total":
+            routes[route]["firestore_reads" if labels["op"] == "read" else "firestore_writes"] += delta
+        elif name == "slai_gcs_bytes_total":
+            routes[route]["gcs_bytes_down" if labels["direction"] == "download" else "gcs_bytes_up"] += delta
+        elif name == "slai_provider_responses_total":
+            routes[route]["provider_calls"] += delta
+        elif name == "slai_span_duration_seconds_count":
+            routes[route]["spans"][labels["span"]] += delta
+
+    report = {}
+    for route, totals in sorted(routes.items()):
+        entry = {key: value for key, value in totals.items() if key != "spans"}
+        entry["spans"] = dict(sorted(totals["spans"].items()))
+        requests = totals["requests"]
+        if requests:
+            entry["per_request"] = {
+                key: round(value / requests, 3)
+                for key, value in totals.items()
+                if key not in ("requests", "spans")
+            }
+        report[route] = entry
+    return report
+
+
+# ---------------------------------------------------------------------- #
+# Operations: each takes (bench, user, rng) and returns the response
+# ---------------------------------------------------------------------- #
+
+async def op_list(bench, user, rng):
+    return await bench.client.get(f"{API}/sources", params={"limit": 20}, headers=user["headers"])
+
+
+async def op_status(bench, user, rng):
+    return await bench.client.get(f"{API}/sources/{rng.choice(user['sources'])}/status", headers=user["headers"])
+
+
+async def op_transcript(bench, user, rng):
+    return await bench.client.get(f"{API}/transcript/{rng.choice(user['sources'])}", headers=user["headers"])
+
+
+async def op_summary(bench, user, rng):
+    return await bench.client.get(f"{API}/summary/{rng.choice(user['sources'])}", headers=user["headers"])
+
+
+async def op_summarize(bench, user, rng):
+    return await bench.client.post(f"{API}/summary/{rng.choice(user['sources'])}/generate", headers=user["headers"])
+
+
+async def op_history(bench, user, rng):
+    return await bench.client.get(f"{API}/highlight/{rng.choice(user['sources'])}/history", headers=user["headers"])
+
+
+async def op_highlight(bench, user, rng):
+    return await bench.client.post(
+        f"{API}/highlight/{rng.choice(user['sources'])}",
+        json={"prompt": rng.choice(PROMPTS)},
+        headers=user["headers"],
+    )
+
+
+async def op_upload(bench, user, rng):
+    # The browser uploads straight to GCS with a signed URL; only the metadata call hits the app
+    return await bench.upload_source(user, rng, seconds=rng.uniform(5, 30))
+
+
+OPERATIONS = {
+    "list": op_list,
+    "status": op_status,
+    "transcript": op_transcript,
+    "summary": op_summary,
+    "summarize": op_summarize,
+    "history": op_history,
+    "highlight": op_highlight,
+    "upload": op_upload,
+}
+
+
+# ---------------------------------------------------------------------- #
+# Benchmark
+# ---------------------------------------------------------------------- #
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="slai-bench-")
+        self.store = fake_gcs.ObjectStore()
+        self.firestore = FakeFirestore()
+        self.groq_config = fake_groq.FakeGroqConfig(
+            latency_ms=args.groq_latency_ms,
+            jitter_ms=args.groq_jitter_ms,
+            tokens_per_second=args.groq_tokens_per_second,
+            error_rate=args.groq_error_rate,
+            rate_limit_rate=args.groq_429_rate,
+            seed=args.seed,
+        )
+        self.groq_app = fake_groq.create_app(self.groq_config)
+        self.gcs_app = fake_gcs.create_app(self.store)
+        self.servers = []
+        self.process = None
+        self.client = None
+        self.users = []
+
+    # -- lifecycle --
+
+    def start(self):
+        groq_port, gcs_port, app_port = _free_port(), _free_port(), _free_port()
+        self.servers = [_serve(self.groq_app, groq_port), _serve(self.gcs_app, gcs_port)]
+        firestore_host = self.firestore.start()
+        self.base_url = f"http://127.0.0.1:{app_port}"
+
+        env = dict(os.environ)
+        env.update({
+            "GOOGLE_APPLICATION_CREDENTIALS_JSON": json.dumps(service_account()),
+            "GOOGLE_CLOUD_PROJECT": PROJECT,
+            "FIRESTORE_EMULATOR_HOST": firestore_host,
+            "FIREBASE_AUTH_EMULATOR_HOST": "127.0.0.1:9",  # only its presence matters for token checks
+            "STORAGE_EMULATOR_HOST": f"http://127.0.0.1:{gcs_port}",
+            "GCS_AUDIO_BUCKET": BUCKET,
+            "GROQ_API_BASE_URL": f"http://127.0.0.1:{groq_port}/openai/v1",
+            "GROQ_API_KEY": "bench",
+            "RATE_LIMITS": self.args.rate_limits,
+            "PIPELINE_WARMUP": "false",
+            "METRICS_ENABLED": "true",
+            "METRICS_TOKEN": "",
+            "TRACE_SLOW_REQUEST_SECONDS": "0",
+            "JOB_QUEUE_PATH": os.path.join(self.workdir, "jobs.sqlite3"),
+            "TRANSCRIPT_CACHE_PATH": os.path.join(self.workdir, "transcript_cache.sqlite3"),
+        })
+        for item in self.args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        self.log_path = os.path.join(self.workdir, "app.log")
+        self._log = open(self.log_path, "w")
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(app_port), "--log-level", "warning", "--no-access-log"]
+        self.process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+
+    async def wait_ready(self):
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited with {self.process.returncode}; see {self.log_path}")
+            try:
+                response = await self.client.get(f"{API}/health/")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"App did not become ready; see {self.log_path}")
+
+    def stop(self) -> dict:
+        """Stop the app and the fakes; returns the app's resource usage."""
+        peak_kb = None
+        try:
+            with open(f"/proc/{self.process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        peak_kb = int(line.split()[1])
+        except OSError:
+            pass
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        peak_kb = peak_kb or usage.ru_maxrss  # ru_maxrss is KiB on Linux
+        for server in self.servers:
+            server.should_exit = True
+        self.firestore.stop()
+        return {
+            "app_peak_rss_mb": round(peak_kb / 1024, 1),
+            "app_cpu_seconds": round(usage.ru_utime + usage.ru_stime, 2),
+        }
+
+    # -- seeding --
+
+    async def upload_source(self, user, rng, seconds: float):
+        index = len(user["uploads"])
+        path = f"{user['uid']}/bench-{index:04d}.wav"
+        data = _wav_bytes(seconds, rng)
+        self.store.put(BUCKET, path, data, "audio/wav")
+        user["uploads"].append(path)
+        return await self.client.post(
+            f"{API}/sources/upload-metadata",
+            json={
+                "sourceId": f"{user['uid']}-src-{index:04d}",
+                "path": path,
+                "name": f"Lecture {index}",
+                "fileType": "audio",
+                "size": len(data),
+                "groupId": f"group-{index % 3}",
+            },
+            headers=user["headers"],
+        )
+
+    async def seed(self):
+        rng = random.Random(self.args.seed)
+        for i in range(self.args.users):
+            uid = f"bench-user-{i:03d}"
+            self.users.append({
+                "uid": uid,
+                "headers": {"Authorization": f"Bearer {id_token(uid)}"},
+                "sources": [],
+                "uploads": [],
+            })
+
+        for user in self.users:
+            for _ in range(self.args.sources_per_user):
+                response = await self.upload_source(user, rng, seconds=self.args.audio_seconds)
+                response.raise_for_status()
+                user["sources"].append(response.json()["sourceId"])
+
+        # Wait for the background jobs to transcribe (and summarize) every seeded source
+        pending = {(user["uid"], source_id): user for user in self.users for source_id in user["sources"]}
+        deadline = time.time() + self.args.seed_timeout
+        while pending:
+            if time.time() > deadline:
+                raise RuntimeError(f"{len(pending)} seeded sources still not processed; see {self.log_path}")
+            for (uid, source_id), user in list(pending.items()):
+                response = await self.client.get(f"{API}/sources/{source_id}/status", headers=user["headers"])
+                if response.status_code != 200:
+                    continue
+                status = response.json()
+                if status.get("hasSummary"):
+                    del pending[(uid, source_id)]
+                elif any(stage.get("status") == "failed" for stage in status.get("processing", {}).values()):
+                    raise RuntimeError(f"Seeding {source_id} failed: {status['processing']}; see {self.log_path}")
+            if pending:
+                await asyncio.sleep(0.5)
+
+    # -- load --
+
+    async def scrape(self) -> dict:
+        response = await self.client.get("/metrics")
+        response.raise_for_status()
+        return parse_metrics(response.text)
+
+    async def run_load(self, duration: float, record: bool):
+        mix = _parse_mix(self.args.mix)
+        names, weights = list(mix), list(mix.values())
+        results = defaultdict(list)  # op -> [(latency seconds, status)]
+        deadline = time.perf_counter() + duration
+
+        async def worker(index: int):
+            rng = random.Random(f"{self.args.seed}-{index}-{record}")
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                user = rng.choice(self.users)
+                start = time.perf_counter()
+                try:
+                    response = await OPERATIONS[name](self, user, rng)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                results[name].append((time.perf_counter() - start, status))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(self.args.concurrency)))
+        return results, time.perf_counter() - started
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency + 8, max_keepalive_connections=self.args.concurrency + 8)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout, limits=limits) as client:
+            self.client = client
+            await self.wait_ready()
+            print(f"[bench] Seeding {self.args.users} users x {self.args.sources_per_user} sources")
+            await self.seed()
+            if self.args.warmup > 0:
+                print(f"[bench] Warming up for {self.args.warmup:g}s")
+                await self.run_load(self.args.warmup, record=False)
+
+            groq_before = Counter(self.groq_app.state.calls)
+            gcs_before = (Counter(self.gcs_app.state.calls), Counter(self.gcs_app.state.bytes))
+            firestore_before = (Counter(self.firestore.calls), Counter(self.firestore.documents))
+            metrics_before = await self.scrape()
+
+            print(f"[bench] Measuring for {self.args.duration:g}s at concurrency {self.args.concurrency}")
+            results, elapsed = await self.run_load(self.args.duration, record=True)
+
+            metrics_after = await self.scrape()
+            groq_calls = Counter(self.groq_app.state.calls) - groq_before
+            gcs_calls = Counter(self.gcs_app.state.calls) - gcs_before[0]
+            gcs_bytes = Counter(self.gcs_app.state.bytes) - gcs_before[1]
+            firestore_calls = Counter(self.firestore.calls) - firestore_before[0]
+            firestore_docs = Counter(self.firestore.documents) - firestore_before[1]
+
+        return {
+            "endpoints": summarize_results(results, elapsed),
+            "totals": {
+                "requests": sum(len(samples) for samples in results.values()),
+                "errors": sum(1 for samples in results.values() for _, status in samples if not _ok(status)),
+                "elapsed_seconds": round(elapsed, 2),
+                "throughput_rps": round(sum(len(samples) for samples in results.values()) / elapsed, 2),
+            },
+            "routes": outbound_by_route(metrics_before, metrics_after),
+            "upstream": {
+                "groq": {f"{path} {status}": n for (path, status), n in sorted(groq_calls.items())},
+                "gcs": {"calls": dict(sorted(gcs_calls.items())), "bytes": dict(sorted(gcs_bytes.items()))},
+                "firestore": {"rpcs": dict(sorted(firestore_calls.items())), "documents": dict(sorted(firestore_docs.items()))},
+            },
+        }
+
+
+def _ok(status) -> bool:
+    return isinstance(status, int) and status < 400
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_results(results: dict, elapsed: float) -> dict:
+    summary = {}
+    for name, samples in sorted(results.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        statuses = Counter(str(status) for _, status in samples)
+        summary[name] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, status in samples if not _ok(status)),
+            "status": dict(sorted(statuses.items())),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(1000 * sum(latencies) / len(latencies), 1),
+                "p50": round(1000 * _percentile(latencies, 0.50), 1),
+                "p95": round(1000 * _percentile(latencies, 0.95), 1),
+                "p99": round(1000 * _percentile(latencies, 0.99), 1),
+                "max": round(1000 * latencies[-1], 1),
+            },
+        }
+    return summary
+
+
+def _git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "app"))}
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<12} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, entry in report["endpoints"].items():
+        latency = entry["latency_ms"]
+        print(f"{name:<12} {entry['requests']:>7} {entry['errors']:>5} {entry['throughput_rps']:>8} "
+              f"{latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9}")
+    totals = report["totals"]
+    print(f"{'total':<12} {totals['requests']:>7} {totals['errors']:>5} {totals['throughput_rps']:>8}")
+
+    print(f"\n{'route':<40} {'req':>6} {'fs reads/req':>13} {'fs writes/req':>14} {'provider/req':>13}")
+    for route, entry in report["routes"].items():
+        per = entry.get("per_request")
+        if per:
+            print(f"{route:<40} {int(entry['requests']):>6} {per['firestore_reads']:>13} "
+                  f"{per['firestore_writes']:>14} {per['provider_calls']:>13}")
+        else:
+            print(f"{route:<40} {'-':>6} {int(entry['firestore_reads']):>13} "
+                  f"{int(entry['firestore_writes']):>14} {int(entry['provider_calls']):>13}")
+    print(f"\napp peak RSS {report['resources']['app_peak_rss_mb']} MB, "
+          f"CPU {report['resources']['app_cpu_seconds']} s (whole run)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the measured window")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop client workers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations (default: {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sources-per-user", type=int, default=3)
+    parser.add_argument("--audio-seconds", type=float, default=30, help="length of each seeded recording")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--seed-timeout", type=float, default=300)
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout per request")
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--groq-jitter-ms", type=float, default=100)
+    parser.add_argument("--groq-tokens-per-second", type=float, default=400)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-429-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limits", default="", help="RATE_LIMITS for the app (default: none)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app setting")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the temp dir with the app log")
+    args = parser.parse_args(argv)
+    _parse_mix(args.mix)
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    bench = Bench(args)
+    bench.start()
+    try:
+        report = asyncio.run(bench.run())
+    finally:
+        resources = bench.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(bench.workdir, ignore_errors=True)
+        else:
+            print(f"[bench] App log: {bench.log_path}")
+
+    report = {
+        "meta": {
+            **_git_revision(),
+            "started_at": started_at,
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        **report,
+        "resources": resources,
+    }
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[bench] Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# tests/conftest.py
+
+"""
+Unit tests for pure logic. The app's modules initialize Firebase and GCS on
+import, so point them at the same throwaway credentials and emulators the
+bench uses; nothing here talks to Google.
+"""
+
+import json
+import os
+
+from bench.credentials import BUCKET, PROJECT, service_account
+
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS_JSON", json.dumps(service_account()))
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", PROJECT)
+os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "127.0.0.1:9")
+os.environ.setdefault("FIREBASE_AUTH_EMULATOR_HOST", "127.0.0.1:9")
+os.environ.setdefault("STORAGE_EMULATOR_HOST", "http://127.0.0.1:9")
+os.environ.setdefault("GCS_AUDIO_BUCKET", BUCKET)
@@ -0,0 +1,30 @@
+from app.utils.audio_utils import plan_chunks
+
+
+def test_short_audio_is_one_chunk():
+    assert plan_chunks(500.0, [(100.0, 101.0)], target=600.0) == [(0.0, 500.0)]
+
+
+def test_cuts_in_the_latest_silence_before_the_target():
+    silences = [(560.0, 562.0), (590.0, 594.0), (1180.0, 1182.0)]
+
+    chunks = plan_chunks(1500.0, silences, target=600.0)
+
+    assert chunks == [(0.0, 592.0), (592.0, 1181.0), (1181.0, 1500.0)]
+
+
+def test_cuts_at_the_target_without_a_nearby_silence():
+    # The only silence is too far before the target (and one is past it)
+    chunks = plan_chunks(1300.0, [(100.0, 102.0), (610.0, 612.0)], target=600.0, search_window=30.0)
+
+    assert chunks == [(0.0, 600.0), (600.0, 1200.0), (1200.0, 1300.0)]
+
+
+def test_chunks_cover_the_recording_without_gaps():
+    silences = [(t, t + 0.8) for t in range(7, 3600, 13)]
+
+    chunks = plan_chunks(3600.0, silences, target=300.0)
+
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 3600.0
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(end - start <= 300.0 for start, end in chunks)
@@ -0,0 +1,37 @@
+from app.pipelines.groq_highlight_pipeline import JsonFieldStreamParser
+
+RESPONSE = ('```json\n{"sentence": "He said \\"mitosis\\" \\u00e9t\\u00e9\\nok",\n'
+            ' "confidence": 0.9, "note": "skip \\"me\\"", "answer": "Cells divide."}\n```')
+
+
+def _feed(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_extracts_selected_fields_from_any_fragmentation():
+    for size in (1, 2, 3, 7, len(RESPONSE)):
+        parser = JsonFieldStreamParser(("sentence", "answer"))
+
+        events = _feed(parser, RESPONSE, size)
+
+        assert parser.values == {"sentence": 'He said "mitosis" été\nok', "answer": "Cells divide."}
+        assert "".join(text for field, text in events if field == "sentence") == parser.values["sentence"]
+        assert {field for field, _ in events} == {"sentence", "answer"}
+
+
+def test_consecutive_text_of_one_field_is_one_event():
+    parser = JsonFieldStreamParser(("answer",))
+
+    assert parser.feed('{"answer": "Cells') == [("answer", "Cells")]
+    assert parser.feed(' divide.", "sentence": "x"}') == [("answer", " divide.")]
+
+
+def test_field_names_as_values_are_not_captured():
+    parser = JsonFieldStreamParser(("answer",))
+
+    parser.feed('{"note": "answer", "other": ["answer", "x"], "answer": "yes"}')
+
+    assert parser.values == {"answer": "yes"}
@@ -0,0 +1,59 @@
+from app.pipelines.groq_transcription_pipeline import _stitch_segments, _trim_repeated_prefix
+
+
+def _words(offset, start, text):
+    return [{"start": start - offset + i * 0.5, "end": start - offset + (i + 1) * 0.5, "word": w}
+            for i, w in enumerate(text.split())]
+
+
+def test_overlap_is_kept_once_by_segment_midpoint():
+    windows = [(0.0, 10.0), (10.0, 20.0)]
+    # The second chunk starts 2s early (padding) and re-transcribes the end of the first
+    results = [
+        (0.0, {"segments": [{"start": 0.0, "end": 5.0, "text": " Hello world."},
+                            {"start": 5.0, "end": 11.0, "text": " Mitosis is cell division."}]}),
+        (8.0, {"segments": [{"start": 0.0, "end": 3.0, "text": " Mitosis is cell division."},
+                            {"start": 3.0, "end": 12.0, "text": " Quiz on Friday."}]}),
+    ]
+
+    segments, words = _stitch_segments(windows, results)
+
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+        (0.0, 5.0, "Hello world."), (5.0, 11.0, "Mitosis is cell division."), (11.0, 20.0, "Quiz on Friday."),
+    ]
+    assert words == []
+
+
+def test_words_repeated_across_a_boundary_are_trimmed():
+    windows = [(0.0, 10.0), (10.0, 20.0)]
+    results = [
+        (0.0, {"segments": [{"start": 0.0, "end": 10.0, "text": "Mitosis is cell division"}],
+               "words": _words(0.0, 0.0, "Mitosis is cell division")}),
+        (8.0, {"segments": [{"start": 2.0, "end": 8.0, "text": "cell division and meiosis"}],
+               "words": _words(8.0, 10.0, "cell division and meiosis")}),
+    ]
+
+    segments, words = _stitch_segments(windows, results)
+
+    assert [s["text"] for s in segments] == ["Mitosis is cell division", "and meiosis"]
+    assert [w["word"] for w in words] == ["Mitosis", "is", "cell", "division", "and", "meiosis"]
+    assert words[4]["start"] == 11.0  # word times are shifted to the recording
+
+
+def test_chunks_without_segments_and_the_tail_of_the_last_window():
+    windows = [(0.0, 10.0), (10.0, 20.0)]
+    results = [(0.0, {"text": " Hello world. "}),
+               (8.0, {"segments": [{"start": 2.0, "end": 11.0, "text": "Quiz"},
+                                   {"start": 11.0, "end": 14.0, "text": "on Friday."}]})]
+
+    segments, _ = _stitch_segments(windows, results)
+
+    # The last segment's midpoint (20.5s) is past the window end, but nothing comes after it
+    assert [(s["start"], s["text"]) for s in segments] == [(0.0, "Hello world."), (10.0, "Quiz"),
+                                                           (19.0, "on Friday.")]
+
+
+def test_trim_repeated_prefix():
+    assert _trim_repeated_prefix("mitosis is cell division", "Cell Division and meiosis") == "and meiosis"
+    assert _trim_repeated_prefix("hello world", "quiz on friday") == "quiz on friday"
+    assert _trim_repeated_prefix("a b", "a b") == ""
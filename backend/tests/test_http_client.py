@@ -0,0 +1,113 @@
+import asyncio
+import email
+import threading
+import time
+
+import httpx
+
+from app.core import http_client
+from app.core.rate_limiter import RateLimiter
+
+
+def test_retries_go_through_the_rate_limiter(monkeypatch):
+    limiter = RateLimiter({"model": (600, 60_000)}, max_wait=0)
+    acquired = []
+    acquire = limiter.aacquire
+
+    async def counting_acquire(model, cost=0, user_id=None):
+        acquired.append(cost)
+        await acquire(model, cost, user_id)
+
+    monkeypatch.setattr(limiter, "aacquire", counting_acquire)
+    monkeypatch.setattr(http_client, "rate_limiter", limiter)
+
+    answers = [429, 429, 200]
+
+    def handler(request):
+        return httpx.Response(answers.pop(0), headers={"Retry-After": "0"}, json={})
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        http_client._async_clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await http_client.apost("https://api.example.com/v1/chat", json={}, rate_limit=("model", 1000))
+        finally:
+            await http_client._async_clients.pop(loop).aclose()
+
+    assert asyncio.run(main()).status_code == 200
+    assert acquired == [1000, 1000, 1000]
+    # Retried attempts gave their tokens back: only the last one is still reserved
+    tokens = limiter._queues["model"].tokens
+    assert 60_000 - tokens.level < 1000 + 5
+
+
+def test_multipart_upload_streams_the_file_and_is_resent_on_retry(tmp_path):
+    path = tmp_path / "audio.flac"
+    path.write_bytes(b"x" * (3 * http_client.UPLOAD_CHUNK_BYTES + 7))
+    forms, answers = [], [503, 200]
+
+    async def handler(request):
+        body = await request.aread()
+        assert len(body) == int(request.headers["Content-Length"])
+        message = email.message_from_bytes(f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode() + body)
+        forms.append([(part.get_param("name", header="Content-Disposition"), part.get_filename(),
+                       part.get_content_type(), part.get_payload(decode=True)) for part in message.get_payload()])
+        return httpx.Response(answers.pop(0), headers={"Retry-After": "0"}, json={})
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        http_client._async_clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            with open(path, "rb") as audio:
+                body = http_client.Multipart({"model": "m", "granularity[]": ["segment", "word"]},
+                                             {"file": ("audio.flac", audio, "audio/flac")})
+                return await http_client.apost("https://api.example.com/v1/audio", headers=body.headers,
+                                               content=body)
+        finally:
+            await http_client._async_clients.pop(loop).aclose()
+
+    assert asyncio.run(main()).status_code == 200
+    # The second attempt sent the whole file again
+    assert len(forms) == 2 and forms[0] == forms[1]
+    assert forms[0] == [
+        ("model", None, "text/plain", b"m"),
+        ("granularity[]", None, "text/plain", b"segment"),
+        ("granularity[]", None, "text/plain", b"word"),
+        ("file", "audio.flac", "audio/flac", path.read_bytes()),
+    ]
+
+
+def test_aclose_closes_the_clients_of_every_loop():
+    clients = {}
+
+    def job_thread(name, keep_running=None):
+        # Like a job worker: one loop per thread, kept between jobs
+        loop = asyncio.new_event_loop()
+
+        async def create():
+            clients[name] = http_client.get_async_client()
+            if keep_running is not None:
+                await asyncio.to_thread(keep_running.wait)
+
+        loop.run_until_complete(create())
+        return loop
+
+    idle = job_thread("idle")
+    busy_release = threading.Event()
+    busy = threading.Thread(target=job_thread, args=("busy", busy_release))
+    busy.start()
+    while "busy" not in clients:
+        time.sleep(0.01)
+
+    async def main():
+        clients["main"] = http_client.get_async_client()
+        await http_client.aclose()
+
+    try:
+        asyncio.run(main())
+        assert all(client.is_closed for client in clients.values())
+        assert not http_client._async_clients
+    finally:
+        busy_release.set()
+        busy.join()
+        idle.close()
@@ -0,0 +1,33 @@
+import pytest
+
+from app.core.settings import settings
+from app.services.live_transcription import _committable
+
+
+@pytest.fixture(autouse=True)
+def live_window(monkeypatch):
+    monkeypatch.setattr(settings, "LIVE_WINDOW_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "LIVE_HOLDBACK_SECONDS", 5.0)
+
+
+def _segments(*ends):
+    return [{"start": start, "end": end, "text": "x"} for start, end in zip((0.0,) + ends, ends)]
+
+
+def test_nothing_is_committed_before_the_window_fills():
+    assert _committable(_segments(5.0, 10.0, 20.0), 25.0) == 0
+
+
+def test_segments_behind_the_holdback_are_committed():
+    segments = _segments(10.0, 20.0, 26.0, 31.0, 33.0)
+
+    assert _committable(segments, 32.0) == 3
+    assert _committable(segments, 36.0) == 4
+
+
+def test_one_long_sentence_is_cut_at_twice_the_window():
+    segments = _segments(57.0, 59.0)
+
+    assert _committable(segments, 58.0) == 0
+    # Still no segment behind the holdback, but the window is full twice over
+    assert _committable(segments, 61.0) == 1
@@ -0,0 +1,26 @@
+import json
+
+import httpx
+import pytest
+
+from app.services.provider_router import _is_retryable
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.mark.parametrize("status, retryable", [
+    (400, False), (401, False), (404, False), (413, False), (422, False),
+    (408, True), (429, True), (500, True), (503, True),
+])
+def test_http_status_retryable(status, retryable):
+    assert _is_retryable(_status_error(status)) is retryable
+
+
+def test_caller_errors_are_not_retried():
+    assert not _is_retryable(ValueError("Transcript is empty"))
+    assert not _is_retryable(FileNotFoundError("missing"))
+    assert _is_retryable(json.JSONDecodeError("bad", "{", 0))
+    assert _is_retryable(httpx.ConnectError("refused"))
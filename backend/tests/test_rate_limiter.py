@@ -0,0 +1,73 @@
+import pytest
+
+from app.core.rate_limiter import RateLimiter, RateLimitTimeout, TokenBucket, _ModelQueue, _Ticket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_with_the_clock():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)  # one per second
+
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 120.0
+    assert bucket.level < 60 and bucket.wait_time(1) == 0.0
+    # Refills stop at capacity; more than that only needs a full bucket
+    assert bucket.level == 60 and bucket.wait_time(600) == 0.0
+
+
+def test_unlimited_models_are_not_queued():
+    limiter = RateLimiter({"model": (1, 0)}, max_wait=1, clock=FakeClock())
+
+    for _ in range(10):
+        limiter.acquire("other-model", 1000, "u1")
+
+    assert limiter.queue_depths() == {}
+
+
+def test_acquire_gives_up_after_max_wait():
+    limiter = RateLimiter({"model": (1, 0)}, max_wait=5, clock=FakeClock())
+    limiter.acquire("model", 0, "u1")
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("model", 0, "u1")  # the next request is 60s away
+    assert limiter.queue_depths() == {("model",): 0}
+
+
+def test_settle_refunds_and_charges_the_difference():
+    limiter = RateLimiter({"model": (0, 600)}, max_wait=0, clock=FakeClock())
+    limiter.acquire("model", 500, "u1")
+    tokens = limiter._queues["model"].tokens
+    assert tokens.level == 100
+
+    limiter.settle("model", 500, 200)
+    assert tokens.level == 400
+    limiter.settle("model", 100, 300)
+    assert tokens.level == 200
+    limiter.settle("model", 100, None)  # usage not reported: the estimate stands
+    assert tokens.level == 200
+
+
+def test_waiting_users_are_served_fairly():
+    queue = _ModelQueue(0, 0, FakeClock())
+    tickets = [_Ticket("bulk", 100, 0), _Ticket("bulk", 100, 1), _Ticket("bulk", 100, 2), _Ticket("user", 100, 3)]
+    for ticket in tickets:
+        queue.enqueue(ticket)
+
+    granted = []
+    while len(granted) < len(tickets):
+        ticket = next(t for t in tickets if t not in granted and queue.try_grant(t) == 0)
+        granted.append(ticket)
+
+    # The user who arrived last is served right after the bulk uploader's first call
+    assert [t.seq for t in granted] == [0, 3, 1, 2]
+    assert not queue.waiting and not queue.served
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+def _flight():
+    return SingleFlight(db=object(), distributed=False)
+
+
+def test_concurrent_callers_share_one_run():
+    flight, runs = _flight(), []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return len(runs)
+
+    async def main():
+        return await asyncio.gather(flight.do("k", work), flight.do("k", work))
+
+    assert asyncio.run(main()) == [1, 1]
+    assert len(runs) == 1
+
+
+def test_sequential_calls_run_again():
+    flight, runs = _flight(), []
+
+    async def work():
+        runs.append(1)
+        return len(runs)
+
+    async def main():
+        return await flight.do("k", work), await flight.do("k", work)
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_follower_takes_over_a_cancelled_leader():
+    flight = _flight()
+
+    async def work(tag, delay):
+        await asyncio.sleep(delay)
+        return tag
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", lambda: work("leader", 1)))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do("k", lambda: work("follower", 0.01)))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "follower"
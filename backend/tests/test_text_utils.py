@@ -0,0 +1,42 @@
+import random
+
+from app.utils.text_utils import chunk_text, estimate_tokens
+
+WORDS = "the cell divides into two daughter cells during mitosis and meiosis quiz on friday".split()
+
+
+def _sentences(seed, count):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))).capitalize() + "."
+            for _ in range(count)]
+
+
+def test_chunks_keep_the_whole_text_within_the_budget():
+    text = " ".join(_sentences(1, 300))
+
+    chunks = chunk_text(text, 200)
+
+    assert " ".join(chunks) == text
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_an_edit_only_changes_the_chunk_it_falls_in():
+    sentences = _sentences(3, 300)
+    before = chunk_text(" ".join(sentences), 200)
+    sentences[100] = "A brand new sentence about photosynthesis."
+
+    after = chunk_text(" ".join(sentences), 200)
+
+    changed = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+    assert len(before) == len(after) and len(changed) == 1
+    assert "photosynthesis" in after[changed[0]]
+
+
+def test_long_sentences_are_split_on_words():
+    sentence = " ".join(["mitosis"] * 1000) + "."
+
+    chunks = chunk_text(sentence, 100)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == sentence.split()
@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.transcript_service import InvalidEdit, apply_edits
+
+TEXT = "Hello world. Mitosis is cell division."
+
+
+def test_edits_apply_in_any_order():
+    edits = [{"start": 13, "end": 20, "text": "Meiosis"}, {"start": 0, "end": 5, "text": "Hi"}]
+
+    assert apply_edits(TEXT, edits) == "Hi world. Meiosis is cell division."
+
+
+def test_insertions_and_deletions():
+    edits = [{"start": 12, "end": 12, "text": " Quiz on Friday."}, {"start": 24, "end": 29}]
+
+    assert apply_edits(TEXT, edits) == "Hello world. Quiz on Friday. Mitosis is division."
+
+
+def test_adjacent_edits_are_allowed():
+    edits = [{"start": 0, "end": 5, "text": "Hi"}, {"start": 5, "end": 11, "text": " there"}]
+
+    assert apply_edits(TEXT, edits) == "Hi there. Mitosis is cell division."
+
+
+@pytest.mark.parametrize("edits", [
+    [{"start": 0, "end": 6, "text": "a"}, {"start": 5, "end": 8, "text": "b"}],
+    [{"start": 5, "end": 3, "text": "a"}],
+    [{"start": -1, "end": 3, "text": "a"}],
+    [{"start": 30, "end": len(TEXT) + 1, "text": "a"}],
+])
+def test_invalid_edits_are_rejected(edits):
+    with pytest.raises(InvalidEdit):
+        apply_edits(TEXT, edits)
@@ -0,0 +1,113 @@
+import random
+
+from app.pipelines.groq_transcription_pipeline import _stitch_segments
+from app.services import transcript_timing
+from app.services.transcript_service import apply_edits
+
+WORDS = "the cell divides into two daughter cells during mitosis and meiosis quiz on friday".split()
+
+
+def _sentence(rng, n=40):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _segments(rng, count, start=0.0, length=10.0):
+    return [{"start": start + i * length, "end": start + (i + 1) * length, "text": " " + _sentence(rng)}
+            for i in range(count)]
+
+
+def _transcript(segments):
+    return " ".join(seg["text"].strip() for seg in segments)
+
+
+def test_align_recovers_after_missing_segment():
+    segments = _segments(random.Random(1), 5)
+    text = _transcript(segments)
+    segments[1] = dict(segments[1], text=" Something the transcript does not contain at all.")
+
+    timing = transcript_timing.build_timing(text, segments)
+
+    assert len(timing["segments"][0]) == 4
+    start, end = transcript_timing.find_span(text, segments[4]["text"])
+    assert transcript_timing.lookup(timing, start, end) == {"start": 40.0, "end": 50.0}
+
+
+def test_align_stitched_chunks():
+    rng = random.Random(2)
+    windows = [(0.0, 60.0), (60.0, 120.0)]
+    first = _segments(rng, 6)
+    # The second chunk starts 2 s early and repeats the end of the first one
+    repeated = " ".join(first[-1]["text"].split()[-3:])
+    second = _segments(rng, 6, start=0.0)
+    second[0] = {"start": 0.0, "end": 12.0, "text": f" {repeated} {second[0]['text'].strip()}"}
+    results = [(0.0, {"segments": first}), (58.0, {"segments": second})]
+
+    segments, _ = _stitch_segments(windows, results)
+    text = _transcript(segments)
+    timing = transcript_timing.build_timing(text, segments)
+
+    assert len(timing["segments"][0]) == len(segments)
+    last = segments[-1]
+    start, end = transcript_timing.find_span(text, last["text"])
+    assert transcript_timing.lookup(timing, start, end) == {"start": last["start"], "end": last["end"]}
+
+
+def test_lookup_prefers_words_and_maps_gaps_to_next_unit():
+    text = "Hello world. Mitosis is cell division."
+    segments = [{"start": 0.0, "end": 2.0, "text": "Hello world."},
+                {"start": 2.0, "end": 5.0, "text": "Mitosis is cell division."}]
+    words = [{"word": w, "start": i, "end": i + 0.5} for i, w in enumerate(text.replace(".", "").split())]
+    timing = transcript_timing.build_timing(text, segments, words)
+
+    start, end = transcript_timing.find_span(text, "Mitosis is")
+    assert transcript_timing.lookup(timing, start, end) == {"start": 2.0, "end": 3.5}
+    # The space before "Mitosis" belongs to no word
+    assert transcript_timing.lookup(timing, 12, 13) == {"start": 2.0, "end": 2.5}
+
+
+def test_remap_follows_edits():
+    text = "Hello world. Mitosis is cell division. Quiz on Friday."
+    segments = [{"start": 0.0, "end": 2.0, "text": "Hello world."},
+                {"start": 2.0, "end": 5.0, "text": "Mitosis is cell division."},
+                {"start": 5.0, "end": 8.0, "text": "Quiz on Friday."}]
+    timing = transcript_timing.build_timing(text, segments)
+    edits = [{"start": 0, "end": 5, "text": "Hi"}, {"start": 13, "end": 20, "text": "Meiosis and mitosis"}]
+    new_text = apply_edits(text, edits)
+
+    remapped = transcript_timing.remap(timing, edits, new_text)
+
+    start, end = transcript_timing.find_span(new_text, "Quiz on Friday.")
+    assert transcript_timing.lookup(remapped, start, end) == {"start": 5.0, "end": 8.0}
+    start, end = transcript_timing.find_span(new_text, "Meiosis and mitosis")
+    assert transcript_timing.lookup(remapped, start, end) == {"start": 2.0, "end": 5.0}
+
+
+def test_encode_roundtrip():
+    text = "Hello world."
+    timing = transcript_timing.build_timing(text, [{"start": 0.0, "end": 1.0, "text": text}])
+    decoded = transcript_timing._decode_timing(transcript_timing._encode_timing(timing))
+    assert (decoded["segments"][0] == timing["segments"][0]).all()
+    assert decoded["transcriptHash"] == timing["transcriptHash"]
+
+
+def test_align_skips_empty_units_and_keeps_times_in_milliseconds():
+    text = "Quiz on Friday."
+    words = [{"start": 0.1234, "end": 0.5, "word": " Quiz"}, {"start": 0.5, "end": 0.6, "word": " "},
+             {"start": 0.6, "end": 0.8, "word": "on"}, {"start": 0.8, "end": 1.25, "word": "Friday."}]
+
+    chars, times = transcript_timing._align(text, words, "word")
+
+    assert chars.tolist() == [[0, 4], [5, 7], [8, 15]]
+    assert times.tolist() == [[123, 500], [600, 800], [800, 1250]]
+
+
+def test_remap_clamps_offsets_inside_a_shortened_edit():
+    text = "Mitosis is cell division."
+    timing = transcript_timing.build_timing(text, [{"start": 0.0, "end": 1.0, "text": "Mitosis"},
+                                                   {"start": 1.0, "end": 2.0, "text": "is cell division."}])
+    edits = [{"start": 0, "end": 10, "text": "It"}]  # "Mitosis is" -> "It"
+
+    remapped = transcript_timing.remap(timing, edits, apply_edits(text, edits))
+
+    assert remapped["segments"][0].tolist() == [[0, 2], [2, 17]]
+    assert remapped["transcriptHash"] != timing["transcriptHash"]